@@ -9,6 +9,10 @@ import time
 import sys
 from src.database.endpoints import create_app as create_flask_app
 from src.processor.queue_processor import QueueProcessor
+from src.processor.compaction import StorageCompactor
+from src.processor.progress import ProgressBroker
+from src.database.database_handler import DatabaseHandler
+from src.database.serving import serve
 
 
 _frontend_status_lock = Lock()
@@ -20,6 +24,9 @@ processing_queue: Queue[ProcessingItem] = Queue()
 _process_percentage_lock = Lock()
 _process_percentage = 0
 
+# Shared by the queue processor (publisher) and the Flask app (SSE subscribers)
+progress_broker = ProgressBroker()
+
 
 def set_process_percentage(percentage: int):
     global _process_percentage
@@ -58,7 +65,11 @@ def trigger_shutdown():
 def run_flask_app(flask_app):
     print("Starting Flask server on http://0.0.0.0:5055...")
     try:
-        flask_app.run(host="0.0.0.0", port=5055, debug=False, use_reloader=False)
+        # Set BACKEND_DEV_SERVER=1 to debug with the Werkzeug development server
+        if os.environ.get("BACKEND_DEV_SERVER") == "1":
+            flask_app.run(host="0.0.0.0", port=5055, debug=False, use_reloader=False)
+        else:
+            serve(flask_app, host="0.0.0.0", port=5055)
     except Exception as e:
         print(f"Flask server encountered an error: {e}")
 
@@ -74,6 +85,7 @@ def start_backend():
         get_frontend_status=get_frontend_status,
         request_shutdown=trigger_shutdown,
         get_process_percentage=get_process_percentage,
+        progress_broker=progress_broker,
     )
 
     flask_thread = Thread(target=run_flask_app, args=(flask_app,), name="FlaskThread", daemon=True)
@@ -89,6 +101,8 @@ if __name__ == '__main__':
     flask_server_thread = start_backend()
     max_workers = math.floor(multiprocessing.cpu_count() * 0.75) 
     queue_processor = QueueProcessor(max_workers=max_workers)
+    compactor = StorageCompactor(DatabaseHandler().Session, is_idle=processing_queue.empty)
+    compactor.start()
 
 
     while True:
@@ -97,13 +111,15 @@ if __name__ == '__main__':
 
                 print(f"[{datetime.now()}] Detected item in queue, starting processing sam")
                 queue_item = processing_queue.queue[0] # gets the first item in the queue
-                processor_status = queue_processor.process_items(queue_item, set_process_percentage)
+                processor_status = queue_processor.process_items(queue_item, set_process_percentage, progress_broker)
                 print(f"[{datetime.now()}] Finished item in queue sam")
                 print(f"[Main] Processor finished with status: {processor_status}")
                 processing_queue.get() # Remove the first item to simulate processing
                 set_process_percentage(0)
+                progress_broker.touch()
                 if not get_frontend_status() and processing_queue.empty():
                     print("[Main] Frontend is closed and processing queue is empty. Triggering shutdown.")
+                    compactor.stop()
                     trigger_shutdown()
                     break
 
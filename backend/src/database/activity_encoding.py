@@ -0,0 +1,85 @@
+import os
+from fractions import Fraction
+
+import numpy as np
+
+from .hls import FRAGMENTED_MOVFLAGS
+from .keyframes import gop_size
+
+try:
+    import av
+except ImportError:  # without PyAV, segments are piped to ffmpeg at a constant frame rate
+    av = None
+
+# "constant" encodes every frame at the capture rate; "activity" thins inactive
+# stretches to IDLE_FPS as variable-frame-rate video, which drops idle frames for
+# good, so it is opt-in through the VIDEO_ENCODING_MODE environment variable
+VIDEO_ENCODING_MODE = os.environ.get("VIDEO_ENCODING_MODE", "constant")
+IDLE_FPS = 1
+# Frames this close to activity keep the full rate, so motion starts and ends smoothly
+ACTIVITY_MARGIN_SECONDS = 1.0
+ENCODE_CRF = 30
+
+
+def activity_encoding_available():
+    return VIDEO_ENCODING_MODE == "activity" and av is not None
+
+
+def activity_keep_mask(activity, frame_count, fps):
+    """Which frames to encode: active ones and their margin, one per 1 / IDLE_FPS seconds otherwise, and both ends.
+
+    `activity` holds the per-frame flags from process_frame; frames without a
+    flag count as inactive.
+    """
+    active = np.zeros(frame_count, dtype=bool)
+    flags = np.asarray(activity, dtype=bool)[:frame_count]
+    active[:len(flags)] = flags
+
+    margin = int(round(ACTIVITY_MARGIN_SECONDS * fps))
+    if margin and active.any():
+        # A frame is in the margin if any frame within `margin` of it is active
+        counts = np.concatenate([[0], np.cumsum(active)])
+        index = np.arange(frame_count)
+        active = counts[np.minimum(index + margin + 1, frame_count)] > counts[np.maximum(index - margin, 0)]
+
+    keep = active | (np.arange(frame_count) % max(1, int(round(fps / IDLE_FPS))) == 0)
+    if frame_count:
+        # The last frame keeps the file as long as the segment
+        keep[-1] = True
+    return keep
+
+
+def encode_activity_aware(frames, keep, fps, output_path):
+    """Encode the kept frames as variable-frame-rate fragmented MP4.
+
+    Each frame is stamped with its index on the capture timeline (time base
+    1 / fps), so dropped frames leave gaps in time rather than shortening the
+    video. Keyframes are forced every KEYFRAME_INTERVAL_SECONDS of timeline,
+    not every N encoded frames, which keeps stitch cuts cheap in idle stretches.
+    """
+    height, width = frames[0].shape[:2]
+    time_base = 1 / Fraction(fps).limit_denominator(1000)
+    key_spacing = gop_size(fps)
+
+    with av.open(output_path, mode="w", options={"movflags": FRAGMENTED_MOVFLAGS}) as container:
+        stream = container.add_stream("libx264", rate=Fraction(fps).limit_denominator(1000))
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = "yuv420p"
+        stream.time_base = time_base
+        stream.codec_context.time_base = time_base
+        stream.options = {"preset": "ultrafast", "crf": str(ENCODE_CRF), "bf": "0", "g": str(key_spacing)}
+
+        last_keyframe = None
+        encoded = 0
+        for index in np.flatnonzero(keep):
+            frame = av.VideoFrame.from_ndarray(frames[index], format="bgr24")
+            frame.pts = int(index)
+            frame.time_base = time_base
+            if last_keyframe is None or index - last_keyframe >= key_spacing:
+                frame.pict_type = av.video.frame.PictureType.I
+                last_keyframe = index
+            container.mux(stream.encode(frame))
+            encoded += 1
+        container.mux(stream.encode(None))
+    return encoded
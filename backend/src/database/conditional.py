@@ -0,0 +1,51 @@
+import hashlib
+from datetime import timezone
+
+from flask import Response
+from sqlalchemy import func, or_
+from werkzeug.http import is_resource_modified
+
+from .models import IngestEvent
+
+
+def range_version(session, dt_start, dt_end, cameras=None):
+    """(newest ingest event id, its commit time) among writes overlapping the range.
+
+    Every write to tracking data or footage is logged in ingest_events, so the
+    pair only changes when data a response was built from may have changed.
+    Ranges untouched since the table was added report (0, None).
+    """
+    query = session.query(func.max(IngestEvent.id), func.max(IngestEvent.committed_at)).filter(
+        IngestEvent.start_time <= dt_end,
+        IngestEvent.end_time >= dt_start,
+    )
+    if cameras:
+        query = query.filter(or_(IngestEvent.camera_name.is_(None), IngestEvent.camera_name.in_(cameras)))
+    version, committed_at = query.one()
+    return version or 0, committed_at
+
+
+def range_validators(session, request, mimetype, dt_start, dt_end, cameras=None):
+    """(etag, last_modified) for a range response; the etag also covers the request parameters."""
+    version, committed_at = range_version(session, dt_start, dt_end, cameras)
+    fingerprint = repr((request.path, mimetype, sorted(request.args.items(multi=True)), version))
+    etag = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:20]
+    # committed_at is stored as naive local time
+    last_modified = committed_at.astimezone(timezone.utc) if committed_at else None
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 response when the client's copy is current, otherwise None."""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(Response(status=304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified):
+    # Weak: the same data may be encoded differently (compression, re-stitching)
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
@@ -1,8 +1,28 @@
 import os
+from datetime import datetime, timedelta
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, update
 from sqlalchemy.sql import text
-from .models import Base
+from .models import Base, ProcessedVideo
+from .episodes import backfill_activity_episodes
+from .heatmaps import backfill_coordinate_histograms
+from .rollups import backfill_activity_rollups
+
+# Columns added to existing tables after their first release. create_all only
+# creates missing tables, so older databases get these through ALTER TABLE.
+ADDED_COLUMNS = {
+    'lemur_tracking': [
+        ('ingest_seq', 'INTEGER'),
+    ],
+    'processed_videos': [
+        ('compacted', 'BOOLEAN NOT NULL DEFAULT 0'),
+        ('ingest_seq', 'INTEGER'),
+        ('start_time', 'DATETIME'),
+        ('end_time', 'DATETIME'),
+        ('keyframes', 'TEXT'),
+        ('fragments', 'TEXT'),
+    ],
+}
 
 class DatabaseHandler:
     def __init__(self):
@@ -38,6 +58,7 @@ class DatabaseHandler:
             
             self.engine = create_engine(db_url, connect_args={'check_same_thread': False})
             Base.metadata.create_all(self.engine)
+            self._upgrade_schema()
             
             # Create thread-safe session factory
             self.Session = scoped_session(sessionmaker(bind=self.engine))
@@ -65,6 +86,51 @@ class DatabaseHandler:
             print(f"Traceback: {traceback.format_exc()}")
             raise
 
+
+    def _upgrade_schema(self):
+        """Add columns and indexes that older databases are missing."""
+        with self.engine.begin() as connection:
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+                for name, definition in columns:
+                    if name not in existing:
+                        print(f"Adding column {table}.{name}")
+                        connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+
+            self._backfill_video_intervals(connection)
+            # Summaries that used to be computed from raw rows on every request
+            backfill_activity_rollups(connection)
+            backfill_activity_episodes(connection)
+            backfill_coordinate_histograms(connection)
+
+    def _backfill_video_intervals(self, connection):
+        """Fill start_time/end_time for videos saved before those columns existed."""
+        table = ProcessedVideo.__table__
+        rows = connection.execute(
+            table.select().with_only_columns(table.c.id, table.c.time_stamp, table.c.duration)
+            .where(table.c.start_time.is_(None))
+        ).all()
+
+        intervals = []
+        for video_id, time_stamp, duration in rows:
+            try:
+                start = datetime.fromisoformat(time_stamp)
+            except (TypeError, ValueError):
+                print(f"Skipping video {video_id} with unparseable time stamp: {time_stamp}")
+                continue
+            intervals.append({"b_id": video_id, "b_start": start, "b_end": start + timedelta(seconds=duration or 0)})
+
+        if intervals:
+            print(f"Backfilling start/end times for {len(intervals)} videos")
+            connection.execute(
+                update(table).where(table.c.id == bindparam("b_id"))
+                .values(start_time=bindparam("b_start"), end_time=bindparam("b_end")),
+                intervals,
+            )
         
     def get_database_url(self):
         """Return the database URL."""
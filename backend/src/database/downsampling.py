@@ -0,0 +1,71 @@
+import numpy as np
+
+DOWNSAMPLING_STRATEGIES = ("stride", "mean", "lttb")
+
+
+def _bucket_edges(length, max_points):
+    return np.linspace(0, length, max_points + 1).astype(np.int64)
+
+
+def stride_downsample(points, max_points):
+    """Keep evenly spaced samples, always including the first and last."""
+    if len(points) <= max_points:
+        return points
+    indices = np.linspace(0, len(points) - 1, max_points).round().astype(np.int64)
+    return points[indices]
+
+
+def mean_downsample(points, max_points):
+    """Average each of `max_points` equal-sized buckets, ignoring missing coordinates."""
+    if len(points) <= max_points:
+        return points
+    edges = _bucket_edges(len(points), max_points)
+    valid = ~np.isnan(points)
+    sums = np.add.reduceat(np.where(valid, points, 0.0), edges[:-1], axis=0)
+    counts = np.add.reduceat(valid.astype(np.int64), edges[:-1], axis=0)
+    with np.errstate(invalid="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def lttb_downsample(points, max_points):
+    """Largest-Triangle-Three-Buckets over the (x, y) path.
+
+    Frames without coordinates are dropped first. From each bucket the point
+    forming the largest triangle with the previously kept point and the next
+    bucket's average is kept, which preserves turns and excursions in the path.
+    """
+    points = points[~np.isnan(points).any(axis=1)]
+    if len(points) <= max_points or max_points < 3:
+        return stride_downsample(points, max_points)
+
+    # The first and last points are kept; the rest is split into max_points - 2 buckets
+    edges = 1 + _bucket_edges(len(points) - 2, max_points - 2)
+    kept = np.empty((max_points, 2))
+    kept[0] = points[0]
+    kept[-1] = points[-1]
+
+    previous = points[0]
+    for bucket in range(max_points - 2):
+        candidates = points[edges[bucket]:edges[bucket + 1]]
+        if bucket + 2 < len(edges):
+            following = points[edges[bucket + 1]:edges[bucket + 2]].mean(axis=0)
+        else:
+            following = points[-1]
+        areas = np.abs(
+            (previous[0] - following[0]) * (candidates[:, 1] - previous[1])
+            - (previous[0] - candidates[:, 0]) * (following[1] - previous[1])
+        )
+        previous = candidates[np.argmax(areas)]
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample(points, max_points, strategy="stride"):
+    """Reduce an (n, 2) array of x, y coordinates to at most `max_points` rows."""
+    if strategy == "stride":
+        return stride_downsample(points, max_points)
+    if strategy == "mean":
+        return mean_downsample(points, max_points)
+    if strategy == "lttb":
+        return lttb_downsample(points, max_points)
+    raise ValueError(f"Unknown downsampling strategy '{strategy}'. Use one of: {', '.join(DOWNSAMPLING_STRATEGIES)}.")
@@ -0,0 +1,145 @@
+import gzip
+import io
+import struct
+
+import numpy as np
+from flask import Response, jsonify
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow IPC is only offered when pyarrow is installed
+    pa = None
+
+JSON_MIMETYPE = "application/json"
+PACKED_MIMETYPE = "application/vnd.lemurtracker.packed"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+FORMAT_ALIASES = {"json": JSON_MIMETYPE, "packed": PACKED_MIMETYPE, "arrow": ARROW_MIMETYPE}
+
+# Packed layout, all little-endian:
+#   header:       magic "LMTR", u8 version, u8 kind, u16 reserved
+#   activity:     u32 bucket count, u32 bucket seconds, bit-packed booleans (MSB first)
+#   coordinates:  u16 camera count, then per camera:
+#                 u8 name length, name (utf-8), u32 point count, float32 x[n], float32 y[n]
+#                 (missing coordinates are NaN)
+PACKED_MAGIC = b"LMTR"
+PACKED_VERSION = 1
+KIND_ACTIVITY = 1
+KIND_COORDINATES = 2
+
+COMPRESSIBLE_MIMETYPES = {JSON_MIMETYPE, PACKED_MIMETYPE, ARROW_MIMETYPE}
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_formats():
+    formats = [JSON_MIMETYPE, PACKED_MIMETYPE]
+    if pa is not None:
+        formats.append(ARROW_MIMETYPE)
+    return formats
+
+
+def negotiate_format(request):
+    """Pick a response mimetype from ?format= or the Accept header; JSON unless asked otherwise."""
+    requested = request.args.get("format")
+    if requested:
+        mimetype = FORMAT_ALIASES.get(requested)
+        if mimetype not in available_formats():
+            raise ValueError(f"Unsupported format '{requested}'. Use one of: "
+                             + ", ".join(alias for alias, m in FORMAT_ALIASES.items() if m in available_formats()))
+        return mimetype
+
+    best = request.accept_mimetypes.best_match(available_formats(), default=JSON_MIMETYPE)
+    # "*/*" matches the first candidate, which keeps plain fetch() calls on JSON
+    return best or JSON_MIMETYPE
+
+
+def _header(kind):
+    return PACKED_MAGIC + struct.pack("<BBH", PACKED_VERSION, kind, 0)
+
+
+def pack_activity(activity, bucket_seconds):
+    bits = np.packbits(np.asarray(activity, dtype=bool))
+    return _header(KIND_ACTIVITY) + struct.pack("<II", len(activity), bucket_seconds) + bits.tobytes()
+
+
+def pack_coordinates(arrays):
+    parts = [_header(KIND_COORDINATES), struct.pack("<H", len(arrays))]
+    for camera_name, points in arrays.items():
+        name = camera_name.encode("utf-8")
+        points = np.asarray(points, dtype="<f4").reshape(-1, 2)
+        parts.append(struct.pack("<B", len(name)) + name + struct.pack("<I", len(points)))
+        parts.append(np.ascontiguousarray(points[:, 0]).tobytes())
+        parts.append(np.ascontiguousarray(points[:, 1]).tobytes())
+    return b"".join(parts)
+
+
+def _arrow_stream(table):
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def arrow_activity(activity, bucket_seconds):
+    table = pa.table({"active": pa.array(activity, type=pa.bool_())})
+    return _arrow_stream(table.replace_schema_metadata({"bucket_seconds": str(bucket_seconds)}))
+
+
+def arrow_coordinates(arrays):
+    cameras, xs, ys = [], [], []
+    for camera_name, points in arrays.items():
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        cameras.extend([camera_name] * len(points))
+        xs.append(points[:, 0])
+        ys.append(points[:, 1])
+    table = pa.table({
+        "camera": pa.array(cameras, type=pa.string()).dictionary_encode(),
+        "x": pa.array(np.concatenate(xs) if xs else np.empty(0, np.float32), from_pandas=True),
+        "y": pa.array(np.concatenate(ys) if ys else np.empty(0, np.float32), from_pandas=True),
+    })
+    return _arrow_stream(table)
+
+
+def activity_response(mimetype, activity, bucket_seconds):
+    if mimetype == PACKED_MIMETYPE:
+        return Response(pack_activity(activity, bucket_seconds), mimetype=PACKED_MIMETYPE)
+    if mimetype == ARROW_MIMETYPE:
+        return Response(arrow_activity(activity, bucket_seconds), mimetype=ARROW_MIMETYPE)
+    return jsonify({"activity": activity})
+
+
+def coordinates_response(mimetype, arrays, to_json):
+    if mimetype == PACKED_MIMETYPE:
+        return Response(pack_coordinates(arrays), mimetype=PACKED_MIMETYPE)
+    if mimetype == ARROW_MIMETYPE:
+        return Response(arrow_coordinates(arrays), mimetype=ARROW_MIMETYPE)
+    return jsonify({"coordinates": to_json(arrays)})
+
+
+def compress_response(request, response):
+    """after_request hook: brotli or gzip encode data responses when the client accepts it."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+        response.headers["Content-Encoding"] = "br"
+    elif accepted["gzip"]:
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
@@ -1,219 +1,350 @@
 from datetime import datetime, timedelta
+import math
 import os
+import shutil
 import subprocess
+import tempfile
 
-from .models import LemurTracking, ProcessedVideo
+import numpy as np
+from sqlalchemy import bindparam, func, text
+
+from .models import ActivityEpisode, LemurTracking, ProcessedVideo
+from .downsampling import downsample
+from .episodes import EPISODE_MIN_DURATION_SECONDS
+from .keyframes import KEYFRAME_TOLERANCE_SECONDS, plan_clip, probe_keyframes, video_keyframes
+from .rollups import query_activity_rollup
+from .stitch_cache import WORK_DIR_PREFIX
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 STITCHED_VIDEOS_DIR = os.path.join(BASE_DIR, "stitched_videos")
 
-def get_activity_helper(session, start_time, end_time):
+def tracking_bounds(dt_start, dt_end):
+    """Format a range the way tracking time stamps are stored ("<date> <iso datetime>")."""
+    return (
+        f"{dt_start.strftime('%Y-%m-%d')} {dt_start.strftime('%Y-%m-%dT%H:%M:%S')}",
+        f"{dt_end.strftime('%Y-%m-%d')} {dt_end.strftime('%Y-%m-%dT%H:%M:%S')}",
+    )
+
+
+# Seconds since :start, bucketed by :width. time_stamp is "<date> <iso datetime>", so the
+# datetime starts at character 12. The half-millisecond nudge keeps frames that fall exactly
+# on a bucket boundary out of the previous bucket despite julianday rounding.
+_ACTIVITY_BUCKETS_SQL = text(f"""
+    SELECT camera_name,
+           CAST(((julianday(substr(time_stamp, 12)) - julianday(:start)) * 86400.0 + 0.0005) / :width AS INTEGER) AS bucket,
+           MAX(is_active) AS active
+    FROM {LemurTracking.__tablename__}
+    WHERE time_stamp >= :formatted_start AND time_stamp <= :formatted_end
+    GROUP BY camera_name, bucket
+""")
+
+
+def get_activity_helper(session, start_time, end_time, bucket_seconds=1):
+    """One boolean per `bucket_seconds` bucket from start_time: whether any camera saw activity.
 
+    Aggregates in SQLite by camera and time bucket, then merges cameras by bucket, so
+    cameras with missing or extra frames no longer shift each other out of alignment.
+    """
     dt_start = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S")
     dt_end = datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S")
-    formatted_start = f"{dt_start.strftime('%Y-%m-%d')} {dt_start.strftime('%Y-%m-%dT%H:%M:%S')}"
-    formatted_end = f"{dt_end.strftime('%Y-%m-%d')} {dt_end.strftime('%Y-%m-%dT%H:%M:%S')}"
+    formatted_start, formatted_end = tracking_bounds(dt_start, dt_end)
+
+    bucket_count = math.ceil((dt_end - dt_start).total_seconds() / bucket_seconds)
+    if bucket_count <= 0:
+        return []
+
+    rows = session.execute(_ACTIVITY_BUCKETS_SQL, {
+        "start": dt_start.isoformat(),
+        "width": bucket_seconds,
+        "formatted_start": formatted_start,
+        "formatted_end": formatted_end,
+    }).all()
+    if not rows:
+        return []
+
+    activity = [False] * bucket_count
+    for _, bucket, active in rows:
+        if active and 0 <= bucket < bucket_count:
+            activity[bucket] = True
+
+    return activity
+
+
+BATCH_METRICS = ("activity", "active_frames", "total_frames")
+MAX_BATCH_RANGES = 100
+
+
+def _batch_buckets_sql(range_count, filter_cameras):
+    """Buckets every range in one statement: a VALUES table of ranges joined to tracking rows.
+
+    SQLite drives the join from the (small) ranges table, so each range is an
+    indexed lookup on time_stamp and the whole batch is one round trip.
+    """
+    ranges = ", ".join(f"({index}, :start{index}, :formatted_start{index}, :formatted_end{index})"
+                       for index in range(range_count))
+    camera_filter = "AND t.camera_name IN :cameras" if filter_cameras else ""
+    statement = text(f"""
+        WITH ranges(range_index, start, formatted_start, formatted_end) AS (VALUES {ranges})
+        SELECT r.range_index,
+               CAST(((julianday(substr(t.time_stamp, 12)) - julianday(r.start)) * 86400.0 + 0.0005) / :width AS INTEGER) AS bucket,
+               SUM(t.is_active) AS active_frames,
+               COUNT(*) AS total_frames
+        FROM ranges AS r
+        JOIN {LemurTracking.__tablename__} AS t
+          ON t.time_stamp >= r.formatted_start AND t.time_stamp <= r.formatted_end
+        WHERE 1 = 1 {camera_filter}
+        GROUP BY r.range_index, bucket
+    """)
+    if filter_cameras:
+        statement = statement.bindparams(bindparam("cameras", expanding=True))
+    return statement
+
+
+def get_activity_batch_helper(session, ranges, bucket_seconds=1, cameras=None, metrics=("activity",)):
+    """Bucketed metrics for several ranges, aligned by offset from each range's start.
+
+    Every array has the length of the longest range; buckets past a shorter
+    range's end are None. `activity` is whether any selected camera saw activity
+    in the bucket, `active_frames`/`total_frames` are frame counts across cameras.
+    """
+    unknown = [metric for metric in metrics if metric not in BATCH_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)}. Use any of: {', '.join(BATCH_METRICS)}.")
+    if not ranges or len(ranges) > MAX_BATCH_RANGES:
+        raise ValueError(f"Provide between 1 and {MAX_BATCH_RANGES} ranges.")
+
+    params = {"width": bucket_seconds}
+    bucket_counts = []
+    for index, (start_time, end_time) in enumerate(ranges):
+        dt_start = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S")
+        dt_end = datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S")
+        if dt_end <= dt_start:
+            raise ValueError("end_time must be after start_time.")
+        params[f"start{index}"] = dt_start.isoformat()
+        params[f"formatted_start{index}"], params[f"formatted_end{index}"] = tracking_bounds(dt_start, dt_end)
+        bucket_counts.append(math.ceil((dt_end - dt_start).total_seconds() / bucket_seconds))
+    if cameras:
+        params["cameras"] = list(cameras)
+
+    width = max(bucket_counts)
+    active_frames = [[0] * count + [None] * (width - count) for count in bucket_counts]
+    total_frames = [[0] * count + [None] * (width - count) for count in bucket_counts]
+    rows = session.execute(_batch_buckets_sql(len(ranges), bool(cameras)), params).all()
+    for range_index, bucket, active, total in rows:
+        if 0 <= bucket < bucket_counts[range_index]:
+            active_frames[range_index][bucket] = int(active or 0)
+            total_frames[range_index][bucket] = total
+
+    results = []
+    for index, (start_time, end_time) in enumerate(ranges):
+        result = {"start_time": start_time, "end_time": end_time, "bucket_count": bucket_counts[index]}
+        if "activity" in metrics:
+            result["activity"] = [None if count is None else count > 0 for count in active_frames[index]]
+        if "active_frames" in metrics:
+            result["active_frames"] = active_frames[index]
+        if "total_frames" in metrics:
+            result["total_frames"] = total_frames[index]
+        results.append(result)
+
+    return {"bucket_seconds": bucket_seconds, "bucket_count": width, "ranges": results}
+
+
+def get_activity_rollup_helper(session, start_time, end_time, points, cameras=None):
+    """Answers timeline requests from the precomputed rollup pyramid instead of raw tracking rows."""
+    dt_start = datetime.fromisoformat(start_time)
+    dt_end = datetime.fromisoformat(end_time)
+    if dt_end < dt_start:
+        raise ValueError("end_time must not be before start_time.")
+
+    rollup = query_activity_rollup(session, dt_start, dt_end, points, cameras)
+    if not any(rollup["total_frames"]):
+        return None
+
+    rollup["activity"] = [active > 0 for active in rollup["active_frames"]]
+    return rollup
+
+
+def get_episodes_helper(session, start_time, end_time, camera_name=None, min_duration=None, limit=100, offset=0):
+    """Lists indexed activity episodes overlapping the range, one page at a time."""
+    dt_start = datetime.fromisoformat(start_time)
+    dt_end = datetime.fromisoformat(end_time)
+
+    query = session.query(ActivityEpisode).filter(
+        ActivityEpisode.start_time <= dt_end,
+        ActivityEpisode.end_time >= dt_start,
+        ActivityEpisode.duration >= (EPISODE_MIN_DURATION_SECONDS if min_duration is None else min_duration),
+    )
+    if camera_name:
+        query = query.filter(ActivityEpisode.camera_name == camera_name)
+
+    total = query.count()
+    episodes = query.order_by(ActivityEpisode.start_time, ActivityEpisode.id).offset(offset).limit(limit).all()
+
+    return {
+        "episodes": [
+            {
+                "id": episode.id,
+                "camera_name": episode.camera_name,
+                "start_time": episode.start_time.isoformat(),
+                "end_time": episode.end_time.isoformat(),
+                "duration": episode.duration,
+                "active_frames": episode.active_frames,
+                "peak_area": episode.peak_area,
+                "centroid": {"x": episode.centroid_x, "y": episode.centroid_y},
+            }
+            for episode in episodes
+        ],
+        "total": total,
+        "next_offset": offset + len(episodes) if offset + len(episodes) < total else None,
+    }
+
+
+CAMERA_NAMES = ["Camera1", "Camera2", "Camera3"]
+
 
-    results = session.query(LemurTracking).filter(
+def get_camera_points(session, camera_name, formatted_start, formatted_end):
+    """(n, 2) float array of one camera's coordinates in time order; missing coordinates are NaN."""
+    rows = session.query(LemurTracking.coordinate_x, LemurTracking.coordinate_y).filter(
+        LemurTracking.camera_name == camera_name,
         LemurTracking.time_stamp >= formatted_start,
         LemurTracking.time_stamp <= formatted_end
-    ).all()
-
-    camera1 = []
-    camera2 = []
-    camera3 = []
-
-    for result in results:
-        if result.camera_name == "Camera1":
-            camera1.append(result)
-        elif result.camera_name == "Camera2":
-            camera2.append(result)
-        elif result.camera_name == "Camera3":
-            camera3.append(result)
-
-    activity = []
-
-    for i in range(0, len(camera1), 15):
-        chunk1 = camera1[i:i+15]
-        chunk2 = camera2[i:i+15]
-        chunk3 = camera3[i:i+15]
-        if any(r.is_active for r in chunk1) or any(r.is_active for r in chunk2) or any(r.is_active for r in chunk3):
-           activity.append(True)
-        else:
-            activity.append(False)
+    ).order_by(LemurTracking.time_stamp).all()
+    return np.array(rows, dtype=np.float64).reshape(-1, 2)
 
-    return activity
 
+def get_coordinate_arrays(session, start_time, end_time, cameras=None, max_points=None, strategy="stride"):
+    """{camera: (n, 2) array} of coordinates, optionally reduced to `max_points` per camera.
 
-def get_coordinate_helper(session, start_time, end_time):
+    Only the coordinate columns are read, one indexed query per camera. Every
+    requested camera is present, with an empty array when it has no rows in the range.
+    """
     dt_start = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S")
     dt_end = datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S")
-    formatted_start = f"{dt_start.strftime('%Y-%m-%d')} {dt_start.strftime('%Y-%m-%dT%H:%M:%S')}"
-    formatted_end = f"{dt_end.strftime('%Y-%m-%d')} {dt_end.strftime('%Y-%m-%dT%H:%M:%S')}"
+    formatted_start, formatted_end = tracking_bounds(dt_start, dt_end)
 
-    dt_start = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S")
-    dt_end = datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S")
-    formatted_start = f"{dt_start.strftime('%Y-%m-%d')} {dt_start.strftime('%Y-%m-%dT%H:%M:%S')}"
-    formatted_end = f"{dt_end.strftime('%Y-%m-%d')} {dt_end.strftime('%Y-%m-%dT%H:%M:%S')}"
+    arrays = {}
+    for camera_name in cameras or CAMERA_NAMES:
+        points = get_camera_points(session, camera_name, formatted_start, formatted_end)
+        if max_points:
+            points = downsample(points, max_points, strategy)
+        arrays[camera_name] = points
 
-    results = session.query(LemurTracking).filter(
-        LemurTracking.time_stamp >= formatted_start,
-        LemurTracking.time_stamp <= formatted_end
-    ).all()
-
-    camera1 = []
-    camera2 = []
-    camera3 = []
-
-    for result in results:
-        if result.camera_name == "Camera1":
-            camera1.append({"x": result.coordinate_x, "y": result.coordinate_y})
-        elif result.camera_name == "Camera2":
-            camera2.append({"x": result.coordinate_x, "y": result.coordinate_y})
-        elif result.camera_name == "Camera3":
-            camera3.append({"x": result.coordinate_x, "y": result.coordinate_y})
-
-    coordinates = [
-        {"Camera1": camera1},
-        {"Camera2": camera2},
-        {"Camera3": camera3}
+    return arrays
+
+
+def coordinates_to_json(arrays):
+    """The /coordinate-data JSON layout: [{camera: [{"x": .., "y": ..}, ...]}, ...]."""
+    return [
+        {camera_name: [
+            {"x": None if np.isnan(x) else x, "y": None if np.isnan(y) else y}
+            for x, y in points.tolist()
+        ]}
+        for camera_name, points in arrays.items()
     ]
 
-    print(len(camera1))
-    print(len(camera2))
-    print(len(camera3))
 
-    return coordinates
+def get_coordinate_helper(session, start_time, end_time, cameras=None, max_points=None, strategy="stride"):
+    return coordinates_to_json(get_coordinate_arrays(session, start_time, end_time, cameras, max_points, strategy))
 
 
 def find_relevant_videos(session, start_time, end_time, camera_name):
-    """Finds and organizes videos for a specific camera within the specified date and time range."""
+    """Finds and organizes videos for a specific camera within the specified date and time range.
+
+    An interval lookup on (camera_name, start_time): no video is longer than the
+    camera's longest one, so only videos starting in [start - longest, end] can
+    overlap, and the index yields exactly those in time order.
+    """
     start_time_dt = datetime.fromisoformat(start_time)
     end_time_dt = datetime.fromisoformat(end_time)
 
-    videos = session.query(ProcessedVideo).filter(
+    longest = session.query(func.max(ProcessedVideo.duration)).filter(
         ProcessedVideo.camera_name == camera_name
-    ).order_by(ProcessedVideo.time_stamp).all()
+    ).scalar() or 0
 
-    camera_data = {"first": None, "last": None, "selected": []}
+    videos = session.query(ProcessedVideo).filter(
+        ProcessedVideo.camera_name == camera_name,
+        ProcessedVideo.start_time >= start_time_dt - timedelta(seconds=longest),
+        ProcessedVideo.start_time <= end_time_dt,
+        ProcessedVideo.end_time >= start_time_dt,
+    ).order_by(ProcessedVideo.start_time).all()
 
-    for video in videos:
-        video_start = datetime.fromisoformat(video.time_stamp)
-        video_end = video_start + timedelta(seconds=video.duration)
+    return {
+        "first": videos[0] if videos else None,
+        "last": videos[-1] if videos else None,
+        "selected": videos,
+        "clips": [clip_offsets(video, start_time_dt, end_time_dt) for video in videos],
+    }
 
-        # Check for any overlap between video and the desired time range
-        if video_end >= start_time_dt and video_start <= end_time_dt:
-            camera_data["selected"].append(video)
-            if not camera_data["first"]:
-                camera_data["first"] = video
-            camera_data["last"] = video
 
-    return camera_data
+def clip_offsets(video, dt_start, dt_end):
+    """(in, out) seconds into `video` covering its overlap with [dt_start, dt_end]."""
+    in_point = max(0.0, (dt_start - video.start_time).total_seconds())
+    out_point = min(video.duration, (dt_end - video.start_time).total_seconds())
+    return in_point, max(in_point, out_point)
     
 
-def stitch_videos(video_list, camera_name, start_time, end_time):
-    if not video_list:
-        return None 
-    
-    output_path = os.path.join(STITCHED_VIDEOS_DIR, f"{camera_name}_stitched_{start_time}_{end_time}.mp4")
-    
-    if os.path.exists(output_path):
-        return output_path
-        
-    if not os.path.exists("stitched_videos"):
-        os.makedirs("stitched_videos")
-    
-    # Handle single video case - prevents duplication bug
-    if len(video_list) == 1:
-        single_video = video_list[0]
-        
-        # Calculate time offsets for the single video
-        video_start = datetime.fromisoformat(single_video.time_stamp)
-        requested_start = datetime.fromisoformat(start_time)
-        requested_end = datetime.fromisoformat(end_time)
-        
-        # Calculate start offset (how many seconds into the video to start)
-        start_offset = max(0, (requested_start - video_start).total_seconds())
-        
-        # Calculate duration (how many seconds of video to include)
-        video_end = video_start + timedelta(seconds=single_video.duration)
-        actual_end = min(requested_end, video_end)
-        duration = (actual_end - max(requested_start, video_start)).total_seconds()
-        
-        # Only trim if we need to, otherwise just copy
-        if start_offset > 0 or duration < single_video.duration:
-            subprocess.run([
-                "ffmpeg", "-i", single_video.filepath, 
-                "-ss", str(start_offset),
-                "-t", str(duration),
-                "-c", "copy", output_path, "-y"
-            ], check=True)
-        else:
-            # Just copy the whole video
-            subprocess.run([
-                "ffmpeg", "-i", single_video.filepath, 
-                "-c", "copy", output_path, "-y"
-            ], check=True)
-            
+def _cut_part(video, action, start, end, part_path):
+    """Write [start, end) of a video to an MPEG-TS part; TS keeps parameter sets in-band for concat."""
+    command = ["ffmpeg", "-v", "error", "-ss", f"{start:.6f}", "-i", video.filepath, "-t", f"{end - start:.6f}"]
+    if action == "encode":
+        command += ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "30", "-bf", "0", "-pix_fmt", "yuv420p"]
+    else:
+        command += ["-c", "copy"]
+    subprocess.run(command + ["-an", "-f", "mpegts", part_path, "-y"], check=True)
+
+
+def stitch_videos(video_list, start_time, end_time, output_path, on_progress=None):
+    """Cut the requested range out of consecutive videos and join it into one mp4 at output_path.
+
+    Returns None when the videos do not cover any of the range. `on_progress`
+    is called with (steps done, total steps) as parts are cut.
+    """
+    requested_start = datetime.fromisoformat(start_time)
+    requested_end = datetime.fromisoformat(end_time)
+    clips = [(video, *clip_offsets(video, requested_start, requested_end)) for video in video_list]
+    return stitch_clips(clips, output_path, on_progress)
+
+
+def stitch_clips(clips, output_path, on_progress=None):
+    """Join (video, in_point, out_point) clips, in order, into one mp4 at output_path.
+
+    Each clip is planned against its video's stored keyframe index: only the
+    partial GOP before the first keyframe of a clip is re-encoded, the rest is
+    stream-copied, so the cost depends on the GOP length rather than the file length.
+    Clips need not be contiguous; the output plays them back to back.
+    Returns None when no clip has any footage.
+    """
+    plan = []
+    for video, in_point, out_point in clips:
+        keyframes = video_keyframes(video) or probe_keyframes(video.filepath)
+        plan.extend((video, action, start, end) for action, start, end in plan_clip(keyframes, in_point, out_point))
+
+    if not plan:
+        return None
+
+    # A single whole video needs no cutting at all
+    video, action, start, end = plan[0]
+    if len(plan) == 1 and action == "copy" and start <= KEYFRAME_TOLERANCE_SECONDS and end >= video.duration:
+        subprocess.run(["ffmpeg", "-v", "error", "-i", video.filepath, "-c", "copy", "-f", "mp4", output_path, "-y"], check=True)
         return output_path
+
+    work_dir = tempfile.mkdtemp(prefix=WORK_DIR_PREFIX, dir=os.path.dirname(output_path))
+    try:
+        list_path = os.path.join(work_dir, "parts.txt")
+        with open(list_path, "w") as f:
+            for index, (video, action, start, end) in enumerate(plan):
+                part_path = os.path.join(work_dir, f"part_{index:04d}.ts")
+                _cut_part(video, action, start, end, part_path)
+                f.write(f"file '{part_path}'\n")
+                if on_progress:
+                    # The final concat counts as one more step
+                    on_progress(index + 1, len(plan) + 1)
+
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "faststart", "-f", "mp4", output_path, "-y"
+        ], check=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
     
-    # Multiple videos case - your existing logic
-    temp_videos = []
-    first_video = video_list[0]
-    
-    first_video_start = first_video.processed_filename.split('_')[1].replace('.mp4', '').split('.')[0].split(' ')[-1]
-    h, m, s = map(int, first_video_start.split(':'))
-    timestamp_seconds = h * 3600 + m * 60 + s 
-    dt = datetime.fromisoformat(start_time)
-    hours, minutes, seconds = dt.hour, dt.minute, dt.second
-    start_time_seconds = hours * 3600 + minutes * 60 + seconds
-    offset_seconds = start_time_seconds - timestamp_seconds
-    first_video_start = max(0, offset_seconds)
-    
-    temp_first = f"temp_{camera_name}_first.mp4"
-    subprocess.run([
-        "ffmpeg", "-i", first_video.filepath, "-ss", str(first_video_start), 
-        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", temp_first, "-y"
-    ], check=True)
-    temp_videos.append(temp_first)
-    
-    # Add middle videos as they are
-    for video in video_list[1:-1]:
-        temp_videos.append(video.filepath)
-    
-    # Process last video
-    last_video = video_list[-1]
-    
-    last_video_end = last_video.processed_filename.split('_')[1].replace('.mp4', '').split('.')[0].split(' ')[-1]
-    h, m, s = map(int, last_video_end.split(':'))
-    timestamp_seconds = h * 3600 + m * 60 + s 
-    dt = datetime.fromisoformat(end_time)
-    hours, minutes, seconds = dt.hour, dt.minute, dt.second
-    end_time_seconds = hours * 3600 + minutes * 60 + seconds
-    offset_seconds = end_time_seconds - timestamp_seconds
-    last_video_end = max(0, offset_seconds)
-    
-    temp_last = f"temp_{camera_name}_last.mp4"
-    subprocess.run([
-        "ffmpeg", "-i", last_video.filepath, "-to", str(last_video_end), "-c", "copy", temp_last, "-y"
-    ], check=True)
-    temp_videos.append(temp_last)
-    
-    # Create file list for FFmpeg
-    temp_list_path = f"video_list_{camera_name}.txt"
-    with open(temp_list_path, "w") as f:
-        for temp_video in temp_videos:
-            f.write(f"file '{temp_video}'\n")
-    
-    # Concatenate videos
-    subprocess.run([
-        "ffmpeg", "-f", "concat", "-safe", "0", "-i", temp_list_path,
-        "-c", "copy", output_path
-    ], check=True)
-    
-    # Cleanup temporary files
-    os.remove(temp_list_path)
-    os.remove(temp_first)
-    os.remove(temp_last)
-    
-    return output_path
\ No newline at end of file
+    return output_path
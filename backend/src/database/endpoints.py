@@ -1,10 +1,26 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file
 from queue import Queue
 from datetime import datetime
 from flask_cors import CORS 
 import os
 from .database_handler import DatabaseHandler
-from .endpoint_helpers import get_activity_helper, get_coordinate_helper, find_relevant_videos, stitch_videos
+from .conditional import not_modified, range_validators, with_validators
+from .models import ProcessedVideo, ThumbnailSprite, Zone
+from .downsampling import DOWNSAMPLING_STRATEGIES
+from .encoding import activity_response, compress_response, coordinates_response, negotiate_format
+from .heatmaps import query_heatmap
+from .highlights import get_highlight_video, highlight_params, highlight_plan
+from .hls import HLS_MIMETYPE, build_playlist, ensure_fragment_index
+from .prefetch import Prefetcher
+from .query_cache import QueryCache
+from .stitch_cache import StitchCache
+from .stitch_jobs import StitchJobManager, get_stitched_video
+from .sync import SYNC_EVENT_LIMIT, changes_since, current_cursor
+from .streaming import has_tracking_rows, stream_activity, stream_coordinates, stream_mimetype, wants_stream
+from .thumbnails import VTT_MIMETYPE, build_thumbnail_vtt, find_sprites
+from .zones import delete_zone, get_zone_occupancy, save_zone, zone_to_dict
+from src.processor.progress import SSE_MIMETYPE, ProgressBroker, sse_stream
+from .endpoint_helpers import get_activity_helper, get_activity_batch_helper, get_activity_rollup_helper, get_episodes_helper, get_coordinate_arrays, coordinates_to_json, find_relevant_videos, CAMERA_NAMES, STITCHED_VIDEOS_DIR
 
 from typing import Callable, Tuple
 ProcessingItem = Tuple[str, datetime]
@@ -14,10 +30,23 @@ ShutdownFunc = Callable[[], None]
 GetPecentFunc = Callable[[], int]
 
 
-def create_app(processing_queue: Queue[ProcessingItem], set_frontend_status: SetStatusFunc, get_frontend_status: GetStatusFunc, request_shutdown: ShutdownFunc, get_process_percentage: GetPecentFunc):
+def create_app(processing_queue: Queue[ProcessingItem], set_frontend_status: SetStatusFunc, get_frontend_status: GetStatusFunc, request_shutdown: ShutdownFunc, get_process_percentage: GetPecentFunc, progress_broker: ProgressBroker = None):
     app = Flask(__name__)
+    progress_broker = progress_broker or ProgressBroker()
     CORS(app)
     db = DatabaseHandler()
+    query_cache = QueryCache()
+    stitch_cache = StitchCache(STITCHED_VIDEOS_DIR)
+    stitch_jobs = StitchJobManager(db.Session, stitch_cache)
+    prefetcher = Prefetcher(db.Session, stitch_cache, is_busy=lambda: stitch_cache.stats()["in_flight"] > 0)
+
+    def client_id():
+        # Electron renderers all come from localhost; the header tells windows apart
+        return request.headers.get('X-Client-Id', request.remote_addr)
+
+    @app.after_request
+    def compress(response):
+        return compress_response(request, response)
 
     @app.route('/on-open', methods=['GET'])
     def handle_on_open():
@@ -104,6 +133,7 @@ def create_app(processing_queue: Queue[ProcessingItem], set_frontend_status: Set
             item: ProcessingItem = (file_path, start_dt)
             print("I do not think error is right here")
             processing_queue.put(item)
+            progress_broker.touch()
             print(f"Added job to queue: {item}")
             return jsonify({"message": "Job added successfully", "queue_size": processing_queue.qsize()}), 201
         except ValueError:
@@ -112,33 +142,42 @@ def create_app(processing_queue: Queue[ProcessingItem], set_frontend_status: Set
             print(f"Error adding job: {e}")
             return jsonify({"error": "Failed to add job"}), 500
         
+    def queue_status(snapshot=None):
+        queue_list = list(processing_queue.queue)  # Converts the queue to a list for easy indexing
+        if not queue_list:
+            return {"status": "not processing"}
+
+        current_item: ProcessingItem = queue_list[0]
+        on_deck_items = queue_list[1:]
+        snapshot = snapshot or progress_broker.snapshot()
+        return {
+            "status": "processing",
+            "current_process": {
+                "file_path": current_item[0],
+                "percent": get_process_percentage(),
+                # Per-camera files still being processed, with their own percentages
+                "files": snapshot["files"],
+            },
+            "processes_on_deck": [item[0] for item in on_deck_items]
+        }
+
     @app.route('/get-queue-status', methods=['GET'])
     def get_queue_status():
         """Returns the current status of the processing queue."""
         try:
-            queue_list = list(processing_queue.queue)  # Converts the queue to a list for easy indexing
-            queue_size = len(queue_list)
-
-            if queue_size == 0:
-                return jsonify({"status": "not processing"}), 200
-            else:
-                current_item: ProcessingItem = queue_list[0]
-                on_deck_items = queue_list[1:]
-                print("Percent: ", get_process_percentage())
-
-                response = {
-                    "status": "processing",
-                    "current_process": {
-                        "file_path": current_item[0],
-                        "percent": get_process_percentage()  # Hardcoded percent
-                    },
-                    "processes_on_deck": [item[0] for item in on_deck_items]
-                }
-
-                return jsonify(response), 200
+            return jsonify(queue_status()), 200
         except Exception as e:
             print(f"Error getting queue status: {e}")
             return jsonify({"error": "Failed to get queue status"}), 500
+
+    @app.route('/progress/events', methods=['GET'])
+    def progress_events():
+        """Server-sent events carrying the /get-queue-status payload whenever job or file progress changes."""
+        response = Response(sse_stream(progress_broker, queue_status), mimetype=SSE_MIMETYPE)
+        response.headers['Cache-Control'] = 'no-cache'
+        # Nothing in front of the stream may buffer it
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
         
 
     @app.route('/activity-data', methods=['GET'])
@@ -148,75 +187,631 @@ def create_app(processing_queue: Queue[ProcessingItem], set_frontend_status: Set
 
         if not all([start_time, end_time]):
             return jsonify({"error": "Missing required parameters."}), 400
+
+        try:
+            bucket_seconds = int(request.args.get('bucket_seconds', 1))
+            if bucket_seconds <= 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "'bucket_seconds' must be a positive integer."}), 400
+
+        try:
+            mimetype = negotiate_format(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 406
         
+        if wants_stream(request):
+            session = db.Session()
+            try:
+                etag, last_modified = range_validators(session, request, mimetype,
+                                                       datetime.fromisoformat(start_time), datetime.fromisoformat(end_time))
+                unchanged = not_modified(request, etag, last_modified)
+                if unchanged is not None:
+                    return unchanged
+                if not has_tracking_rows(session, start_time, end_time):
+                    return jsonify({"error": "No activity data found for the given time range."}), 404
+            except Exception as e:
+                return jsonify({"error": str(e)}), 500
+            finally:
+                session.close()
+            return with_validators(Response(stream_activity(db.Session, start_time, end_time, bucket_seconds, mimetype),
+                                            mimetype=stream_mimetype(mimetype)), etag, last_modified)
+
         try:
             session = db.Session()
-            activity = get_activity_helper(session, start_time, end_time)
+            dt_start = datetime.fromisoformat(start_time)
+            dt_end = datetime.fromisoformat(end_time)
+            # Validators are read before the data, so a concurrent write can only make them older
+            etag, last_modified = range_validators(session, request, mimetype, dt_start, dt_end)
+            unchanged = not_modified(request, etag, last_modified)
+            if unchanged is not None:
+                return unchanged
+
+            cache_key = query_cache.key(request, mimetype)
+            seen_event_id = query_cache.sync(session)
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                return with_validators(cached, etag, last_modified), 200
+
+            activity = get_activity_helper(session, start_time, end_time, bucket_seconds)
 
             if (activity is None) or (not activity) or len(activity) == 0:
                 return jsonify({"error": "No activity data found for the given time range."}), 404
             
-            return jsonify({"activity": activity}), 200
+            response = activity_response(mimetype, activity, bucket_seconds)
+            query_cache.put(cache_key, response, seen_event_id, dt_start, dt_end)
+            return with_validators(response, etag, last_modified), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
         
         finally:
             session.close()
 
+    @app.route('/activity-data/batch', methods=['POST'])
+    def get_activity_data_batch():
+        """Answers several ranges in one request, e.g. every side of a comparison.
+
+        Body: {"ranges": [{"start_time": .., "end_time": ..}, ...], "bucket_seconds": 1,
+               "cameras": [..], "metrics": ["activity", "active_frames", "total_frames"]}
+        """
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data.get('ranges'), list):
+            return jsonify({"error": "Request body must contain a 'ranges' list"}), 400
+
+        try:
+            ranges = [(item['start_time'], item['end_time']) for item in data['ranges']]
+            bucket_seconds = int(data.get('bucket_seconds', 1))
+            if bucket_seconds <= 0:
+                raise ValueError("'bucket_seconds' must be a positive integer.")
+        except (KeyError, TypeError):
+            return jsonify({"error": "Each range needs 'start_time' and 'end_time'."}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e) or "'bucket_seconds' must be a positive integer."}), 400
+
+        session = db.Session()
+        try:
+            batch = get_activity_batch_helper(session, ranges, bucket_seconds, data.get('cameras'),
+                                              data.get('metrics') or ["activity"])
+            return jsonify(batch), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/activity-rollup', methods=['GET'])
+    def get_activity_rollup():
+        """Returns activity counts from the coarsest rollup level that gives at least `points` buckets."""
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        cameras = request.args.get('cameras')
+
+        if not all([start_time, end_time]):
+            return jsonify({"error": "Missing required parameters."}), 400
+
+        try:
+            points = int(request.args.get('points', 300))
+            if points <= 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "'points' must be a positive integer."}), 400
+
+        session = db.Session()
+        try:
+            rollup = get_activity_rollup_helper(session, start_time, end_time, points, cameras.split(',') if cameras else None)
+
+            if not rollup:
+                return jsonify({"error": "No activity data found for the given time range."}), 404
+
+            return jsonify(rollup), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+        finally:
+            session.close()
+
+    @app.route('/activity-episodes', methods=['GET'])
+    def get_activity_episodes():
+        """Returns a page of activity episodes (start/end per camera) overlapping the range."""
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        camera_name = request.args.get('camera_name')
+
+        if not all([start_time, end_time]):
+            return jsonify({"error": "Missing required parameters."}), 400
+
+        try:
+            min_duration = request.args.get('min_duration', type=float)
+            limit = min(int(request.args.get('limit', 100)), 1000)
+            offset = int(request.args.get('offset', 0))
+            if limit <= 0 or offset < 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "'limit' must be positive and 'offset' must not be negative."}), 400
+
+        session = db.Session()
+        try:
+            page = get_episodes_helper(session, start_time, end_time, camera_name, min_duration, limit, offset)
+            return jsonify(page), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+        finally:
+            session.close()
+
+    @app.route('/zones', methods=['GET'])
+    def list_zones():
+        camera_name = request.args.get('camera_name')
+        session = db.Session()
+        try:
+            query = session.query(Zone)
+            if camera_name:
+                query = query.filter(Zone.camera_name == camera_name)
+            return jsonify({"zones": [zone_to_dict(zone) for zone in query.order_by(Zone.id)]}), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/zones', methods=['POST'])
+    @app.route('/zones/<int:zone_id>', methods=['PUT'])
+    def save_zone_route(zone_id=None):
+        """Creates or replaces a zone polygon ([[x, y], ...] in 640x480 processed-frame pixels)."""
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Request body must contain JSON data"}), 400
+
+        session = db.Session()
+        try:
+            zone = None
+            if zone_id is not None:
+                zone = session.get(Zone, zone_id)
+                if zone is None:
+                    return jsonify({"error": "Zone not found."}), 404
+            zone = save_zone(session, data.get('camera_name'), data.get('name'), data.get('polygon'), zone)
+            return jsonify({"zone": zone_to_dict(zone)}), 201 if zone_id is None else 200
+        except (ValueError, TypeError) as e:
+            session.rollback()
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            session.rollback()
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/zones/<int:zone_id>', methods=['DELETE'])
+    def delete_zone_route(zone_id):
+        session = db.Session()
+        try:
+            zone = session.get(Zone, zone_id)
+            if zone is None:
+                return jsonify({"error": "Zone not found."}), 404
+            delete_zone(session, zone)
+            return jsonify({"message": "Zone deleted"}), 200
+        except Exception as e:
+            session.rollback()
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/zone-occupancy', methods=['GET'])
+    def get_zone_occupancy_route():
+        """Returns dwell time and visit counts per zone of a camera, over whole hours covering the range."""
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        camera_name = request.args.get('camera_name')
+
+        if not all([start_time, end_time, camera_name]):
+            return jsonify({"error": "Missing required parameters."}), 400
+
+        session = db.Session()
+        try:
+            report = get_zone_occupancy(session, camera_name, datetime.fromisoformat(start_time), datetime.fromisoformat(end_time))
+            if not report["zones"]:
+                return jsonify({"error": "No zones defined for this camera."}), 404
+            return jsonify(report), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
     @app.route('/coordinate-data', methods=['GET'])
     def get_coordinate_data():
         start_time = request.args.get('start_time')
         end_time = request.args.get('end_time')
 
+        cameras = request.args.get('cameras')
+        strategy = request.args.get('downsample', 'stride')
+
         if not all([start_time, end_time]):
             return jsonify({"error": "Missing required parameters."}), 400
+
+        try:
+            max_points = request.args.get('max_points')
+            max_points = int(max_points) if max_points else None
+            if max_points is not None and max_points <= 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "'max_points' must be a positive integer."}), 400
+        if strategy not in DOWNSAMPLING_STRATEGIES:
+            return jsonify({"error": f"'downsample' must be one of: {', '.join(DOWNSAMPLING_STRATEGIES)}."}), 400
+
+        try:
+            mimetype = negotiate_format(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 406
         
+        camera_names = cameras.split(',') if cameras else None
+        if camera_names and any(camera not in CAMERA_NAMES for camera in camera_names):
+            return jsonify({"error": f"'cameras' must be a comma-separated list of: {', '.join(CAMERA_NAMES)}"}), 400
+
+        # Downsampled responses are small, so they are never streamed
+        if wants_stream(request) and not max_points:
+            session = db.Session()
+            try:
+                etag, last_modified = range_validators(session, request, mimetype, datetime.fromisoformat(start_time),
+                                                       datetime.fromisoformat(end_time), camera_names)
+                unchanged = not_modified(request, etag, last_modified)
+                if unchanged is not None:
+                    return unchanged
+            except Exception as e:
+                return jsonify({"error": str(e)}), 500
+            finally:
+                session.close()
+            return with_validators(Response(stream_coordinates(db.Session, start_time, end_time, camera_names, mimetype),
+                                            mimetype=stream_mimetype(mimetype)), etag, last_modified)
+
         try:
             session = db.Session()
-            coordinates = get_coordinate_helper(session, start_time, end_time)
+            dt_start = datetime.fromisoformat(start_time)
+            dt_end = datetime.fromisoformat(end_time)
+            etag, last_modified = range_validators(session, request, mimetype, dt_start, dt_end, camera_names)
+            unchanged = not_modified(request, etag, last_modified)
+            if unchanged is not None:
+                return unchanged
 
-            if not coordinates:
-                return jsonify({"error": "No activity data found for the given time range."}), 404
-            
-            return jsonify({"coordinates": coordinates}), 200
+            cache_key = query_cache.key(request, mimetype)
+            seen_event_id = query_cache.sync(session)
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                return with_validators(cached, etag, last_modified), 200
+
+            # Cameras without rows come back as empty lists, so an empty range is still a 200
+            coordinates = get_coordinate_arrays(session, start_time, end_time, camera_names, max_points, strategy)
+            response = coordinates_response(mimetype, coordinates, coordinates_to_json)
+            query_cache.put(cache_key, response, seen_event_id, dt_start, dt_end, camera_names)
+            return with_validators(response, etag, last_modified), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
         
         finally:
             session.close()
 
-    @app.route('/stitched-video', methods=['GET'])
-    def get_stitched_video():
+    @app.route('/heatmap-data', methods=['GET'])
+    def get_heatmap_data():
+        """Returns a 2D histogram of tracked positions per camera for a window, widened to whole minutes."""
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        cameras = request.args.get('cameras')
+
+        if not all([start_time, end_time]):
+            return jsonify({"error": "Missing required parameters."}), 400
+
+        session = db.Session()
+        try:
+            dt_start = datetime.fromisoformat(start_time)
+            dt_end = datetime.fromisoformat(end_time)
+            if dt_end <= dt_start:
+                raise ValueError("end_time must be after start_time.")
+
+            camera_names = cameras.split(',') if cameras else list(db.camera_dirs)
+            return jsonify(query_heatmap(session, dt_start, dt_end, camera_names)), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/sync/cursor', methods=['GET'])
+    def get_sync_cursor():
+        """Returns the current change cursor; pass it to /sync/changes after loading a range in full."""
+        session = db.Session()
+        try:
+            return jsonify({"cursor": current_cursor(session)}), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/sync/changes', methods=['GET'])
+    def get_sync_changes():
+        """Returns segments committed after `cursor` (optionally for one camera or time range) and the next cursor."""
         start_time = request.args.get('start_time')
         end_time = request.args.get('end_time')
         camera_name = request.args.get('camera_name')
 
+        try:
+            cursor = int(request.args.get('cursor', ''))
+            limit = min(int(request.args.get('limit', SYNC_EVENT_LIMIT)), 200)
+            if cursor < 0 or limit <= 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({"error": "'cursor' must be a non-negative integer and 'limit' positive."}), 400
+
+        session = db.Session()
+        try:
+            changes = changes_since(
+                session, cursor, camera_name,
+                datetime.fromisoformat(start_time) if start_time else None,
+                datetime.fromisoformat(end_time) if end_time else None,
+                limit,
+            )
+            return jsonify(changes), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/hls/playlist.m3u8', methods=['GET'])
+    def get_hls_playlist():
+        """Returns an HLS playlist of byte ranges over the stored segments of one camera; nothing is re-encoded."""
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        camera_name = request.args.get('camera_name')
 
         if not all([start_time, end_time, camera_name]):
             return jsonify({"error": "Missing required parameters."}), 400
 
+        session = db.Session()
         try:
-            session = db.Session()
-            print (f"Start time: {start_time}")
-            print (f"End time: {end_time}")
-            camera_videos = find_relevant_videos(session, start_time, end_time, camera_name)
+            etag, last_modified = range_validators(session, request, HLS_MIMETYPE, datetime.fromisoformat(start_time),
+                                                   datetime.fromisoformat(end_time), [camera_name])
+            prefetcher.observe(client_id(), camera_name, start_time, end_time, kind="playlist")
+            unchanged = not_modified(request, etag, last_modified)
+            if unchanged is not None:
+                return unchanged
 
-            if not camera_videos:
+            camera_videos = find_relevant_videos(session, start_time, end_time, camera_name)
+            ensure_fragment_index(session, camera_videos["selected"])
+            # Segment URIs are relative to this playlist
+            playlist = build_playlist(
+                [(video, *clip) for video, clip in zip(camera_videos["selected"], camera_videos["clips"])],
+                lambda video: f"video/{video.id}",
+            )
+            if playlist is None:
                 return jsonify({"error": "No videos found for the given time range."}), 404
+            return with_validators(Response(playlist, mimetype=HLS_MIMETYPE), etag, last_modified), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/hls/video/<int:video_id>', methods=['GET'])
+    def get_hls_video(video_id):
+        """Serves a stored segment file; players fetch playlist entries from it with Range requests."""
+        session = db.Session()
+        try:
+            video = session.get(ProcessedVideo, video_id)
+            if video is None or not video.filepath or not os.path.exists(video.filepath):
+                return jsonify({"error": "Video not found."}), 404
+            return send_file(video.filepath, mimetype='video/mp4', conditional=True)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/thumbnails/index.vtt', methods=['GET'])
+    def get_thumbnail_index():
+        """Returns a WebVTT track of timeline thumbnails for one camera, each cue pointing at a sprite tile."""
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        camera_name = request.args.get('camera_name')
+
+        if not all([start_time, end_time, camera_name]):
+            return jsonify({"error": "Missing required parameters."}), 400
+
+        session = db.Session()
+        try:
+            dt_start = datetime.fromisoformat(start_time)
+            dt_end = datetime.fromisoformat(end_time)
+            if dt_end <= dt_start:
+                raise ValueError("end_time must be after start_time.")
 
-            stitched_video_path = stitch_videos(camera_videos["selected"], camera_name, start_time, end_time)
+            etag, last_modified = range_validators(session, request, VTT_MIMETYPE, dt_start, dt_end, [camera_name])
+            unchanged = not_modified(request, etag, last_modified)
+            if unchanged is not None:
+                return unchanged
 
-            print("Sam here lol")
-            print(f"Stitched video path: {stitched_video_path}")
+            # Sprite URIs are relative to this track
+            vtt = build_thumbnail_vtt(find_sprites(session, camera_name, dt_start, dt_end), dt_start, dt_end,
+                                      lambda sprite: f"sprites/{sprite.id}.jpg")
+            if vtt is None:
+                return jsonify({"error": "No thumbnails found for the given time range."}), 404
+            return with_validators(Response(vtt, mimetype=VTT_MIMETYPE), etag, last_modified), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/thumbnails/sprites/<int:sprite_id>.jpg', methods=['GET'])
+    def get_thumbnail_sprite(sprite_id):
+        """Serves a sprite sheet. Sheets are never rewritten, so clients may cache them indefinitely."""
+        session = db.Session()
+        try:
+            sprite = session.get(ThumbnailSprite, sprite_id)
+            if sprite is None:
+                return jsonify({"error": "Sprite not found."}), 404
+            response = Response(sprite.image, mimetype='image/jpeg')
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            return response, 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/highlights', methods=['GET'])
+    def get_highlights():
+        """Lists the sections of a camera's highlight reel for a day: real start/end and where each begins in the reel."""
+        camera_name = request.args.get('camera_name')
+        if not camera_name or not request.args.get('date'):
+            return jsonify({"error": "Missing required parameters."}), 400
+
+        session = db.Session()
+        try:
+            sections = highlight_plan(session, camera_name, *highlight_params(request.args))
+            return jsonify([
+                {
+                    "start_time": section["start"].isoformat(),
+                    "end_time": section["end"].isoformat(),
+                    "reel_offset": round(section["reel_offset"], 3),
+                    "duration": round(sum(out_point - in_point for _, in_point, out_point in section["clips"]), 3),
+                }
+                for section in sections
+            ]), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/highlight-video', methods=['GET'])
+    def get_highlight_video_route():
+        """Returns one video of a camera's active moments for a day (?date=YYYY-MM-DD&padding=&merge_gap=&min_duration=)."""
+        camera_name = request.args.get('camera_name')
+        if not camera_name or not request.args.get('date'):
+            return jsonify({"error": "Missing required parameters."}), 400
+
+        session = db.Session()
+        try:
+            day_start, day_end, padding, merge_gap, min_duration = highlight_params(request.args)
+            etag, last_modified = range_validators(session, request, 'video/mp4', day_start, day_end, [camera_name])
+            unchanged = not_modified(request, etag, last_modified)
+            if unchanged is not None:
+                return unchanged
+
+            path = get_highlight_video(session, stitch_cache, camera_name, day_start, day_end,
+                                       padding, merge_gap, min_duration)
+            if not path:
+                return jsonify({"error": "No activity with footage found for the given day."}), 404
+            response = send_file(path, mimetype='video/mp4', conditional=True, etag=False)
+            return with_validators(response, etag, last_modified)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            session.close()
+
+    @app.route('/stitch-jobs', methods=['POST'])
+    def submit_stitch_job():
+        """Starts stitching a range for several cameras in parallel. Body: {"start_time", "end_time", "cameras": [..]}"""
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Request body must contain JSON data"}), 400
+
+        start_time = data.get('start_time')
+        end_time = data.get('end_time')
+        cameras = data.get('cameras') or list(db.camera_dirs)
+        if not all([start_time, end_time]):
+            return jsonify({"error": "Missing 'start_time' or 'end_time' in JSON body"}), 400
+        if not isinstance(cameras, list) or any(camera not in db.camera_dirs for camera in cameras):
+            return jsonify({"error": f"'cameras' must be a list of: {', '.join(db.camera_dirs)}"}), 400
+
+        try:
+            return jsonify(stitch_jobs.submit(start_time, end_time, cameras)), 202
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/stitch-jobs/<job_id>', methods=['GET'])
+    def get_stitch_job(job_id):
+        """Returns job progress. With ?revision=N&wait=S, waits up to S seconds for a newer revision."""
+        try:
+            wait = min(float(request.args.get('wait', 0)), 30.0)
+            revision = request.args.get('revision', type=int)
+        except ValueError:
+            return jsonify({"error": "'wait' must be a number of seconds."}), 400
+
+        status = stitch_jobs.status(job_id, wait, revision)
+        if status is None:
+            return jsonify({"error": "Job not found."}), 404
+        return jsonify(status), 200
+
+    @app.route('/stitch-jobs/<job_id>', methods=['DELETE'])
+    def cancel_stitch_job(job_id):
+        if not stitch_jobs.cancel(job_id):
+            return jsonify({"error": "Job not found."}), 404
+        return jsonify(stitch_jobs.status(job_id)), 200
+
+    @app.route('/stitch-jobs/<job_id>/video/<camera_name>', methods=['GET'])
+    def get_stitch_job_video(job_id, camera_name):
+        status = stitch_jobs.status(job_id)
+        if status is None or camera_name not in status["cameras"]:
+            return jsonify({"error": "Job not found."}), 404
+        state = status["cameras"][camera_name]["state"]
+        if state != "done":
+            return jsonify({"error": f"Video is not ready ({state})."}), 409
+
+        path = stitch_jobs.result_path(job_id, camera_name)
+        if not path or not os.path.exists(path):
+            return jsonify({"error": "Video is no longer cached; submit the job again."}), 410
+        return send_file(path, as_attachment=True, mimetype='video/mp4')
+
+    @app.route('/server-stats', methods=['GET'])
+    def get_server_stats():
+        """Returns active and rejected requests per concurrency class when served through the limiter."""
+        limiter = app.config.get("CONCURRENCY_LIMITER")
+        return jsonify(limiter.stats() if limiter else {}), 200
+
+    @app.route('/stitch-cache/stats', methods=['GET'])
+    def get_stitch_cache_stats():
+        return jsonify({**stitch_cache.stats(), "prefetch": prefetcher.stats()}), 200
+
+    @app.route('/stitched-video', methods=['GET'])
+    def get_stitched_video_route():
+        """Returns one camera's footage for a range as a single MP4, from the stitch cache when possible."""
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        camera_name = request.args.get('camera_name')
+
+        if not all([start_time, end_time, camera_name]):
+            return jsonify({"error": "Missing required parameters."}), 400
+
+        session = db.Session()
+        try:
+            etag, last_modified = range_validators(session, request, 'video/mp4', datetime.fromisoformat(start_time),
+                                                   datetime.fromisoformat(end_time), [camera_name])
+            # Queued now, the neighbouring windows start building once this one is served
+            prefetcher.observe(client_id(), camera_name, start_time, end_time)
+            # Checked before stitching, which is the expensive part
+            unchanged = not_modified(request, etag, last_modified)
+            if unchanged is not None:
+                return unchanged
+
+            stitched_video_path = get_stitched_video(session, stitch_cache, camera_name, start_time, end_time)
             if not stitched_video_path:
-                return jsonify({"error": "No videso were stitched"}), 404
-            print("Sam here second lol")
+                return jsonify({"error": "No videos were stitched"}), 404
 
-            print(f"Here is the stiched video path{stitched_video_path}")
-            return send_file(stitched_video_path, as_attachment=True, mimetype='video/mp4')
+            response = send_file(stitched_video_path, as_attachment=True, mimetype='video/mp4', etag=False)
+            return with_validators(response, etag, last_modified)
         except Exception as e:
             return jsonify({"error 500": str(e)}), 500
-
         finally:
             session.close()
 
@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .models import ActivityEpisode, LemurTracking
+from src.processor.metadata_buffer import TRACKING_TIME_STAMP_GLOB, frame_timestamps
+
+# Active runs separated by at most this many seconds of inactivity are one episode
+EPISODE_MERGE_GAP_SECONDS = 2.0
+# Episodes shorter than this are kept in the index but hidden from listings by default
+EPISODE_MIN_DURATION_SECONDS = 1.0
+
+
+def find_episodes(records, fps, merge_gap_seconds=EPISODE_MERGE_GAP_SECONDS):
+    """Find gap-merged active runs in a segment's metadata buffer.
+
+    Returns a structured summary per episode: first and past-the-end frame index,
+    active frame count, peak blob area and the summed coordinates used for the centroid.
+    """
+    active = records["activity"]
+    if not active.any():
+        return []
+
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # Merge runs whose inactive gap is within the merge window
+    gap_frames = merge_gap_seconds * fps
+    keep = np.concatenate(([True], (starts[1:] - ends[:-1]) > gap_frames))
+    starts = starts[keep]
+    ends = ends[np.concatenate((keep[1:], [True]))]
+
+    has_coordinate = active & ~np.isnan(records["x"]) & ~np.isnan(records["y"])
+    x = np.where(has_coordinate, records["x"], 0).astype(np.float64)
+    y = np.where(has_coordinate, records["y"], 0).astype(np.float64)
+    area = np.where(active, records["area"], 0).astype(np.float64)
+
+    episodes = []
+    for start, end, active_frames, peak, sum_x, sum_y, coordinate_frames in zip(
+        starts, ends,
+        np.add.reduceat(active.astype(np.int64), starts),
+        np.maximum.reduceat(area, starts),
+        np.add.reduceat(x, starts),
+        np.add.reduceat(y, starts),
+        np.add.reduceat(has_coordinate.astype(np.int64), starts),
+    ):
+        # reduceat sums from each start up to the next one, so the inactive frames after this
+        # episode are included too; they add nothing because every summed array is zero there
+        episodes.append({
+            "start_frame": int(start),
+            "end_frame": int(end),
+            "active_frames": int(active_frames),
+            "peak_area": float(peak),
+            "sum_x": float(sum_x),
+            "sum_y": float(sum_y),
+            "centroid_frames": int(coordinate_frames),
+        })
+    return episodes
+
+
+def _merge_into(episode, other):
+    """Fold `other` (an ActivityEpisode) into the pending `episode` dict."""
+    episode["start_time"] = min(episode["start_time"], other.start_time)
+    episode["end_time"] = max(episode["end_time"], other.end_time)
+    episode["active_frames"] += other.active_frames
+    episode["peak_area"] = max(episode["peak_area"], other.peak_area or 0.0)
+    if other.centroid_frames:
+        episode["sum_x"] += other.centroid_x * other.centroid_frames
+        episode["sum_y"] += other.centroid_y * other.centroid_frames
+        episode["centroid_frames"] += other.centroid_frames
+
+
+def update_activity_episodes(Session, records, segment_start, fps, camera_name,
+                             merge_gap_seconds=EPISODE_MERGE_GAP_SECONDS):
+    """Add a segment's episodes to the index, merging with stored episodes within the gap.
+
+    Segments of one camera can be saved out of order by different workers, so an
+    episode is merged with every stored episode it touches on either side.
+    """
+    try:
+        episodes = find_episodes(records, fps, merge_gap_seconds)
+        if not episodes:
+            return 0
+
+        timestamps = frame_timestamps(records, segment_start, fps)
+        frame_duration = timedelta(seconds=1 / fps)
+        gap = timedelta(seconds=merge_gap_seconds)
+
+        # Take the write lock before looking for neighbours, so a segment saved in
+        # parallel sees this one's episodes instead of missing the merge
+        Session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        for episode in episodes:
+            episode["start_time"] = timestamps[episode["start_frame"]].astype("datetime64[us]").item()
+            episode["end_time"] = timestamps[episode["end_frame"] - 1].astype("datetime64[us]").item() + frame_duration
+
+            neighbours = Session.query(ActivityEpisode).filter(
+                ActivityEpisode.camera_name == camera_name,
+                ActivityEpisode.start_time <= episode["end_time"] + gap,
+                ActivityEpisode.end_time >= episode["start_time"] - gap,
+            ).all()
+            for neighbour in neighbours:
+                _merge_into(episode, neighbour)
+                Session.delete(neighbour)
+
+            centroid_frames = episode["centroid_frames"]
+            Session.add(ActivityEpisode(
+                camera_name=camera_name,
+                start_time=episode["start_time"],
+                end_time=episode["end_time"],
+                duration=(episode["end_time"] - episode["start_time"]).total_seconds(),
+                active_frames=episode["active_frames"],
+                peak_area=episode["peak_area"],
+                centroid_x=episode["sum_x"] / centroid_frames if centroid_frames else None,
+                centroid_y=episode["sum_y"] / centroid_frames if centroid_frames else None,
+                centroid_frames=centroid_frames,
+            ))
+            Session.flush()
+
+        Session.commit()
+        return len(episodes)
+
+    except Exception as e:
+        Session.rollback()
+        print(f"Error updating activity episodes: {e}")
+        raise e
+
+
+def backfill_activity_episodes(connection, merge_gap_seconds=EPISODE_MERGE_GAP_SECONDS):
+    """Index episodes for tracking rows saved before episodes existed. Runs only while the index is empty.
+
+    Each active row lasts until the camera's next row, like a frame lasts until the
+    next one; the camera's last row lasts as long as the gap before it. Blob areas
+    are not stored per row, so backfilled episodes have no peak area.
+    Returns the number of episodes written.
+    """
+    if connection.exec_driver_sql(f"SELECT 1 FROM {ActivityEpisode.__tablename__} LIMIT 1").first():
+        return 0
+
+    rows = connection.exec_driver_sql(
+        "SELECT camera_name, time_stamp, previous_stamp, next_stamp, coordinate_x, coordinate_y FROM ("
+        "SELECT camera_name, time_stamp, is_active, coordinate_x, coordinate_y, "
+        "LAG(time_stamp) OVER (PARTITION BY camera_name ORDER BY time_stamp) AS previous_stamp, "
+        "LEAD(time_stamp) OVER (PARTITION BY camera_name ORDER BY time_stamp) AS next_stamp "
+        f"FROM {LemurTracking.__tablename__} WHERE camera_name IS NOT NULL AND time_stamp GLOB ?"
+        ") WHERE is_active ORDER BY camera_name, time_stamp",
+        (TRACKING_TIME_STAMP_GLOB,),
+    )
+
+    def parse(stamp):
+        return datetime.fromisoformat(stamp[11:])
+
+    gap = timedelta(seconds=merge_gap_seconds)
+    episodes = []
+    episode = None
+    for camera_name, stamp, previous_stamp, next_stamp, x, y in rows:
+        start = parse(stamp)
+        if next_stamp is not None:
+            end = parse(next_stamp)
+        else:
+            end = start + (start - parse(previous_stamp) if previous_stamp is not None else timedelta(0))
+
+        if episode is None or camera_name != episode["camera_name"] or start - episode["end_time"] > gap:
+            episode = {"camera_name": camera_name, "start_time": start, "end_time": end,
+                       "active_frames": 0, "sum_x": 0.0, "sum_y": 0.0, "centroid_frames": 0}
+            episodes.append(episode)
+        episode["end_time"] = max(episode["end_time"], end)
+        episode["active_frames"] += 1
+        if x is not None and y is not None:
+            episode["sum_x"] += x
+            episode["sum_y"] += y
+            episode["centroid_frames"] += 1
+
+    if episodes:
+        connection.execute(ActivityEpisode.__table__.insert(), [
+            {
+                "camera_name": episode["camera_name"],
+                "start_time": episode["start_time"],
+                "end_time": episode["end_time"],
+                "duration": (episode["end_time"] - episode["start_time"]).total_seconds(),
+                "active_frames": episode["active_frames"],
+                "peak_area": None,
+                "centroid_x": episode["sum_x"] / episode["centroid_frames"] if episode["centroid_frames"] else None,
+                "centroid_y": episode["sum_y"] / episode["centroid_frames"] if episode["centroid_frames"] else None,
+                "centroid_frames": episode["centroid_frames"],
+            }
+            for episode in episodes
+        ])
+        print(f"Backfilled {len(episodes)} activity episodes from existing tracking data")
+    return len(episodes)
@@ -0,0 +1,210 @@
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .models import CoordinateHistogram, LemurTracking
+from src.processor.metadata_buffer import TRACKING_TIME_STAMP_GLOB, frame_timestamps
+
+# Coordinates are in processed-frame pixels
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+HEATMAP_BINS_X = 32
+HEATMAP_BINS_Y = 24
+CELL_COUNT = HEATMAP_BINS_X * HEATMAP_BINS_Y
+
+# Accumulator levels from coarsest to finest: (level name, numpy datetime unit, bucket width)
+HISTOGRAM_LEVELS = [
+    ("day", "D", timedelta(days=1)),
+    ("hour", "h", timedelta(hours=1)),
+    ("minute", "m", timedelta(minutes=1)),
+]
+MINUTE = HISTOGRAM_LEVELS[-1][2]
+# Accumulator rows inserted per statement during the backfill
+BACKFILL_BATCH_ROWS = 1000
+
+
+def encode_grid(grid: np.ndarray) -> bytes:
+    return zlib.compress(np.ascontiguousarray(grid, dtype=np.uint32).tobytes())
+
+
+def decode_grid(blob: bytes) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype=np.uint32).reshape(HEATMAP_BINS_Y, HEATMAP_BINS_X)
+
+
+def bin_coordinates(x, y):
+    """Flat grid cell index per point; -1 for points without coordinates."""
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    column = np.clip((np.nan_to_num(x) * HEATMAP_BINS_X / FRAME_WIDTH).astype(np.int64), 0, HEATMAP_BINS_X - 1)
+    row = np.clip((np.nan_to_num(y) * HEATMAP_BINS_Y / FRAME_HEIGHT).astype(np.int64), 0, HEATMAP_BINS_Y - 1)
+    return np.where(valid, row * HEATMAP_BINS_X + column, -1)
+
+
+def segment_histograms(records, segment_start, fps):
+    """Per-level histograms of a segment: {(level, bucket_start): (grid, samples)} for non-empty buckets."""
+    cells = bin_coordinates(records["x"].astype(np.float64), records["y"].astype(np.float64))
+    valid = cells >= 0
+    if not valid.any():
+        return {}
+
+    timestamps = frame_timestamps(records, segment_start, fps)[valid]
+    cells = cells[valid]
+
+    histograms = {}
+    for level, unit, _ in HISTOGRAM_LEVELS:
+        buckets, inverse = np.unique(timestamps.astype(f"datetime64[{unit}]"), return_inverse=True)
+        grids = np.bincount(inverse * CELL_COUNT + cells, minlength=len(buckets) * CELL_COUNT)
+        grids = grids.reshape(len(buckets), HEATMAP_BINS_Y, HEATMAP_BINS_X).astype(np.uint32)
+        for bucket, grid in zip(buckets.astype("datetime64[us]").astype(datetime), grids):
+            histograms[(level, bucket)] = (grid, int(grid.sum()))
+    return histograms
+
+
+def update_coordinate_histograms(Session, records, segment_start, fps, camera_name):
+    """Add a segment's coordinates to the per-minute, per-hour and per-day accumulators."""
+    histograms = segment_histograms(records, segment_start, fps)
+    if not histograms:
+        return
+
+    try:
+        # Take the write lock before reading, so a concurrent worker's read-modify-write waits for ours
+        Session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        existing = {
+            (row.level, row.bucket_start): row
+            for level, _, _ in HISTOGRAM_LEVELS
+            for row in Session.query(CoordinateHistogram).filter(
+                CoordinateHistogram.camera_name == camera_name,
+                CoordinateHistogram.level == level,
+                CoordinateHistogram.bucket_start.in_([key[1] for key in histograms if key[0] == level]),
+            )
+        }
+        for (level, bucket_start), (grid, samples) in histograms.items():
+            row = existing.get((level, bucket_start))
+            if row is None:
+                Session.add(CoordinateHistogram(
+                    camera_name=camera_name, level=level, bucket_start=bucket_start,
+                    counts=encode_grid(grid), samples=samples,
+                ))
+            else:
+                row.counts = encode_grid(decode_grid(row.counts) + grid)
+                row.samples += samples
+        Session.commit()
+    except Exception as e:
+        Session.rollback()
+        print(f"Error updating coordinate histograms: {e}")
+        raise e
+
+
+def backfill_coordinate_histograms(connection):
+    """Build accumulators for tracking rows saved before they existed. Runs only while the table is empty.
+
+    Rows are binned and counted per camera, minute and cell in SQL; minute grids are
+    written as they complete and summed into hour and day grids.
+    Returns the number of accumulator rows written.
+    """
+    if connection.exec_driver_sql(f"SELECT 1 FROM {CoordinateHistogram.__tablename__} LIMIT 1").first():
+        return 0
+
+    # Same cells as bin_coordinates; CAST truncates toward zero like astype(int64)
+    column = f"MIN(MAX(CAST(coordinate_x * {HEATMAP_BINS_X} / {FRAME_WIDTH}.0 AS INTEGER), 0), {HEATMAP_BINS_X - 1})"
+    row = f"MIN(MAX(CAST(coordinate_y * {HEATMAP_BINS_Y} / {FRAME_HEIGHT}.0 AS INTEGER), 0), {HEATMAP_BINS_Y - 1})"
+    cells = connection.exec_driver_sql(
+        f"SELECT camera_name, substr(time_stamp, 12, 16) AS minute, {row} * {HEATMAP_BINS_X} + {column} AS cell, "
+        f"COUNT(*) FROM {LemurTracking.__tablename__} "
+        "WHERE camera_name IS NOT NULL AND coordinate_x IS NOT NULL AND coordinate_y IS NOT NULL AND time_stamp GLOB ? "
+        "GROUP BY camera_name, minute, cell ORDER BY camera_name, minute",
+        (TRACKING_TIME_STAMP_GLOB,),
+    )
+
+    written = 0
+    pending = []
+    coarse = {}
+
+    def add(camera_name, level, bucket_start, grid):
+        nonlocal written
+        pending.append({"camera_name": camera_name, "level": level, "bucket_start": bucket_start,
+                        "counts": encode_grid(grid), "samples": int(grid.sum())})
+        written += 1
+        if len(pending) >= BACKFILL_BATCH_ROWS:
+            connection.execute(CoordinateHistogram.__table__.insert(), pending)
+            pending.clear()
+
+    key = minute_row = None
+    for camera_name, minute, cell, count in cells:
+        if (camera_name, minute) != key:
+            if minute_row is not None:
+                add(*minute_row)
+            key = (camera_name, minute)
+            bucket_start = datetime.fromisoformat(minute)
+            minute_row = (camera_name, "minute", bucket_start, np.zeros(CELL_COUNT, dtype=np.uint32))
+            coarse_grids = [
+                coarse.setdefault((camera_name, level, start), np.zeros(CELL_COUNT, dtype=np.uint32))
+                for level, start in (("hour", bucket_start.replace(minute=0)),
+                                     ("day", bucket_start.replace(hour=0, minute=0)))
+            ]
+        for grid in [minute_row[3], *coarse_grids]:
+            grid[cell] += count
+    if minute_row is not None:
+        add(*minute_row)
+    for (camera_name, level, bucket_start), grid in coarse.items():
+        add(camera_name, level, bucket_start, grid)
+    if pending:
+        connection.execute(CoordinateHistogram.__table__.insert(), pending)
+
+    if written:
+        print(f"Backfilled {written} coordinate histogram rows from existing tracking data")
+    return written
+
+
+def cover_window(dt_start, dt_end):
+    """Split a minute-aligned window into the fewest aligned day/hour/minute buckets."""
+    pieces = []
+    current = dt_start
+    while current < dt_end:
+        for level, unit, width in HISTOGRAM_LEVELS:
+            aligned = np.datetime64(current, unit).astype("datetime64[us]").astype(datetime) == current
+            if aligned and current + width <= dt_end:
+                pieces.append((level, current))
+                current += width
+                break
+    return pieces
+
+
+def query_heatmap(session, dt_start, dt_end, cameras):
+    """Sum stored accumulators into one grid per camera for [start, end), widened to whole minutes."""
+    window_start = dt_start.replace(second=0, microsecond=0)
+    window_end = dt_end.replace(second=0, microsecond=0)
+    if window_end < dt_end:
+        window_end += MINUTE
+
+    pieces = cover_window(window_start, window_end)
+    grids = {camera: np.zeros((HEATMAP_BINS_Y, HEATMAP_BINS_X), dtype=np.uint64) for camera in cameras}
+    samples = dict.fromkeys(cameras, 0)
+
+    for level, _, _ in HISTOGRAM_LEVELS:
+        bucket_starts = [bucket_start for piece_level, bucket_start in pieces if piece_level == level]
+        if not bucket_starts:
+            continue
+        rows = session.query(
+            CoordinateHistogram.camera_name, CoordinateHistogram.counts, CoordinateHistogram.samples
+        ).filter(
+            CoordinateHistogram.camera_name.in_(cameras),
+            CoordinateHistogram.level == level,
+            CoordinateHistogram.bucket_start.in_(bucket_starts),
+        )
+        for camera_name, counts, count in rows:
+            grids[camera_name] += decode_grid(counts)
+            samples[camera_name] += count
+
+    return {
+        "start_time": window_start.isoformat(),
+        "end_time": window_end.isoformat(),
+        "frame_width": FRAME_WIDTH,
+        "frame_height": FRAME_HEIGHT,
+        "bins_x": HEATMAP_BINS_X,
+        "bins_y": HEATMAP_BINS_Y,
+        "cameras": {
+            camera: {"grid": grids[camera].tolist(), "max": int(grids[camera].max()), "samples": samples[camera]}
+            for camera in cameras
+        },
+    }
@@ -0,0 +1,114 @@
+import re
+from datetime import date, datetime, timedelta
+
+from .conditional import range_version
+from .endpoint_helpers import clip_offsets, find_relevant_videos, stitch_clips
+from .keyframes import KEYFRAME_TOLERANCE_SECONDS, ensure_keyframes
+from .models import ActivityEpisode
+
+# Footage kept around each active interval, and the largest quiet gap folded into one clip
+HIGHLIGHT_PADDING_SECONDS = 2.0
+HIGHLIGHT_MERGE_GAP_SECONDS = 10.0
+HIGHLIGHT_MIN_DURATION_SECONDS = 1.0
+MAX_HIGHLIGHT_PADDING_SECONDS = 60.0
+MAX_HIGHLIGHT_MERGE_GAP_SECONDS = 600.0
+
+
+def highlight_params(args):
+    """(day start, day end, padding, merge_gap, min_duration) from request args; raises ValueError when invalid."""
+    day = date.fromisoformat(args.get("date", ""))
+    padding = float(args.get("padding", HIGHLIGHT_PADDING_SECONDS))
+    merge_gap = float(args.get("merge_gap", HIGHLIGHT_MERGE_GAP_SECONDS))
+    min_duration = float(args.get("min_duration", HIGHLIGHT_MIN_DURATION_SECONDS))
+    if not 0 <= padding <= MAX_HIGHLIGHT_PADDING_SECONDS:
+        raise ValueError(f"padding must be between 0 and {MAX_HIGHLIGHT_PADDING_SECONDS:g} seconds.")
+    if not 0 <= merge_gap <= MAX_HIGHLIGHT_MERGE_GAP_SECONDS:
+        raise ValueError(f"merge_gap must be between 0 and {MAX_HIGHLIGHT_MERGE_GAP_SECONDS:g} seconds.")
+    if min_duration < 0:
+        raise ValueError("min_duration must not be negative.")
+    day_start = datetime.combine(day, datetime.min.time())
+    return day_start, day_start + timedelta(days=1), padding, merge_gap, min_duration
+
+
+def merge_intervals(intervals, dt_start, dt_end, padding, merge_gap):
+    """Pad (start, end) intervals, clip them to [dt_start, dt_end] and merge those at most `merge_gap` apart."""
+    pad = timedelta(seconds=padding)
+    gap = timedelta(seconds=merge_gap)
+    merged = []
+    for start, end in sorted(intervals):
+        start, end = max(start - pad, dt_start), min(end + pad, dt_end)
+        if end <= start:
+            continue
+        if merged and start - merged[-1][1] <= gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+def active_intervals(session, camera_name, dt_start, dt_end, min_duration):
+    """(start, end) of the camera's indexed activity episodes overlapping the range."""
+    return session.query(ActivityEpisode.start_time, ActivityEpisode.end_time).filter(
+        ActivityEpisode.camera_name == camera_name,
+        ActivityEpisode.start_time < dt_end,
+        ActivityEpisode.end_time > dt_start,
+        ActivityEpisode.duration >= min_duration,
+    ).order_by(ActivityEpisode.start_time).all()
+
+
+def highlight_plan(session, camera_name, dt_start, dt_end, padding=HIGHLIGHT_PADDING_SECONDS,
+                   merge_gap=HIGHLIGHT_MERGE_GAP_SECONDS, min_duration=HIGHLIGHT_MIN_DURATION_SECONDS):
+    """The reel's sections in order: {"start", "end", "reel_offset", "clips": [(video, in, out), ...]}.
+
+    The range's videos are fetched once and matched to the merged intervals in a
+    single pass. Intervals without footage are left out, so reel offsets only
+    count footage that is actually in the reel.
+    """
+    intervals = merge_intervals(
+        active_intervals(session, camera_name, dt_start, dt_end, min_duration), dt_start, dt_end, padding, merge_gap
+    )
+    if not intervals:
+        return []
+    videos = find_relevant_videos(session, dt_start.isoformat(), dt_end.isoformat(), camera_name)["selected"]
+
+    sections = []
+    reel_offset = 0.0
+    first_video = 0
+    for start, end in intervals:
+        # Videos are in time order and so are intervals; skip the ones that end before this interval
+        while first_video < len(videos) and videos[first_video].end_time <= start:
+            first_video += 1
+        clips = []
+        for video in videos[first_video:]:
+            if video.start_time >= end:
+                break
+            in_point, out_point = clip_offsets(video, start, end)
+            if out_point - in_point > KEYFRAME_TOLERANCE_SECONDS:
+                clips.append((video, in_point, out_point))
+        if clips:
+            sections.append({"start": start, "end": end, "reel_offset": reel_offset, "clips": clips})
+            reel_offset += sum(out_point - in_point for _, in_point, out_point in clips)
+    return sections
+
+
+def highlight_filename(camera_name, dt_start, dt_end, padding, merge_gap, min_duration, version):
+    """Cache file name for a reel; the parameters and the range's ingest version are part of the key."""
+    safe = re.sub(r"[^0-9A-Za-z]+", "-", f"{dt_start.isoformat()}_{dt_end.isoformat()}_p{padding:g}_g{merge_gap:g}_m{min_duration:g}")
+    return f"{camera_name}_highlights_{safe}_{version}.mp4"
+
+
+def get_highlight_video(session, stitch_cache, camera_name, dt_start, dt_end, padding=HIGHLIGHT_PADDING_SECONDS,
+                        merge_gap=HIGHLIGHT_MERGE_GAP_SECONDS, min_duration=HIGHLIGHT_MIN_DURATION_SECONDS,
+                        on_progress=None):
+    """Path of the highlight reel from the stitch cache, building it on a miss. None if nothing was active."""
+    version, _ = range_version(session, dt_start, dt_end, [camera_name])
+
+    def build(output_path):
+        sections = highlight_plan(session, camera_name, dt_start, dt_end, padding, merge_gap, min_duration)
+        clips = [clip for section in sections for clip in section["clips"]]
+        ensure_keyframes(session, list({video.id: video for video, _, _ in clips}.values()))
+        return stitch_clips(clips, output_path, on_progress)
+
+    return stitch_cache.get_or_build(
+        highlight_filename(camera_name, dt_start, dt_end, padding, merge_gap, min_duration, version), build
+    )
@@ -0,0 +1,213 @@
+import json
+import math
+import os
+import struct
+import subprocess
+
+# Processed segments are written as fragmented MP4 (one fragment per GOP), so any
+# range can be played from the stored files through byte-range HLS playlists
+FRAGMENTED_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+HLS_MIMETYPE = "application/vnd.apple.mpegurl"
+_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"mvex", b"moof", b"traf"}
+
+
+def _read_boxes(data, offset=0, end=None):
+    """Yield (type, payload_start, box_end) for the boxes in data[offset:end]."""
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            raise ValueError(f"Malformed MP4 box at offset {offset}")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _find(data, path, offset=0, end=None):
+    """Payload (start, end) of the first box along `path`, e.g. [b"trak", b"mdia", b"mdhd"]."""
+    for box_type, start, box_end in _read_boxes(data, offset, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return start, box_end
+            if box_type in _CONTAINER_BOXES:
+                found = _find(data, path[1:], start, box_end)
+                if found:
+                    return found
+    return None
+
+
+def _top_level_boxes(f):
+    """(type, offset, size) of a file's top-level boxes, reading only their headers."""
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        size, box_type = struct.unpack_from(">I4s", header)
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+        elif size == 0:
+            size = file_size - offset
+        if size < 8:
+            raise ValueError(f"Malformed MP4 box at offset {offset}")
+        yield box_type, offset, size
+        offset += size
+
+
+def _moov_defaults(moov):
+    """(timescale, trex default sample duration) of the first track."""
+    mdhd_start, _ = _find(moov, [b"trak", b"mdia", b"mdhd"])
+    version = moov[mdhd_start]
+    timescale = struct.unpack_from(">I", moov, mdhd_start + (20 if version == 1 else 12))[0]
+
+    default_duration = 0
+    trex = _find(moov, [b"mvex", b"trex"])
+    if trex:
+        default_duration = struct.unpack_from(">I", moov, trex[0] + 12)[0]
+    return timescale, default_duration
+
+
+def _fragment_timing(moof, default_duration):
+    """(base decode time, summed sample durations) of a moof box's first track fragment."""
+    traf = _find(moof, [b"traf"])
+    tfhd_start, _ = _find(moof, [b"tfhd"], *traf)
+    tfhd_flags = struct.unpack_from(">I", moof, tfhd_start)[0] & 0xFFFFFF
+    position = tfhd_start + 8
+    position += 8 if tfhd_flags & 0x01 else 0
+    position += 4 if tfhd_flags & 0x02 else 0
+    if tfhd_flags & 0x08:
+        default_duration = struct.unpack_from(">I", moof, position)[0]
+
+    base_time = 0
+    tfdt = _find(moof, [b"tfdt"], *traf)
+    if tfdt:
+        version = moof[tfdt[0]]
+        base_time = struct.unpack_from(">Q" if version == 1 else ">I", moof, tfdt[0] + 4)[0]
+
+    duration = 0
+    for box_type, start, _ in _read_boxes(moof, *traf):
+        if box_type != b"trun":
+            continue
+        flags = struct.unpack_from(">I", moof, start)[0] & 0xFFFFFF
+        sample_count = struct.unpack_from(">I", moof, start + 4)[0]
+        position = start + 8 + (4 if flags & 0x01 else 0) + (4 if flags & 0x04 else 0)
+        stride = 4 * bin(flags & 0xF00).count("1")
+        if flags & 0x100:
+            for sample in range(sample_count):
+                duration += struct.unpack_from(">I", moof, position + sample * stride)[0]
+        else:
+            duration += default_duration * sample_count
+    return base_time, duration
+
+
+def index_fragments(path):
+    """Byte ranges of a fragmented MP4: {"init": [offset, length], "fragments": [[offset, length, start, duration], ...]}.
+
+    Times are in seconds. Returns None for an MP4 that is not fragmented.
+    Only box headers, moov and moof boxes are read, never the media data.
+    """
+    with open(path, "rb") as f:
+        boxes = list(_top_level_boxes(f))
+        moov = next(((offset, size) for box_type, offset, size in boxes if box_type == b"moov"), None)
+        if moov is None or not any(box_type == b"moof" for box_type, _, _ in boxes):
+            return None
+
+        f.seek(moov[0])
+        timescale, default_duration = _moov_defaults(f.read(moov[1])[8:])
+
+        fragments = []
+        for index, (box_type, offset, size) in enumerate(boxes):
+            if box_type != b"moof":
+                continue
+            f.seek(offset)
+            base_time, duration = _fragment_timing(f.read(size)[8:], default_duration)
+            # A fragment is the moof plus everything up to the next moof (its mdat)
+            end = next((o for t, o, _ in boxes[index + 1:] if t == b"moof"), boxes[-1][1] + boxes[-1][2])
+            fragments.append([offset, end - offset, round(base_time / timescale, 6), round(duration / timescale, 6)])
+
+    return {"init": [0, moov[0] + moov[1]], "fragments": fragments}
+
+
+def make_fragmented(path):
+    """Remux a non-fragmented MP4 in place (stream copy); the file is replaced atomically."""
+    temp_path = f"{path}.fragmenting.mp4"
+    try:
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-i", path, "-c", "copy",
+            "-movflags", FRAGMENTED_MOVFLAGS, temp_path, "-y",
+        ], check=True)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def video_fragments(video):
+    return json.loads(video.fragments) if video.fragments else None
+
+
+def ensure_fragment_index(session, videos):
+    """Index videos saved before the fragment index existed, remuxing older non-fragmented files once."""
+    missing = [video for video in videos if video.fragments is None]
+    for video in missing:
+        fragments = index_fragments(video.filepath)
+        if fragments is None:
+            make_fragmented(video.filepath)
+            fragments = index_fragments(video.filepath)
+        video.fragments = json.dumps(fragments)
+    if missing:
+        session.commit()
+
+
+def build_playlist(clips, segment_uri):
+    """A VOD HLS playlist of byte ranges over stored files.
+
+    `clips` is a list of (video, in_point, out_point). Whole fragments covering
+    each clip are listed, so boundaries are GOP-aligned; EXT-X-START points the
+    player at the exact requested start within the first fragment.
+    """
+    lines = []
+    target_duration = 1
+    start_offset = None
+    for video, in_point, out_point in clips:
+        index = video_fragments(video)
+        if not index:
+            continue
+        selected = [
+            fragment for fragment in index["fragments"]
+            if fragment[2] < out_point and fragment[2] + fragment[3] > in_point
+        ]
+        if not selected:
+            continue
+
+        if start_offset is None:
+            start_offset = in_point - selected[0][2]
+        else:
+            lines.append("#EXT-X-DISCONTINUITY")
+        init_offset, init_length = index["init"]
+        uri = segment_uri(video)
+        lines.append(f'#EXT-X-MAP:URI="{uri}",BYTERANGE="{init_length}@{init_offset}"')
+        for offset, length, _, duration in selected:
+            target_duration = max(target_duration, math.ceil(duration))
+            lines.append(f"#EXTINF:{duration:.6f},")
+            lines.append(f"#EXT-X-BYTERANGE:{length}@{offset}")
+            lines.append(uri)
+
+    if start_offset is None:
+        return None
+
+    header = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{target_duration}",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+        f"#EXT-X-START:TIME-OFFSET={start_offset:.6f},PRECISE=YES",
+    ]
+    return "\n".join(header + lines + ["#EXT-X-ENDLIST"]) + "\n"
@@ -0,0 +1,62 @@
+import json
+import subprocess
+
+# Processed segments are encoded with a keyframe at least this often, so a cut
+# never needs more than this much video re-encoded
+KEYFRAME_INTERVAL_SECONDS = 2.0
+# Cut points closer than this to a keyframe are treated as on it
+KEYFRAME_TOLERANCE_SECONDS = 0.001
+
+
+def gop_size(fps):
+    return max(1, int(round(fps * KEYFRAME_INTERVAL_SECONDS)))
+
+
+def parse_keyframe_packets(output):
+    """Keyframe times from `ffprobe -show_entries packet=pts_time,flags -of csv=p=0` output."""
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.strip().partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(round(float(pts_time), 6))
+    return sorted(keyframes)
+
+
+def probe_keyframes(path):
+    """Keyframe times (seconds) of a video's first video stream. Reads packet headers only."""
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path,
+    ], capture_output=True, text=True, check=True)
+    return parse_keyframe_packets(result.stdout)
+
+
+def video_keyframes(video):
+    return json.loads(video.keyframes) if video.keyframes else None
+
+
+def ensure_keyframes(session, videos):
+    """Probe and store the keyframe index of videos saved before it was recorded."""
+    missing = [video for video in videos if video.keyframes is None]
+    for video in missing:
+        video.keyframes = json.dumps(probe_keyframes(video.filepath))
+    if missing:
+        session.commit()
+
+
+def plan_clip(keyframes, in_point, out_point):
+    """Split [in_point, out_point) of a video into ("encode" | "copy", start, end) parts.
+
+    Stream copy has to start on a keyframe, so only the partial GOP before the
+    first keyframe at or after in_point is re-encoded. Copies may end anywhere:
+    segments are encoded without B-frames, so no kept frame depends on a later one.
+    """
+    if out_point - in_point <= KEYFRAME_TOLERANCE_SECONDS:
+        return []
+
+    next_keyframe = next((kf for kf in keyframes if kf >= in_point - KEYFRAME_TOLERANCE_SECONDS), None)
+    if next_keyframe is not None and next_keyframe <= in_point + KEYFRAME_TOLERANCE_SECONDS:
+        return [("copy", next_keyframe, out_point)]
+    if next_keyframe is None or next_keyframe >= out_point:
+        return [("encode", in_point, out_point)]
+    return [("encode", in_point, next_keyframe), ("copy", next_keyframe, out_point)]
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, Boolean, DateTime, Float, String
+from sqlalchemy import Column, Integer, Boolean, DateTime, Float, String, Text, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
 class LemurTracking(Base):
     __tablename__ = 'lemur_tracking'
+    __table_args__ = (
+        Index('ix_lemur_tracking_time_stamp', 'time_stamp'),
+        Index('ix_lemur_tracking_camera_time', 'camera_name', 'time_stamp'),
+        Index('ix_lemur_tracking_ingest_seq', 'ingest_seq'),
+    )
 
     id = Column(Integer, primary_key=True)
     time_stamp = Column(String)
@@ -12,9 +17,17 @@ class LemurTracking(Base):
     coordinate_x = Column(Float)
     coordinate_y = Column(Float)
     camera_name = Column(String)
+    # Id of the ingest event that committed the row; None for rows saved before it existed
+    ingest_seq = Column(Integer)
 
 class ProcessedVideo(Base):
     __tablename__ = 'processed_videos'
+    __table_args__ = (
+        Index('ix_processed_videos_ingest_seq', 'ingest_seq'),
+        Index('ix_processed_videos_camera_start', 'camera_name', 'start_time'),
+        # Lets MAX(duration) per camera bound interval lookups without a scan
+        Index('ix_processed_videos_camera_duration', 'camera_name', 'duration'),
+    )
     
     id = Column(Integer, primary_key=True)
     processed_filename = Column(String)
@@ -24,4 +37,118 @@ class ProcessedVideo(Base):
     frame_count = Column(Integer)
     resolution_width = Column(Integer)
     resolution_height = Column(Integer)
-    time_stamp=Column(String)
\ No newline at end of file
+    time_stamp=Column(String)
+    compacted = Column(Boolean, nullable=False, default=False)
+    ingest_seq = Column(Integer)
+    # time_stamp parsed once at save time; end_time is start_time + duration
+    start_time = Column(DateTime)
+    end_time = Column(DateTime)
+    # JSON list of keyframe times in seconds, probed after encoding
+    keyframes = Column(Text)
+    # JSON byte ranges of the init segment and each fragment, see hls.index_fragments
+    fragments = Column(Text)
+
+class ActivityRollup(Base):
+    __tablename__ = 'activity_rollups'
+    __table_args__ = (
+        UniqueConstraint('camera_name', 'level', 'bucket_start', name='uq_activity_rollup_bucket'),
+        # Range queries across all cameras; the unique constraint's index leads with the camera
+        Index('ix_activity_rollups_level_bucket', 'level', 'bucket_start'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    camera_name = Column(String, nullable=False)
+    level = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    active_frames = Column(Integer, nullable=False, default=0)
+    total_frames = Column(Integer, nullable=False, default=0)
+
+class ActivityEpisode(Base):
+    __tablename__ = 'activity_episodes'
+    __table_args__ = (
+        Index('ix_activity_episodes_camera_start', 'camera_name', 'start_time'),
+        Index('ix_activity_episodes_start', 'start_time'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    camera_name = Column(String, nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    duration = Column(Float, nullable=False)
+    active_frames = Column(Integer, nullable=False)
+    peak_area = Column(Float)
+    centroid_x = Column(Float)
+    centroid_y = Column(Float)
+    centroid_frames = Column(Integer, nullable=False, default=0)
+
+class Zone(Base):
+    __tablename__ = 'zones'
+
+    id = Column(Integer, primary_key=True)
+    camera_name = Column(String, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    # JSON list of [x, y] vertices in processed-frame pixels (640x480)
+    polygon = Column(String, nullable=False)
+
+class ZoneOccupancy(Base):
+    __tablename__ = 'zone_occupancy'
+    __table_args__ = (
+        UniqueConstraint('zone_id', 'hour_start', name='uq_zone_occupancy_hour'),
+        Index('ix_zone_occupancy_camera_hour', 'camera_name', 'hour_start'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    zone_id = Column(Integer, nullable=False)
+    camera_name = Column(String, nullable=False)
+    hour_start = Column(DateTime, nullable=False)
+    dwell_seconds = Column(Float, nullable=False, default=0.0)
+    visits = Column(Integer, nullable=False, default=0)
+
+class CoordinateHistogram(Base):
+    __tablename__ = 'coordinate_histograms'
+    __table_args__ = (
+        UniqueConstraint('camera_name', 'level', 'bucket_start', name='uq_coordinate_histogram_bucket'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    camera_name = Column(String, nullable=False)
+    level = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    # zlib-compressed uint32 grid of HEATMAP_BINS_Y x HEATMAP_BINS_X counts
+    counts = Column(LargeBinary, nullable=False)
+    samples = Column(Integer, nullable=False, default=0)
+
+class IngestEvent(Base):
+    """One row per committed write to tracking data or footage. Ids only ever increase."""
+    __tablename__ = 'ingest_events'
+    __table_args__ = (
+        Index('ix_ingest_events_range', 'start_time', 'end_time'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    # None when the write affects every camera
+    camera_name = Column(String)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    committed_at = Column(DateTime, nullable=False)
+
+class ThumbnailSprite(Base):
+    """A JPEG sheet of timeline thumbnails, tiled row-major, built while a segment is saved."""
+    __tablename__ = 'thumbnail_sprites'
+    __table_args__ = (
+        Index('ix_thumbnail_sprites_camera_start', 'camera_name', 'start_time'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    camera_name = Column(String, nullable=False)
+    # Time of the first tile; tile i shows start_time + i * interval_seconds
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    interval_seconds = Column(Float, nullable=False)
+    tile_count = Column(Integer, nullable=False)
+    columns = Column(Integer, nullable=False)
+    tile_width = Column(Integer, nullable=False)
+    tile_height = Column(Integer, nullable=False)
+    image = Column(LargeBinary, nullable=False)
@@ -0,0 +1,140 @@
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .endpoint_helpers import find_relevant_videos
+from .hls import ensure_fragment_index
+from .stitch_cache import BuildCancelled
+from .stitch_jobs import get_stitched_video
+
+# One background build at a time, and only while no foreground stitch is running
+PREFETCH_WORKERS = 1
+PREFETCH_HISTORY = 8
+# Longer windows are too expensive to build on speculation
+MAX_PREFETCH_WINDOW_SECONDS = 3 * 3600
+BUSY_POLL_SECONDS = 0.5
+
+
+class PrefetchCancelled(BuildCancelled):
+    pass
+
+
+def adjacent_windows(dt_start, dt_end, history=()):
+    """The next and previous windows of the same length, the likelier one first.
+
+    `history` holds earlier (start, end) requests; if the last step went
+    backwards through time, the previous window comes first.
+    """
+    length = dt_end - dt_start
+    following = (dt_end, dt_end + length)
+    preceding = (dt_start - length, dt_start)
+    for earlier_start, earlier_end in reversed(history):
+        if earlier_end - earlier_start == length and earlier_start != dt_start:
+            if earlier_start > dt_start:
+                return [preceding, following]
+            break
+    return [following, preceding]
+
+
+class Prefetcher:
+    """Builds the windows a reviewer is likely to open next, per client and camera.
+
+    Each request replaces that client's pending work for the camera: queued
+    builds that are no longer adjacent are cancelled, and a running one stops
+    at its next stitch step. Results land in the stitch cache (or, for HLS,
+    as warmed fragment indexes), so the follow-up request is a cache hit.
+    """
+
+    def __init__(self, Session, stitch_cache, is_busy=None):
+        self.Session = Session
+        self.stitch_cache = stitch_cache
+        self.is_busy = is_busy or (lambda: False)
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        self._history = defaultdict(lambda: deque(maxlen=PREFETCH_HISTORY))
+        self._pending = defaultdict(dict)
+        self._lock = threading.Lock()
+        self._stats = {"scheduled": 0, "completed": 0, "cancelled": 0, "failed": 0}
+
+    def observe(self, client_id, camera_name, start_time, end_time, kind="video"):
+        """Record a request and (re)schedule prefetching around it."""
+        dt_start = datetime.fromisoformat(start_time)
+        dt_end = datetime.fromisoformat(end_time)
+        if dt_end <= dt_start or (dt_end - dt_start).total_seconds() > MAX_PREFETCH_WINDOW_SECONDS:
+            return []
+
+        owner = (client_id, camera_name)
+        with self._lock:
+            history = self._history[owner]
+            targets = [(kind, start, end) for start, end in adjacent_windows(dt_start, dt_end, history)]
+            history.append((dt_start, dt_end))
+
+            pending = self._pending[owner]
+            requested = (kind, dt_start, dt_end)
+            for target in list(pending):
+                if target in targets:
+                    continue
+                future, cancelled = pending[target]
+                if target == requested:
+                    # The foreground request now needs this window: drop it if it has not
+                    # started, but let a running build finish so the request can share it
+                    if future.cancel():
+                        del pending[target]
+                        self._stats["cancelled"] += 1
+                    continue
+                del pending[target]
+                cancelled.set()
+                future.cancel()
+                self._stats["cancelled"] += 1
+
+            for target in targets:
+                if target not in pending:
+                    cancelled = threading.Event()
+                    future = self._executor.submit(self._run, owner, target, cancelled)
+                    pending[target] = (future, cancelled)
+                    self._stats["scheduled"] += 1
+            return [(start.isoformat(), end.isoformat()) for _, start, end in targets]
+
+    def _run(self, owner, target, cancelled):
+        kind, dt_start, dt_end = target
+        session = self.Session()
+        try:
+            # Foreground requests go first
+            while self.is_busy():
+                if cancelled.wait(BUSY_POLL_SECONDS):
+                    return
+
+            if cancelled.is_set():
+                return
+            camera_name = owner[1]
+            if kind == "playlist":
+                camera_videos = find_relevant_videos(session, dt_start.isoformat(), dt_end.isoformat(), camera_name)
+                ensure_fragment_index(session, camera_videos["selected"])
+            else:
+                def stop_if_cancelled(done, total):
+                    if cancelled.is_set():
+                        raise PrefetchCancelled()
+
+                get_stitched_video(session, self.stitch_cache, camera_name, dt_start.isoformat(), dt_end.isoformat(),
+                                   stop_if_cancelled)
+            with self._lock:
+                self._stats["completed"] += 1
+        except PrefetchCancelled:
+            pass
+        except Exception as e:
+            print(f"Prefetch of {kind} {dt_start} - {dt_end} for {owner[1]} failed: {e}")
+            with self._lock:
+                self._stats["failed"] += 1
+        finally:
+            session.close()
+            with self._lock:
+                pending = self._pending.get(owner, {})
+                if target in pending and pending[target][1] is cancelled:
+                    del pending[target]
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "pending": sum(len(pending) for pending in self._pending.values())}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
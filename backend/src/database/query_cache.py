@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict, deque, namedtuple
+
+from flask import Response
+
+from .models import IngestEvent
+
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Larger results would push most of the cache out for a single entry
+QUERY_CACHE_MAX_ENTRY_BYTES = QUERY_CACHE_MAX_BYTES // 4
+# Applied ingest events kept to reject results computed before them
+RECENT_EVENT_COUNT = 1024
+
+CachedResult = namedtuple("CachedResult", "body mimetype start end cameras")
+
+
+def _overlaps(entry, camera_name, start_time, end_time):
+    if start_time > entry.end or end_time < entry.start:
+        return False
+    return camera_name is None or entry.cameras is None or camera_name in entry.cameras
+
+
+class QueryCache:
+    """Size-bounded LRU of serialized query responses.
+
+    Entries are invalidated from the ingest_events table rather than by the save
+    path directly, because segments are saved in worker processes. Each request
+    calls sync() first, which drops every entry overlapping an event committed
+    since the previous sync; put() refuses results that such an event may have
+    made stale while they were being computed.
+    """
+
+    def __init__(self, max_bytes=QUERY_CACHE_MAX_BYTES, max_entry_bytes=QUERY_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._last_event_id = None
+        self._recent = deque(maxlen=RECENT_EVENT_COUNT)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(request, mimetype):
+        return (request.path, mimetype, tuple(sorted(request.args.items(multi=True))))
+
+    def sync(self, session):
+        """Apply ingest events committed since the last sync and return the newest event id."""
+        last_event_id = self._last_event_id
+        if last_event_id is None:
+            # Nothing is cached yet, so earlier events are irrelevant
+            newest = session.query(IngestEvent.id).order_by(IngestEvent.id.desc()).limit(1).scalar()
+            with self._lock:
+                if self._last_event_id is None:
+                    self._last_event_id = newest or 0
+                return self._last_event_id
+
+        events = session.query(
+            IngestEvent.id, IngestEvent.camera_name, IngestEvent.start_time, IngestEvent.end_time
+        ).filter(IngestEvent.id > last_event_id).order_by(IngestEvent.id).all()
+
+        with self._lock:
+            for event in events:
+                if event.id <= self._last_event_id:
+                    continue
+                for key in [key for key, entry in self._entries.items() if _overlaps(entry, *event[1:])]:
+                    self._drop(key)
+                self._recent.append(tuple(event))
+                self._last_event_id = event.id
+            return self._last_event_id
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        return Response(entry.body, mimetype=entry.mimetype)
+
+    def put(self, key, response, seen_event_id, start, end, cameras=None):
+        """Store a response computed after sync() returned `seen_event_id`. Returns whether it was stored."""
+        body = response.get_data()
+        if len(body) > self.max_entry_bytes:
+            return False
+        entry = CachedResult(body, response.mimetype, start, end, frozenset(cameras) if cameras else None)
+
+        with self._lock:
+            # An event applied since then may have changed the rows this result was read from
+            if len(self._recent) == self._recent.maxlen and self._recent[0][0] > seen_event_id + 1:
+                return False
+            if any(event[0] > seen_event_id and _overlaps(entry, *event[1:]) for event in self._recent):
+                return False
+
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def _drop(self, key):
+        self._bytes -= len(self._entries.pop(key).body)
@@ -0,0 +1,137 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .models import ActivityRollup, LemurTracking
+from src.processor.metadata_buffer import TRACKING_TIME_STAMP_GLOB, frame_timestamps
+
+# Rollup levels from coarsest to finest: (level name, numpy datetime unit, bucket width in seconds)
+ROLLUP_LEVELS = [
+    ("day", "D", 86400),
+    ("hour", "h", 3600),
+    ("minute", "m", 60),
+    ("second", "s", 1),
+]
+
+_UPSERT_SQL = (
+    f"INSERT INTO {ActivityRollup.__tablename__} "
+    "(camera_name, level, bucket_start, active_frames, total_frames) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (camera_name, level, bucket_start) DO UPDATE SET "
+    "active_frames = active_frames + excluded.active_frames, "
+    "total_frames = total_frames + excluded.total_frames"
+)
+
+# Bucket start of a stored tracking row per level, in the DateTime text layout
+_BACKFILL_BUCKETS = {
+    "day": "substr(time_stamp, 12, 10) || ' 00:00:00.000000'",
+    "hour": "substr(time_stamp, 12, 10) || ' ' || substr(time_stamp, 23, 2) || ':00:00.000000'",
+    "minute": "substr(time_stamp, 12, 10) || ' ' || substr(time_stamp, 23, 5) || ':00.000000'",
+    "second": "substr(time_stamp, 12, 10) || ' ' || substr(time_stamp, 23, 8) || '.000000'",
+}
+
+
+def _bucket_strings(buckets):
+    # Same text layout SQLAlchemy uses for DateTime columns on SQLite
+    return np.char.replace(np.datetime_as_string(buckets.astype("datetime64[us]"), unit="us"), "T", " ").tolist()
+
+
+def update_activity_rollups(Session, records, segment_start, fps, camera_name):
+    """Add a segment's active/total frame counts to every level of the rollup pyramid."""
+    try:
+        if len(records) == 0:
+            return
+
+        timestamps = frame_timestamps(records, segment_start, fps)
+        activity = records["activity"].astype(np.int64)
+
+        rows = []
+        for level, unit, _ in ROLLUP_LEVELS:
+            buckets, inverse = np.unique(timestamps.astype(f"datetime64[{unit}]"), return_inverse=True)
+            total = np.bincount(inverse)
+            active = np.bincount(inverse, weights=activity).astype(np.int64)
+            rows.extend(zip(
+                [camera_name] * len(buckets),
+                [level] * len(buckets),
+                _bucket_strings(buckets),
+                active.tolist(),
+                total.tolist(),
+            ))
+
+        Session.connection().exec_driver_sql(_UPSERT_SQL, rows)
+        Session.commit()
+
+    except Exception as e:
+        Session.rollback()
+        print(f"Error updating activity rollups: {e}")
+        raise e
+
+
+def backfill_activity_rollups(connection):
+    """Roll up tracking rows saved before rollups existed. Runs only while the rollup table is empty.
+
+    Returns the number of rollup rows written.
+    """
+    if connection.exec_driver_sql(f"SELECT 1 FROM {ActivityRollup.__tablename__} LIMIT 1").first():
+        return 0
+
+    written = 0
+    for level, _, _ in ROLLUP_LEVELS:
+        bucket = _BACKFILL_BUCKETS[level]
+        written += connection.exec_driver_sql(
+            f"INSERT INTO {ActivityRollup.__tablename__} "
+            "(camera_name, level, bucket_start, active_frames, total_frames) "
+            f"SELECT camera_name, ?, {bucket}, SUM(is_active), COUNT(*) FROM {LemurTracking.__tablename__} "
+            "WHERE camera_name IS NOT NULL AND time_stamp GLOB ? "
+            f"GROUP BY camera_name, {bucket}",
+            (level, TRACKING_TIME_STAMP_GLOB),
+        ).rowcount
+    if written:
+        print(f"Backfilled {written} activity rollup rows from existing tracking data")
+    return written
+
+
+def select_rollup_level(dt_start: datetime, dt_end: datetime, points: int):
+    """Pick the coarsest rollup level that still yields at least `points` buckets over the range."""
+    range_seconds = max((dt_end - dt_start).total_seconds(), 1)
+    for level in ROLLUP_LEVELS:
+        if math.ceil(range_seconds / level[2]) >= points:
+            return level
+    return ROLLUP_LEVELS[-1]
+
+
+def floor_to_level(dt: datetime, unit: str) -> datetime:
+    return np.datetime64(dt, unit).astype("datetime64[us]").astype(datetime)
+
+
+def query_activity_rollup(session, dt_start, dt_end, points, cameras=None):
+    """Return active/total frame counts per bucket at the coarsest level meeting `points`."""
+    level, unit, width = select_rollup_level(dt_start, dt_end, points)
+    aligned_start = floor_to_level(dt_start, unit)
+    bucket_count = int((dt_end - aligned_start).total_seconds() // width) + 1
+
+    query = session.query(
+        ActivityRollup.bucket_start, ActivityRollup.active_frames, ActivityRollup.total_frames
+    ).filter(
+        ActivityRollup.level == level,
+        ActivityRollup.bucket_start >= aligned_start,
+        ActivityRollup.bucket_start <= dt_end,
+    )
+    if cameras:
+        query = query.filter(ActivityRollup.camera_name.in_(cameras))
+
+    active_frames = np.zeros(bucket_count, dtype=np.int64)
+    total_frames = np.zeros(bucket_count, dtype=np.int64)
+    for bucket_start, active, total in query:
+        index = int((bucket_start - aligned_start).total_seconds() // width)
+        active_frames[index] += active
+        total_frames[index] += total
+
+    return {
+        "level": level,
+        "bucket_seconds": width,
+        "start_time": aligned_start.isoformat(),
+        "end_time": (aligned_start + timedelta(seconds=width * bucket_count)).isoformat(),
+        "active_frames": active_frames.tolist(),
+        "total_frames": total_frames.tolist(),
+    }
@@ -1,9 +1,20 @@
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
+import json
 import os
+import subprocess
 import ffmpeg
 import numpy as np
 from sqlalchemy import create_engine
-from src.database.models import Base, LemurTracking, ProcessedVideo
+from src.database.activity_encoding import activity_encoding_available, activity_keep_mask, encode_activity_aware
+from src.database.models import Base, IngestEvent, LemurTracking, ProcessedVideo
+from src.database.episodes import update_activity_episodes
+from src.database.heatmaps import update_coordinate_histograms
+from src.database.hls import FRAGMENTED_MOVFLAGS, index_fragments
+from src.database.keyframes import gop_size, probe_keyframes
+from src.database.rollups import update_activity_rollups
+from src.database.thumbnails import save_thumbnail_sprites
+from src.database.zones import invalidate_zone_occupancy
+from src.processor.metadata_buffer import frame_timestamps
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 
@@ -14,25 +25,25 @@ def save_video_and_metadata(db_url, cam_dir, frames, metadata, camera_name, fps,
         engine = create_engine(db_url, connect_args={'check_same_thread': False})
         Base.metadata.create_all(engine)
         Session = scoped_session(sessionmaker(bind=engine))
+        segment_end = time_stamp + timedelta(seconds=max(len(metadata), len(frames)) / fps)
         try:
-            save_processed_video(Session, frames, cam_dir, fps, camera_name, time_stamp)
-            for data in metadata:
-                add_tracking_data(
-                    Session,
-                    is_active=data["activity"],
-                    timestamp=data["timestamp"],
-                    camera_name=camera_name,
-                    coordinate_x=data["coordinateX"],
-                    coordinate_y=data["coordinateY"],
-                )
+            save_processed_video(Session, frames, cam_dir, fps, camera_name, time_stamp, metadata["activity"])
+            add_tracking_batch(Session, metadata, time_stamp, fps, camera_name)
+            update_activity_rollups(Session, metadata, time_stamp, fps, camera_name)
+            update_activity_episodes(Session, metadata, time_stamp, fps, camera_name)
+            update_coordinate_histograms(Session, metadata, time_stamp, fps, camera_name)
+            save_thumbnail_sprites(Session, frames, time_stamp, fps, camera_name)
+            invalidate_zone_occupancy(Session, camera_name, time_stamp, segment_end)
         finally:
+            # Logged even after a partial failure, since earlier steps may already have committed
+            record_ingest_event(Session, "segment", camera_name, time_stamp, segment_end, stamp_rows=True)
             Session.close()
         #print(f"Saved video and metadata for {camera_name}")
     except Exception as e:
         print(f"Error saving video and metadata: {e}")
 
 
-def save_processed_video(Session, video_frames, cam_dir, fps, camera_name, time_stamp):
+def save_processed_video(Session, video_frames, cam_dir, fps, camera_name, time_stamp, activity=None):
     try:
         if not video_frames:
             raise ValueError("No frames to save")
@@ -53,36 +64,44 @@ def save_processed_video(Session, video_frames, cam_dir, fps, camera_name, time_
 
         print(f"Video properties: {width}x{height}, {fps} fps, {duration:.2f} seconds")
 
-        # Use ffmpeg piping instead of temporary file
-        process = (
-            ffmpeg
-            .input(
-                'pipe:0',
-                format='rawvideo',
-                pix_fmt='bgr24',
-                s=f'{width}x{height}',
-                r=fps
-            )
-            .output(
-                output_path,
-                pix_fmt='yuv420p',
-                vcodec='libx264',
-                preset='ultrafast',
-                crf=30,
-                movflags='faststart'
+        if activity is not None and activity_encoding_available():
+            # Idle stretches are thinned out, so encode time and size follow how much happened
+            keep = activity_keep_mask(activity, frame_count, fps)
+            encoded = encode_activity_aware(video_frames, keep, fps, output_path)
+            print(f"Encoded {encoded} of {frame_count} frames (activity-aware)")
+        else:
+            # Use ffmpeg piping instead of temporary file
+            process = (
+                ffmpeg
+                .input(
+                    'pipe:0',
+                    format='rawvideo',
+                    pix_fmt='bgr24',
+                    s=f'{width}x{height}',
+                    r=fps
+                )
+                .output(
+                    output_path,
+                    pix_fmt='yuv420p',
+                    vcodec='libx264',
+                    preset='ultrafast',
+                    crf=30,
+                    g=gop_size(fps),
+                    # One fragment per GOP, so ranges can be served as byte-range HLS
+                    movflags=FRAGMENTED_MOVFLAGS
+                )
+                .overwrite_output()
+                .run_async(pipe_stdin=True, pipe_stdout=True, pipe_stderr=True)
             )
-            .overwrite_output()
-            .run_async(pipe_stdin=True, pipe_stdout=True, pipe_stderr=True)
-        )
 
-        # Write frames directly to FFmpeg
-        for i, frame in enumerate(video_frames):
-            process.stdin.write(frame.tobytes())
-            #if i % 100 == 0:
-                #print(f"Processed {i}/{len(video_frames)} frames")
+            # Write frames directly to FFmpeg
+            for i, frame in enumerate(video_frames):
+                process.stdin.write(frame.tobytes())
+                #if i % 100 == 0:
+                    #print(f"Processed {i}/{len(video_frames)} frames")
 
-        process.stdin.close()
-        process.wait()
+            process.stdin.close()
+            process.wait()
 
         # Verify file was created
         if not os.path.exists(output_path):
@@ -100,7 +119,11 @@ def save_processed_video(Session, video_frames, cam_dir, fps, camera_name, time_
             frame_count=frame_count,
             resolution_width=width,
             resolution_height=height,
-            time_stamp=time_stamp
+            time_stamp=time_stamp,
+            start_time=time_stamp,
+            end_time=time_stamp + timedelta(seconds=duration),
+            keyframes=json.dumps(probe_keyframes(output_path)),
+            fragments=json.dumps(index_fragments(output_path)),
         )
 
         Session.add(video_metadata)
@@ -160,3 +183,73 @@ def add_tracking_data(Session, is_active, timestamp, camera_name, coordinate_x=N
         print(f"Error saving tracking data: {e}")
         raise e
 
+
+def tracking_time_stamps(records, segment_start, fps):
+    """Format per-frame timestamps the way the tracking queries expect them ("<date> <iso datetime>")."""
+    iso = np.datetime_as_string(frame_timestamps(records, segment_start, fps), unit="us")
+    return np.char.add(np.char.add(iso.astype("U10"), " "), iso)
+
+
+def add_tracking_batch(Session, records, segment_start, fps, camera_name):
+    """Bulk insert a segment's structured metadata buffer in a single executemany."""
+    try:
+        if len(records) == 0:
+            return 0
+
+        time_stamps = tracking_time_stamps(records, segment_start, fps).tolist()
+        x = records["x"].astype(np.float64)
+        y = records["y"].astype(np.float64)
+        coordinate_x = np.where(np.isnan(x), None, x).tolist()
+        coordinate_y = np.where(np.isnan(y), None, y).tolist()
+        is_active = records["activity"].tolist()
+
+        Session.connection().exec_driver_sql(
+            f"INSERT INTO {LemurTracking.__tablename__} "
+            "(time_stamp, is_active, coordinate_x, coordinate_y, camera_name) VALUES (?, ?, ?, ?, ?)",
+            list(zip(time_stamps, is_active, coordinate_x, coordinate_y, [camera_name] * len(records)))
+        )
+        Session.commit()
+        return len(records)
+
+    except Exception as e:
+        Session.rollback()
+        print(f"Error saving tracking data: {e}")
+        raise e
+
+
+def record_ingest_event(Session, kind, camera_name, start_time, end_time, stamp_rows=False):
+    """Log a committed write so readers (result caches, ETags, sync cursors) can tell which ranges changed.
+
+    With `stamp_rows`, the camera's unstamped tracking rows and videos in the range
+    get the event id as their ingest_seq in the same transaction, so they become
+    visible to cursor readers exactly when the event does.
+    """
+    try:
+        event = IngestEvent(
+            kind=kind,
+            camera_name=camera_name,
+            start_time=start_time,
+            end_time=end_time,
+            committed_at=datetime.now(),
+        )
+        Session.add(event)
+        Session.flush()
+        if stamp_rows:
+            Session.query(LemurTracking).filter(
+                LemurTracking.camera_name == camera_name,
+                LemurTracking.time_stamp >= f"{start_time:%Y-%m-%d} {start_time:%Y-%m-%dT%H:%M:%S.%f}",
+                LemurTracking.time_stamp < f"{end_time:%Y-%m-%d} {end_time:%Y-%m-%dT%H:%M:%S.%f}",
+                LemurTracking.ingest_seq.is_(None),
+            ).update({LemurTracking.ingest_seq: event.id}, synchronize_session=False)
+            Session.query(ProcessedVideo).filter(
+                ProcessedVideo.camera_name == camera_name,
+                ProcessedVideo.time_stamp >= str(start_time),
+                ProcessedVideo.time_stamp < str(end_time),
+                ProcessedVideo.ingest_seq.is_(None),
+            ).update({ProcessedVideo.ingest_seq: event.id}, synchronize_session=False)
+        Session.commit()
+        return event.id
+    except Exception as e:
+        Session.rollback()
+        print(f"Error recording ingest event: {e}")
+        raise e
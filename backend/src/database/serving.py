@@ -0,0 +1,182 @@
+import threading
+
+try:
+    import waitress
+except ImportError:  # without waitress, the Werkzeug development server is used
+    waitress = None
+
+# Requests that stitch, encode or send whole video files. Everything else (status
+# polls, data queries, playlists, HLS fragment ranges, thumbnails) is light: a
+# player fetches many short fragments in a row and must not be turned away mid-playback.
+HEAVY_PATH_PREFIXES = (
+    "/stitched-video",
+    "/highlight-video",
+    "/stitch-jobs/",
+)
+# Long-lived event streams each hold a server thread for as long as the client listens
+STREAM_PATH_PREFIXES = (
+    "/progress/events",
+)
+HEAVY_LIMIT = 4
+LIGHT_LIMIT = 16
+STREAM_LIMIT = 4
+# Requests over their class's limit are turned away instead of queueing on a server thread;
+# light ones wait this long first, since they finish quickly and come in bursts
+LIGHT_WAIT_SECONDS = 0.5
+RETRY_AFTER_SECONDS = 2
+
+# Idle keep-alive connections are closed after this long; the frontend reconnects cheaply
+CHANNEL_TIMEOUT_SECONDS = 120
+CONNECTION_LIMIT = 100
+
+
+def classify(environ):
+    path = environ.get("PATH_INFO", "")
+    if path.startswith(STREAM_PATH_PREFIXES):
+        return "stream"
+    if path.startswith("/stitch-jobs/") and "/video/" not in path:
+        # Job status and cancel requests; only the job's video downloads are heavy
+        return "light"
+    return "heavy" if path.startswith(HEAVY_PATH_PREFIXES) else "light"
+
+
+class _ReleasingFile:
+    """A file handed to the server's wsgi.file_wrapper; closing it releases the slot."""
+
+    def __init__(self, file, release):
+        self._file = file
+        self._release = release
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            self._release()
+
+
+def _server_file_response(app_iter, file_wrappers):
+    """The server's own file wrapper when the response is one, so it can send the file natively; else None.
+
+    Werkzeug answers Range requests by wrapping the file wrapper in a range
+    iterator; the file is seeked to the range start instead and the server sends
+    Content-Length bytes from there, as waitress's file wrapper supports.
+    """
+    if any(app_iter is wrapper for wrapper in file_wrappers):
+        return app_iter
+    inner = getattr(app_iter, "iterable", None)
+    start = getattr(app_iter, "start_byte", None)
+    if start is not None and hasattr(inner, "seek") and any(inner is wrapper for wrapper in file_wrappers):
+        inner.seek(start)
+        return inner
+    return None
+
+
+class _ReleasingIterable:
+    """Holds a slot until the server has finished sending the response body."""
+
+    def __init__(self, iterable, release):
+        self._iterable = iterable
+        self._release = release
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, "close"):
+                self._iterable.close()
+        finally:
+            self._release()
+
+
+class ConcurrencyLimiter:
+    """WSGI middleware with separate concurrency limits for heavy, light and streaming requests.
+
+    Server threads are sized to the sum of the limits and requests over their
+    class's limit get a 503 (light ones after a short wait), so no class can tie
+    up the threads another one needs. A slot is held
+    until the body has been sent, which covers streamed downloads as well as
+    the handler itself; for file responses, until the server closes the file.
+    """
+
+    def __init__(self, app, heavy_limit=HEAVY_LIMIT, light_limit=LIGHT_LIMIT, stream_limit=STREAM_LIMIT):
+        self.app = app
+        self.limits = {"heavy": heavy_limit, "light": light_limit, "stream": stream_limit}
+        self._slots = {kind: threading.BoundedSemaphore(limit) for kind, limit in self.limits.items()}
+        self._lock = threading.Lock()
+        self._active = dict.fromkeys(self.limits, 0)
+        self._rejected = 0
+
+    def __call__(self, environ, start_response):
+        kind = classify(environ)
+        slot = self._slots[kind]
+        acquired = slot.acquire(timeout=LIGHT_WAIT_SECONDS) if kind == "light" else slot.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self._rejected += 1
+            start_response("503 Service Unavailable", [
+                ("Content-Type", "application/json"),
+                ("Retry-After", str(RETRY_AFTER_SECONDS)),
+            ])
+            # Stream clients fall back to polling; video and data clients retry
+            return [b'{"error": "Too many requests of this kind in progress, retry shortly."}']
+
+        with self._lock:
+            self._active[kind] += 1
+        released = []
+
+        def release():
+            with self._lock:
+                if released:
+                    return
+                released.append(True)
+                self._active[kind] -= 1
+            slot.release()
+
+        # File responses (send_file) keep the server's fast path; the slot is released when the file closes
+        server_file_wrapper = environ.get("wsgi.file_wrapper")
+        file_wrappers = []
+        if server_file_wrapper is not None:
+            def file_wrapper(file, block_size=8192):
+                wrapper = server_file_wrapper(_ReleasingFile(file, release), block_size)
+                file_wrappers.append(wrapper)
+                return wrapper
+            environ["wsgi.file_wrapper"] = file_wrapper
+
+        try:
+            app_iter = self.app(environ, start_response)
+            passthrough = _server_file_response(app_iter, file_wrappers)
+            return passthrough if passthrough is not None else _ReleasingIterable(app_iter, release)
+        except BaseException:
+            release()
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                **{kind: {"active": self._active[kind], "limit": limit} for kind, limit in self.limits.items()},
+                "rejected": self._rejected,
+            }
+
+
+def serve(app, host, port, heavy_limit=HEAVY_LIMIT, light_limit=LIGHT_LIMIT, stream_limit=STREAM_LIMIT):
+    """Serve the app with waitress behind the concurrency limiter; the development server if waitress is missing."""
+    if waitress is None:
+        print("waitress is not installed; falling back to the Flask development server.")
+        app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+        return
+
+    limiter = ConcurrencyLimiter(app, heavy_limit, light_limit, stream_limit)
+    app.config["CONCURRENCY_LIMITER"] = limiter
+    waitress.serve(
+        limiter,
+        host=host,
+        port=port,
+        threads=heavy_limit + light_limit + stream_limit,
+        channel_timeout=CHANNEL_TIMEOUT_SECONDS,
+        connection_limit=CONNECTION_LIMIT,
+        ident="LemurTracker",
+    )
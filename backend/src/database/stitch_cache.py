@@ -0,0 +1,155 @@
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+STITCH_CACHE_MAX_BYTES = 2 * 1024 ** 3
+PARTIAL_SUFFIX = ".partial.mp4"
+# Work directories stitch_videos creates next to its output
+WORK_DIR_PREFIX = "stitch_"
+
+
+def stitch_filename(camera_name, start_time, end_time, version):
+    """Cache file name for a stitched range; `version` changes whenever the range's footage does."""
+    safe = re.sub(r"[^0-9A-Za-z]+", "-", f"{start_time}_{end_time}")
+    return f"{camera_name}_stitched_{safe}_{version}.mp4"
+
+
+class BuildCancelled(Exception):
+    """Raised by a build that was abandoned; requests waiting on it build the result themselves."""
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.path = None
+        self.error = None
+
+
+class StitchCache:
+    """Byte-bounded LRU of stitched videos on disk.
+
+    Results are built into a unique temp file and published with os.replace,
+    so readers never see a partial file. Concurrent requests for the same key
+    wait for the one build in flight instead of starting their own.
+    """
+
+    def __init__(self, directory, max_bytes=STITCH_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "shared": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Index files left by earlier runs (oldest use first) and remove unfinished builds."""
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(PARTIAL_SUFFIX):
+                os.remove(path)
+            elif name.startswith(WORK_DIR_PREFIX) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith(".mp4"):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def get_or_build(self, key, build):
+        """Path of the cached result for `key`, calling build(temp_path) on a miss.
+
+        `build` writes the video to the path it is given and returns a falsy value
+        when there is nothing to build; None is then returned and nothing is cached.
+        """
+        path = os.path.join(self.directory, key)
+        with self._lock:
+            if key in self._entries and self._touch(path):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                leader = False
+                flight = None
+            elif key in self._inflight:
+                self._stats["shared"] += 1
+                leader = False
+                flight = self._inflight[key]
+            else:
+                # Indexed but deleted from disk since
+                self._bytes -= self._entries.pop(key, 0)
+                self._stats["misses"] += 1
+                leader = True
+                flight = self._inflight[key] = _Flight()
+
+        if flight is None:
+            return path
+        if not leader:
+            flight.done.wait()
+            if isinstance(flight.error, BuildCancelled):
+                # The leader gave up (e.g. a cancelled prefetch); one of the waiters takes over
+                return self.get_or_build(key, build)
+            if flight.error is not None:
+                raise flight.error
+            return flight.path
+
+        temp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}{PARTIAL_SUFFIX}")
+        try:
+            if build(temp_path) and os.path.exists(temp_path):
+                os.replace(temp_path, path)
+                with self._lock:
+                    self._entries[key] = os.path.getsize(path)
+                    self._bytes += self._entries[key]
+                    self._evict(keep=key)
+                flight.path = path
+            return flight.path
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    @staticmethod
+    def _touch(path):
+        """Mark a cached file as used, which keeps the LRU order across restarts; False if it is gone."""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _evict(self, keep=None):
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            size = self._entries.pop(key)
+            self._bytes -= size
+            self._stats["evictions"] += 1
+            try:
+                os.remove(os.path.join(self.directory, key))
+            except OSError as e:
+                # Still being sent (Windows locks open files); it is re-indexed on the next start
+                print(f"Could not evict stitched video {key}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "in_flight": len(self._inflight),
+            }
@@ -0,0 +1,152 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .conditional import range_version
+from .endpoint_helpers import find_relevant_videos, stitch_videos
+from .keyframes import ensure_keyframes
+from .stitch_cache import stitch_filename
+
+# Cameras stitched at once across all jobs; each runs its own ffmpeg processes
+STITCH_CONCURRENCY = 3
+# Finished jobs are forgotten after this long (their videos stay in the stitch cache)
+JOB_TTL_SECONDS = 3600
+FINISHED_STATES = ("done", "empty", "failed", "cancelled")
+
+
+def get_stitched_video(session, stitch_cache, camera_name, start_time, end_time, on_progress=None):
+    """Path of the stitched range from the cache, building it on a miss. None if no footage covers it.
+
+    The cache key includes the range's ingest version, so new footage for a
+    range produces a new entry instead of serving a stale stitch.
+    """
+    version, _ = range_version(session, datetime.fromisoformat(start_time), datetime.fromisoformat(end_time), [camera_name])
+
+    def build(output_path):
+        camera_videos = find_relevant_videos(session, start_time, end_time, camera_name)
+        ensure_keyframes(session, camera_videos["selected"])
+        return stitch_videos(camera_videos["selected"], start_time, end_time, output_path, on_progress)
+
+    return stitch_cache.get_or_build(stitch_filename(camera_name, start_time, end_time, version), build)
+
+
+class StitchJobManager:
+    """Runs stitch jobs for several cameras on a bounded thread pool.
+
+    Every camera of a job is its own task, so a three-camera job takes about
+    as long as its slowest camera. Status updates bump a per-job revision that
+    status() can wait on, which lets clients long-poll instead of spinning.
+    """
+
+    def __init__(self, Session, stitch_cache, max_workers=STITCH_CONCURRENCY):
+        self.Session = Session
+        self.stitch_cache = stitch_cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stitch")
+        self._jobs = {}
+        self._changed = threading.Condition()
+
+    def submit(self, start_time, end_time, cameras):
+        if datetime.fromisoformat(end_time) <= datetime.fromisoformat(start_time):
+            raise ValueError("end_time must be after start_time.")
+        if not cameras:
+            raise ValueError("At least one camera is required.")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "start_time": start_time,
+            "end_time": end_time,
+            "created_at": time.time(),
+            "revision": 0,
+            "cameras": {camera: {"state": "queued", "progress": 0.0, "error": None} for camera in cameras},
+        }
+        with self._changed:
+            self._prune()
+            # Scheduled before the job is visible, so a cancel always finds its futures;
+            # workers that start right away wait for the lock in _update
+            job["futures"] = {camera: self._executor.submit(self._run, job, camera) for camera in cameras}
+            self._jobs[job["id"]] = job
+        return self.status(job["id"])
+
+    def _run(self, job, camera_name):
+        self._update(job, camera_name, state="running")
+
+        def on_progress(done, total):
+            self._update(job, camera_name, progress=round(done / total, 3))
+
+        session = self.Session()
+        try:
+            path = get_stitched_video(session, self.stitch_cache, camera_name, job["start_time"], job["end_time"], on_progress)
+            self._update(job, camera_name, state="done" if path else "empty", progress=1.0, path=path)
+        except Exception as e:
+            print(f"Error stitching {camera_name} for job {job['id']}: {e}")
+            self._update(job, camera_name, state="failed", error=str(e))
+        finally:
+            session.close()
+
+    def _update(self, job, camera_name, **changes):
+        with self._changed:
+            job["cameras"][camera_name].update(changes)
+            job["revision"] += 1
+            self._changed.notify_all()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if job["created_at"] < cutoff and self._finished(job):
+                del self._jobs[job_id]
+
+    @staticmethod
+    def _finished(job):
+        return all(camera["state"] in FINISHED_STATES for camera in job["cameras"].values())
+
+    def status(self, job_id, wait=0.0, revision=None):
+        """Job status; with `wait`, blocks up to that many seconds for a revision newer than `revision`."""
+        deadline = time.monotonic() + wait
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            while revision is not None and job["revision"] <= revision and not self._finished(job):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+
+            cameras = {
+                camera: {key: value for key, value in state.items() if key != "path"}
+                for camera, state in job["cameras"].items()
+            }
+            return {
+                "id": job["id"],
+                "start_time": job["start_time"],
+                "end_time": job["end_time"],
+                "revision": job["revision"],
+                "state": "finished" if self._finished(job) else "running",
+                "progress": round(sum(state["progress"] for state in cameras.values()) / len(cameras), 3),
+                "cameras": cameras,
+            }
+
+    def result_path(self, job_id, camera_name):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None or camera_name not in job["cameras"]:
+                return None
+            return job["cameras"][camera_name].get("path")
+
+    def cancel(self, job_id):
+        """Cancel cameras that have not started; running stitches finish and stay cached."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            for camera, future in job.get("futures", {}).items():
+                if future.cancel():
+                    job["cameras"][camera]["state"] = "cancelled"
+            job["revision"] += 1
+            self._changed.notify_all()
+            return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,177 @@
+import io
+import json
+import math
+import struct
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select, text
+
+from .encoding import ARROW_MIMETYPE, PACKED_MIMETYPE, pa, pack_activity, pack_coordinates
+from .endpoint_helpers import CAMERA_NAMES, tracking_bounds
+from .models import LemurTracking
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+# Rows fetched from SQLite per round trip, and the size of each emitted chunk
+STREAM_BATCH_SIZE = 5000
+
+# Cameras are merged inside SQLite here: one row per bucket, in bucket order
+_STREAM_ACTIVITY_SQL = text(f"""
+    SELECT CAST(((julianday(substr(time_stamp, 12)) - julianday(:start)) * 86400.0 + 0.0005) / :width AS INTEGER) AS bucket,
+           MAX(is_active) AS active
+    FROM {LemurTracking.__tablename__}
+    WHERE time_stamp >= :formatted_start AND time_stamp <= :formatted_end
+    GROUP BY bucket
+    ORDER BY bucket
+""")
+
+
+def wants_stream(request):
+    return request.args.get("stream", "").lower() in ("1", "true") or (
+        request.accept_mimetypes.best == NDJSON_MIMETYPE
+    )
+
+
+def stream_mimetype(mimetype):
+    """Streams are NDJSON unless a binary format was negotiated."""
+    return mimetype if mimetype in (PACKED_MIMETYPE, ARROW_MIMETYPE) else NDJSON_MIMETYPE
+
+
+def _length_prefixed(message):
+    # Packed streams are a sequence of u32-length-prefixed packed messages
+    return struct.pack("<I", len(message)) + message
+
+
+class _ArrowStreamWriter:
+    """Emits an Arrow IPC stream one record batch at a time."""
+
+    def __init__(self, schema):
+        self.sink = io.BytesIO()
+        self.writer = pa.ipc.new_stream(self.sink, schema)
+
+    def _drain(self):
+        chunk = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return chunk
+
+    def write(self, batch):
+        self.writer.write_batch(batch)
+        return self._drain()
+
+    def close(self):
+        self.writer.close()
+        return self._drain()
+
+
+def has_tracking_rows(session, start_time, end_time, cameras=None):
+    """Cheap indexed check used to answer 404 before a stream is started."""
+    formatted_start, formatted_end = tracking_bounds(
+        datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S"), datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S")
+    )
+    query = session.query(LemurTracking.id).filter(
+        LemurTracking.time_stamp >= formatted_start,
+        LemurTracking.time_stamp <= formatted_end,
+    )
+    if cameras:
+        query = query.filter(LemurTracking.camera_name.in_(cameras))
+    return query.limit(1).first() is not None
+
+
+def stream_activity(Session, start_time, end_time, bucket_seconds, mimetype):
+    """Yield activity in chunks of STREAM_BATCH_SIZE buckets, reading SQLite in batches.
+
+    NDJSON lines are {"offset": first bucket index, "activity": [...]}.
+    """
+    dt_start = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S")
+    dt_end = datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S")
+    formatted_start, formatted_end = tracking_bounds(dt_start, dt_end)
+    bucket_count = math.ceil((dt_end - dt_start).total_seconds() / bucket_seconds)
+
+    arrow = _ArrowStreamWriter(pa.schema([("active", pa.bool_())])) if mimetype == ARROW_MIMETYPE else None
+
+    def emit(offset, chunk):
+        if mimetype == PACKED_MIMETYPE:
+            return _length_prefixed(pack_activity(chunk, bucket_seconds))
+        if arrow is not None:
+            return arrow.write(pa.record_batch([pa.array(chunk, type=pa.bool_())], names=["active"]))
+        return json.dumps({"offset": offset, "activity": chunk}) + "\n"
+
+    session = Session()
+    try:
+        result = session.execute(_STREAM_ACTIVITY_SQL.execution_options(yield_per=STREAM_BATCH_SIZE), {
+            "start": dt_start.isoformat(),
+            "width": bucket_seconds,
+            "formatted_start": formatted_start,
+            "formatted_end": formatted_end,
+        })
+
+        offset = 0
+        chunk = []
+        for bucket, active in result:
+            if bucket < 0 or bucket >= bucket_count:
+                continue
+            # Buckets without rows are inactive
+            while offset + len(chunk) < bucket:
+                chunk.append(False)
+                if len(chunk) == STREAM_BATCH_SIZE:
+                    yield emit(offset, chunk)
+                    offset, chunk = offset + len(chunk), []
+            chunk.append(bool(active))
+            if len(chunk) == STREAM_BATCH_SIZE:
+                yield emit(offset, chunk)
+                offset, chunk = offset + len(chunk), []
+
+        while offset + len(chunk) < bucket_count:
+            take = min(STREAM_BATCH_SIZE - len(chunk), bucket_count - offset - len(chunk))
+            chunk.extend([False] * take)
+            yield emit(offset, chunk)
+            offset, chunk = offset + len(chunk), []
+        if chunk:
+            yield emit(offset, chunk)
+        if arrow is not None:
+            yield arrow.close()
+    finally:
+        session.close()
+
+
+def stream_coordinates(Session, start_time, end_time, cameras, mimetype):
+    """Yield coordinates camera by camera in batches of STREAM_BATCH_SIZE rows.
+
+    NDJSON lines are {"camera": name, "points": [[x, y], ...]} with null for missing coordinates.
+    """
+    formatted_start, formatted_end = tracking_bounds(
+        datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S"), datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S")
+    )
+    arrow = None
+    if mimetype == ARROW_MIMETYPE:
+        arrow = _ArrowStreamWriter(pa.schema([("camera", pa.string()), ("x", pa.float32()), ("y", pa.float32())]))
+
+    def emit(camera_name, rows):
+        points = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        if mimetype == PACKED_MIMETYPE:
+            return _length_prefixed(pack_coordinates({camera_name: points}))
+        if arrow is not None:
+            return arrow.write(pa.record_batch([
+                pa.array([camera_name] * len(points), type=pa.string()),
+                pa.array(points[:, 0].astype(np.float32), from_pandas=True),
+                pa.array(points[:, 1].astype(np.float32), from_pandas=True),
+            ], names=["camera", "x", "y"]))
+        return json.dumps({"camera": camera_name, "points": [list(row) for row in rows]}) + "\n"
+
+    session = Session()
+    try:
+        for camera_name in cameras or CAMERA_NAMES:
+            result = session.execute(
+                select(LemurTracking.coordinate_x, LemurTracking.coordinate_y).where(
+                    LemurTracking.camera_name == camera_name,
+                    LemurTracking.time_stamp >= formatted_start,
+                    LemurTracking.time_stamp <= formatted_end,
+                ).order_by(LemurTracking.time_stamp).execution_options(yield_per=STREAM_BATCH_SIZE)
+            )
+            for partition in result.partitions():
+                yield emit(camera_name, partition)
+        if arrow is not None:
+            yield arrow.close()
+    finally:
+        session.close()
@@ -0,0 +1,78 @@
+from sqlalchemy import func, or_
+
+from .models import IngestEvent, LemurTracking, ProcessedVideo
+
+# Ingest events returned per page; a segment event carries a few thousand tracking rows
+SYNC_EVENT_LIMIT = 20
+
+
+def current_cursor(session):
+    """The newest ingest event id; changes after it are returned by changes_since."""
+    return session.query(func.max(IngestEvent.id)).scalar() or 0
+
+
+def _event_to_dict(event):
+    return {
+        "seq": event.id,
+        "kind": event.kind,
+        "camera_name": event.camera_name,
+        "start_time": event.start_time.isoformat(),
+        "end_time": event.end_time.isoformat(),
+    }
+
+
+def changes_since(session, cursor, camera_name=None, dt_start=None, dt_end=None, limit=SYNC_EVENT_LIMIT):
+    """Segments and invalidations committed after `cursor`, oldest first.
+
+    Event ids are assigned inside SQLite's single write transaction, so they
+    commit in order and everything up to the returned cursor has been seen.
+    Segment events carry their tracking rows (columnar) and videos. Other
+    events (compaction, retention) rewrite or delete existing data, so they are
+    listed as ranges to refetch. Filtered-out events still advance the cursor.
+    """
+    head = current_cursor(session)
+    query = session.query(IngestEvent).filter(IngestEvent.id > cursor, IngestEvent.id <= head)
+    if camera_name:
+        query = query.filter(or_(IngestEvent.camera_name.is_(None), IngestEvent.camera_name == camera_name))
+    if dt_start is not None:
+        query = query.filter(IngestEvent.end_time >= dt_start)
+    if dt_end is not None:
+        query = query.filter(IngestEvent.start_time <= dt_end)
+    events = query.order_by(IngestEvent.id).limit(limit + 1).all()
+
+    has_more = len(events) > limit
+    events = events[:limit]
+    segment_ids = [event.id for event in events if event.kind == "segment"]
+
+    tracking = {seq: {"time_stamps": [], "activity": [], "x": [], "y": []} for seq in segment_ids}
+    videos = {seq: [] for seq in segment_ids}
+    if segment_ids:
+        rows = session.query(
+            LemurTracking.ingest_seq, LemurTracking.time_stamp, LemurTracking.is_active,
+            LemurTracking.coordinate_x, LemurTracking.coordinate_y,
+        ).filter(LemurTracking.ingest_seq.in_(segment_ids)).order_by(LemurTracking.ingest_seq, LemurTracking.time_stamp)
+        for seq, time_stamp, is_active, x, y in rows:
+            columns = tracking[seq]
+            # Stored as "<date> <iso datetime>"
+            columns["time_stamps"].append(time_stamp[11:])
+            columns["activity"].append(bool(is_active))
+            columns["x"].append(x)
+            columns["y"].append(y)
+
+        for video in session.query(ProcessedVideo).filter(ProcessedVideo.ingest_seq.in_(segment_ids)):
+            videos[video.ingest_seq].append({
+                "id": video.id,
+                "processed_filename": video.processed_filename,
+                "time_stamp": video.time_stamp,
+                "duration": video.duration,
+            })
+
+    return {
+        "cursor": events[-1].id if has_more else max(head, cursor),
+        "has_more": has_more,
+        "segments": [
+            {**_event_to_dict(event), "tracking": tracking[event.id], "videos": videos[event.id]}
+            for event in events if event.kind == "segment"
+        ],
+        "invalidated": [_event_to_dict(event) for event in events if event.kind != "segment"],
+    }
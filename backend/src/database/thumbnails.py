@@ -0,0 +1,128 @@
+import math
+from datetime import timedelta
+
+import cv2
+import numpy as np
+
+from .models import ThumbnailSprite
+
+# One tile every THUMBNAIL_INTERVAL_SECONDS, packed SPRITE_COLUMNS x SPRITE_ROWS to a sheet
+THUMBNAIL_INTERVAL_SECONDS = 5.0
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_HEIGHT = 120
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+SPRITE_JPEG_QUALITY = 60
+VTT_MIMETYPE = "text/vtt"
+
+
+def sample_step(fps, interval=THUMBNAIL_INTERVAL_SECONDS):
+    """Frames between tiles; tiles fall on whole frames, so the real interval is step / fps."""
+    return max(1, int(round(interval * fps)))
+
+
+def build_sprite_sheets(frames, fps, interval=THUMBNAIL_INTERVAL_SECONDS):
+    """JPEG sprite sheets of a segment's frames: [(first tile index, tile count, jpeg bytes), ...]."""
+    step = sample_step(fps, interval)
+    tiles = [
+        cv2.resize(frames[index], (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT), interpolation=cv2.INTER_AREA)
+        for index in range(0, len(frames), step)
+    ]
+
+    per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    sheets = []
+    for first in range(0, len(tiles), per_sheet):
+        chunk = tiles[first:first + per_sheet]
+        rows = math.ceil(len(chunk) / SPRITE_COLUMNS)
+        columns = min(len(chunk), SPRITE_COLUMNS)
+        sheet = np.zeros((rows * THUMBNAIL_HEIGHT, columns * THUMBNAIL_WIDTH, 3), dtype=np.uint8)
+        for position, tile in enumerate(chunk):
+            row, column = divmod(position, SPRITE_COLUMNS)
+            sheet[row * THUMBNAIL_HEIGHT:(row + 1) * THUMBNAIL_HEIGHT,
+                  column * THUMBNAIL_WIDTH:(column + 1) * THUMBNAIL_WIDTH] = tile
+        ok, jpeg = cv2.imencode(".jpg", sheet, [cv2.IMWRITE_JPEG_QUALITY, SPRITE_JPEG_QUALITY])
+        if not ok:
+            raise RuntimeError("Could not encode thumbnail sprite sheet")
+        sheets.append((first, len(chunk), jpeg.tobytes()))
+    return sheets
+
+
+def save_thumbnail_sprites(Session, frames, segment_start, fps, camera_name):
+    """Store sprite sheets for a segment, built from the frames already in memory."""
+    try:
+        if not frames:
+            return 0
+
+        interval = sample_step(fps) / fps
+        segment_end = segment_start + timedelta(seconds=len(frames) / fps)
+        sheets = build_sprite_sheets(frames, fps)
+        for first, count, image in sheets:
+            start = segment_start + timedelta(seconds=first * interval)
+            Session.add(ThumbnailSprite(
+                camera_name=camera_name,
+                start_time=start,
+                end_time=min(start + timedelta(seconds=count * interval), segment_end),
+                interval_seconds=interval,
+                tile_count=count,
+                columns=SPRITE_COLUMNS,
+                tile_width=THUMBNAIL_WIDTH,
+                tile_height=THUMBNAIL_HEIGHT,
+                image=image,
+            ))
+        Session.commit()
+        return len(sheets)
+
+    except Exception as e:
+        Session.rollback()
+        print(f"Error saving thumbnail sprites: {e}")
+        raise e
+
+
+def find_sprites(session, camera_name, dt_start, dt_end):
+    """Sprite sheets of a camera overlapping [dt_start, dt_end), without their images, in time order."""
+    # A sheet spans at most one grid of tiles (doubled for interval rounding at low
+    # frame rates), which bounds the index range
+    longest = timedelta(seconds=SPRITE_COLUMNS * SPRITE_ROWS * THUMBNAIL_INTERVAL_SECONDS * 2)
+    return session.query(
+        ThumbnailSprite.id, ThumbnailSprite.start_time, ThumbnailSprite.end_time, ThumbnailSprite.interval_seconds,
+        ThumbnailSprite.tile_count, ThumbnailSprite.columns, ThumbnailSprite.tile_width, ThumbnailSprite.tile_height,
+    ).filter(
+        ThumbnailSprite.camera_name == camera_name,
+        ThumbnailSprite.start_time >= dt_start - longest,
+        ThumbnailSprite.start_time < dt_end,
+        ThumbnailSprite.end_time > dt_start,
+    ).order_by(ThumbnailSprite.start_time).all()
+
+
+def _vtt_time(seconds):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    return f"{hours:02d}:{minutes:02d}:{milliseconds / 1000:06.3f}"
+
+
+def build_thumbnail_vtt(sprites, dt_start, dt_end, sprite_uri):
+    """A WebVTT track with one cue per tile, timed from dt_start; cue text is "<uri>#xywh=x,y,w,h".
+
+    Returns None when no tile falls inside the range.
+    """
+    range_seconds = (dt_end - dt_start).total_seconds()
+    lines = ["WEBVTT", ""]
+    for sprite in sprites:
+        sheet_offset = (sprite.start_time - dt_start).total_seconds()
+        sheet_end = (sprite.end_time - dt_start).total_seconds()
+        for position in range(sprite.tile_count):
+            cue_start = sheet_offset + position * sprite.interval_seconds
+            cue_end = min(cue_start + sprite.interval_seconds, sheet_end, range_seconds)
+            cue_start = max(cue_start, 0.0)
+            if cue_end <= cue_start:
+                continue
+            row, column = divmod(position, sprite.columns)
+            lines.append(f"{_vtt_time(cue_start)} --> {_vtt_time(cue_end)}")
+            lines.append(f"{sprite_uri(sprite)}#xywh={column * sprite.tile_width},{row * sprite.tile_height},"
+                         f"{sprite.tile_width},{sprite.tile_height}")
+            lines.append("")
+
+    if len(lines) == 2:
+        return None
+    return "\n".join(lines)
@@ -0,0 +1,225 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+
+from .models import LemurTracking, Zone, ZoneOccupancy
+
+HOUR = timedelta(hours=1)
+# Samples further apart than this are treated as a tracking gap, not dwell time
+MAX_SAMPLE_GAP_SECONDS = 1.0
+
+
+def parse_polygon(polygon):
+    """Validate a list of [x, y] vertices and return it as an (n, 2) float array."""
+    vertices = np.asarray(polygon, dtype=np.float64)
+    if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3:
+        raise ValueError("A zone polygon needs at least three [x, y] vertices.")
+    if not np.isfinite(vertices).all():
+        raise ValueError("Zone polygon vertices must be finite numbers.")
+    return vertices
+
+
+def points_in_polygon(x, y, vertices):
+    """Even-odd ray casting over whole coordinate arrays. NaN points are outside."""
+    inside = np.zeros(len(x), dtype=bool)
+    x_j, y_j = vertices[-1]
+    for x_i, y_i in vertices:
+        crosses = (y_i > y) != (y_j > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = (x_j - x_i) * (y - y_i) / (y_j - y_i) + x_i
+        inside ^= crosses & (x < x_cross)
+        x_j, y_j = x_i, y_i
+    return inside
+
+
+def zone_to_dict(zone):
+    return {
+        "id": zone.id,
+        "camera_name": zone.camera_name,
+        "name": zone.name,
+        "polygon": json.loads(zone.polygon),
+    }
+
+
+def save_zone(session, camera_name, name, polygon, zone=None):
+    """Create a zone, or update `zone` in place; an updated zone's stored results are dropped."""
+    if not isinstance(camera_name, str) or not camera_name:
+        raise ValueError("Invalid 'camera_name' provided.")
+    if not isinstance(name, str) or not name:
+        raise ValueError("Invalid 'name' provided.")
+    vertices = parse_polygon(polygon)
+
+    if zone is None:
+        zone = Zone()
+        session.add(zone)
+    elif zone.id is not None:
+        session.query(ZoneOccupancy).filter(ZoneOccupancy.zone_id == zone.id).delete(synchronize_session=False)
+
+    zone.camera_name = camera_name
+    zone.name = name
+    zone.polygon = json.dumps(vertices.tolist())
+    session.commit()
+    return zone
+
+
+def delete_zone(session, zone):
+    session.query(ZoneOccupancy).filter(ZoneOccupancy.zone_id == zone.id).delete(synchronize_session=False)
+    session.delete(zone)
+    session.commit()
+
+
+def _tracking_stamp(dt: datetime):
+    return f"{dt.strftime('%Y-%m-%d')} {dt.strftime('%Y-%m-%dT%H:%M:%S')}"
+
+
+def load_camera_track(session, camera_name, dt_start, dt_end):
+    """Fetch (time, x, y) arrays for one camera; missing coordinates become NaN."""
+    rows = session.query(
+        LemurTracking.time_stamp, LemurTracking.coordinate_x, LemurTracking.coordinate_y
+    ).filter(
+        LemurTracking.camera_name == camera_name,
+        LemurTracking.time_stamp >= _tracking_stamp(dt_start),
+        LemurTracking.time_stamp < _tracking_stamp(dt_end),
+    ).order_by(LemurTracking.time_stamp).all()
+
+    if not rows:
+        empty = np.empty(0)
+        return empty.astype("datetime64[us]"), empty, empty
+
+    stamps, x, y = zip(*rows)
+    times = np.array([stamp[11:] for stamp in stamps], dtype="datetime64[us]")
+    x = np.array(x, dtype=np.float64)
+    y = np.array(y, dtype=np.float64)
+    return times, x, y
+
+
+def sample_gaps(times):
+    """Seconds between consecutive samples; the last sample repeats the median gap."""
+    if len(times) == 0:
+        return np.empty(0)
+    gaps = np.diff(times).astype("timedelta64[us]").astype(np.float64) / 1e6
+    last = np.median(gaps) if len(gaps) else 0.0
+    return np.append(gaps, last)
+
+
+def compute_hourly_occupancy(times, x, y, zones, hours):
+    """Dwell seconds and visit counts per zone per hour start in `hours`.
+
+    Each sample counts for the time until the next one, capped at
+    MAX_SAMPLE_GAP_SECONDS. A visit starts at every outside-to-inside transition
+    or after a tracking gap, so one already in progress at the start of the
+    range counts in its first hour.
+    """
+    hour_index = np.searchsorted(
+        np.array(hours, dtype="datetime64[us]"), times, side="right"
+    ) - 1
+    gaps = sample_gaps(times)
+    durations = np.minimum(gaps, MAX_SAMPLE_GAP_SECONDS)
+    after_gap = np.concatenate(([True], gaps[:-1] > MAX_SAMPLE_GAP_SECONDS))
+    results = {}
+    for zone in zones:
+        inside = points_in_polygon(x, y, parse_polygon(json.loads(zone.polygon)))
+        entries = inside & (after_gap | ~np.concatenate(([False], inside[:-1])))
+        dwell = np.bincount(hour_index, weights=np.where(inside, durations, 0.0), minlength=len(hours))
+        visits = np.bincount(hour_index, weights=entries, minlength=len(hours))
+        for index, hour_start in enumerate(hours):
+            results[(zone.id, hour_start)] = (float(dwell[index]), int(visits[index]))
+    return results
+
+
+def _contiguous_runs(hours):
+    """Split sorted hour starts into runs of consecutive hours."""
+    runs = []
+    for hour in hours:
+        if runs and hour - runs[-1][-1] == HOUR:
+            runs[-1].append(hour)
+        else:
+            runs.append([hour])
+    return runs
+
+
+def get_zone_occupancy(session, camera_name, dt_start, dt_end):
+    """Dwell time and visits per zone over whole hours covering the range.
+
+    Per-hour results are stored in zone_occupancy; only hours without a stored
+    result are computed, with one coordinate query per run of consecutive missing hours.
+    """
+    zones = session.query(Zone).filter(Zone.camera_name == camera_name).order_by(Zone.id).all()
+    first_hour = dt_start.replace(minute=0, second=0, microsecond=0)
+    hours = []
+    hour = first_hour
+    while hour < dt_end:
+        hours.append(hour)
+        hour += HOUR
+
+    if not zones or not hours:
+        return {"start_time": first_hour.isoformat(), "end_time": first_hour.isoformat(), "zones": []}
+
+    stored = {
+        (row.zone_id, row.hour_start): (row.dwell_seconds, row.visits)
+        for row in session.query(ZoneOccupancy).filter(
+            ZoneOccupancy.zone_id.in_([zone.id for zone in zones]),
+            ZoneOccupancy.hour_start >= hours[0],
+            ZoneOccupancy.hour_start <= hours[-1],
+        )
+    }
+
+    missing_hours = sorted({hour for hour in hours for zone in zones if (zone.id, hour) not in stored})
+    for run in _contiguous_runs(missing_hours):
+        times, x, y = load_camera_track(session, camera_name, run[0], run[-1] + HOUR)
+        computed = compute_hourly_occupancy(times, x, y, zones, run)
+        for (zone_id, hour_start), (dwell, visits) in computed.items():
+            if (zone_id, hour_start) in stored:
+                continue
+            stored[(zone_id, hour_start)] = (dwell, visits)
+            session.add(ZoneOccupancy(
+                zone_id=zone_id, camera_name=camera_name, hour_start=hour_start,
+                dwell_seconds=dwell, visits=visits,
+            ))
+    if missing_hours:
+        try:
+            session.commit()
+        except IntegrityError:
+            # A concurrent request stored the same hours first; its results are identical
+            session.rollback()
+
+    report = []
+    for zone in zones:
+        hourly = [stored[(zone.id, hour)] for hour in hours]
+        report.append({
+            **zone_to_dict(zone),
+            "dwell_seconds": sum(dwell for dwell, _ in hourly),
+            "visits": sum(visits for _, visits in hourly),
+            "hourly": [
+                {"hour_start": hour.isoformat(), "dwell_seconds": dwell, "visits": visits}
+                for hour, (dwell, visits) in zip(hours, hourly)
+            ],
+        })
+
+    return {
+        "start_time": hours[0].isoformat(),
+        "end_time": (hours[-1] + HOUR).isoformat(),
+        "zones": report,
+    }
+
+
+def invalidate_zone_occupancy(Session, camera_name, dt_start, dt_end, zone_id=None):
+    """Drop stored per-hour results that new tracking data (or a zone edit) makes stale."""
+    try:
+        query = Session.query(ZoneOccupancy)
+        if zone_id is not None:
+            query = query.filter(ZoneOccupancy.zone_id == zone_id)
+        else:
+            query = query.filter(
+                ZoneOccupancy.camera_name == camera_name,
+                ZoneOccupancy.hour_start >= dt_start.replace(minute=0, second=0, microsecond=0),
+                ZoneOccupancy.hour_start < dt_end,
+            )
+        query.delete(synchronize_session=False)
+        Session.commit()
+    except Exception as e:
+        Session.rollback()
+        print(f"Error invalidating zone occupancy: {e}")
+        raise e
@@ -0,0 +1,234 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from src.database.hls import FRAGMENTED_MOVFLAGS, index_fragments
+from src.database.keyframes import KEYFRAME_INTERVAL_SECONDS, gop_size, probe_keyframes
+from src.database.models import LemurTracking, ProcessedVideo, ThumbnailSprite
+from src.database.save_processed_data import record_ingest_event
+
+# Footage older than this is re-encoded at a lower frame rate and quality
+COMPACT_VIDEOS_AFTER_DAYS = 14
+COMPACTED_FPS = 5
+COMPACTED_CRF = 36
+# Tracking rows older than this are reduced to one row per camera per second
+COMPACT_TRACKING_AFTER_DAYS = 14
+# Footage older than this is deleted outright; None keeps everything
+VIDEO_RETENTION_DAYS = None
+# How often an idle backend checks for work, and how much it does per pass
+COMPACTION_INTERVAL_SECONDS = 15 * 60
+VIDEO_BATCH_SIZE = 20
+TRACKING_CHUNK = timedelta(hours=1)
+
+# "<date> <date>T<HH:MM:SS>" -- the length of a tracking time_stamp truncated to the second
+SECOND_TIMESTAMP_LENGTH = 30
+
+_LOW_PRIORITY_PREFIX = ["nice", "-n", "19"] if os.name == "posix" else []
+
+
+class CompactionInterrupted(Exception):
+    """Raised when processing work arrives while a compaction step is running."""
+
+
+class StorageCompactor:
+    """Background job that bounds disk use while the processing queue is idle.
+
+    Each pass re-encodes old footage, downsamples old tracking rows to one per
+    second and, if a retention period is set, deletes footage past it. Every step
+    checks `is_idle` and yields as soon as a new processing job is queued.
+    """
+
+    def __init__(self, Session, is_idle, interval_seconds: float = COMPACTION_INTERVAL_SECONDS):
+        self.Session = Session
+        self.is_idle = is_idle
+        self.interval_seconds = interval_seconds
+        self.running = False
+        self.thread = None
+        self._wake = threading.Event()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name="StorageCompactor")
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5.0)
+
+    def _run(self):
+        while self.running:
+            self._wake.wait(self.interval_seconds)
+            if not self.running:
+                break
+            if self.is_idle():
+                self.run_once()
+
+    def run_once(self, now: datetime = None):
+        """Run one compaction pass. Returns a summary of what was done."""
+        now = now or datetime.now()
+        summary = {"videos_compacted": 0, "videos_deleted": 0, "tracking_rows_downsampled": 0}
+        try:
+            if VIDEO_RETENTION_DAYS is not None:
+                summary["videos_deleted"] = self.delete_expired_videos(now - timedelta(days=VIDEO_RETENTION_DAYS))
+            summary["videos_compacted"] = self.compact_videos(now - timedelta(days=COMPACT_VIDEOS_AFTER_DAYS))
+            summary["tracking_rows_downsampled"] = self.downsample_tracking(now - timedelta(days=COMPACT_TRACKING_AFTER_DAYS))
+        except CompactionInterrupted:
+            print("[StorageCompactor] Processing job queued, pausing compaction.")
+        except Exception as e:
+            print(f"[StorageCompactor] Compaction pass failed: {e}")
+        finally:
+            self.Session.remove()
+
+        print(f"[StorageCompactor] {summary}")
+        return summary
+
+    def _check_idle(self):
+        if not self.running and self.thread is not None:
+            raise CompactionInterrupted()
+        if not self.is_idle():
+            raise CompactionInterrupted()
+
+    def compact_videos(self, cutoff: datetime) -> int:
+        """Re-encode uncompacted footage older than `cutoff` and batch-update its rows."""
+        session = self.Session()
+        videos = session.query(
+            ProcessedVideo.id, ProcessedVideo.filepath, ProcessedVideo.duration,
+            ProcessedVideo.camera_name, ProcessedVideo.time_stamp,
+        ).filter(
+            ProcessedVideo.compacted.is_(False),
+            ProcessedVideo.time_stamp < str(cutoff),
+        ).order_by(ProcessedVideo.time_stamp).limit(VIDEO_BATCH_SIZE).all()
+
+        updates = []
+        replaced = []
+        try:
+            for video_id, filepath, duration, camera_name, time_stamp in videos:
+                self._check_idle()
+                if not filepath or not os.path.exists(filepath):
+                    continue
+                self._reencode(filepath)
+                updates.append({
+                    "id": video_id,
+                    "compacted": True,
+                    "frame_count": int(round((duration or 0) * COMPACTED_FPS)),
+                    "keyframes": json.dumps(probe_keyframes(filepath)),
+                    "fragments": json.dumps(index_fragments(filepath)),
+                })
+                video_start = datetime.fromisoformat(str(time_stamp))
+                replaced.append((camera_name, video_start, video_start + timedelta(seconds=duration or 0)))
+        finally:
+            # Record whatever finished before an interruption in one statement
+            if updates:
+                session.execute(update(ProcessedVideo), updates)
+                session.commit()
+            for camera_name, video_start, video_end in replaced:
+                record_ingest_event(session, "compaction", camera_name, video_start, video_end)
+
+        return len(updates)
+
+    def _reencode(self, filepath: str):
+        temp_path = f"{filepath}.compacting.mp4"
+        command = _LOW_PRIORITY_PREFIX + [
+            "ffmpeg", "-v", "error", "-i", filepath,
+            # Caps the rate without filling the gaps of activity-aware (variable rate) segments
+            "-r", str(COMPACTED_FPS), "-vsync", "vfr",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", str(COMPACTED_CRF),
+            # Same keyframe spacing in time and no B-frames, as stitching expects of every segment
+            "-g", str(gop_size(COMPACTED_FPS)), "-bf", "0",
+            "-force_key_frames", f"expr:gte(t,n_forced*{KEYFRAME_INTERVAL_SECONDS})",
+            "-pix_fmt", "yuv420p", "-movflags", FRAGMENTED_MOVFLAGS,
+            temp_path, "-y",
+        ]
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            while process.poll() is None:
+                if not self.is_idle():
+                    process.kill()
+                    process.wait()
+                    raise CompactionInterrupted()
+                time.sleep(0.5)
+
+            if process.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed compacting {filepath}: {process.stderr.read().decode(errors='replace')}")
+            os.replace(temp_path, filepath)
+        finally:
+            process.stderr.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def delete_expired_videos(self, cutoff: datetime) -> int:
+        """Delete footage (files and rows) older than `cutoff`."""
+        session = self.Session()
+        videos = session.query(ProcessedVideo.id, ProcessedVideo.filepath).filter(
+            ProcessedVideo.time_stamp < str(cutoff)
+        ).all()
+
+        for _, filepath in videos:
+            if filepath and os.path.exists(filepath):
+                os.remove(filepath)
+
+        if videos:
+            session.query(ProcessedVideo).filter(
+                ProcessedVideo.id.in_([video_id for video_id, _ in videos])
+            ).delete(synchronize_session=False)
+            session.query(ThumbnailSprite).filter(ThumbnailSprite.end_time <= cutoff).delete(synchronize_session=False)
+            session.commit()
+            record_ingest_event(session, "retention", None, datetime.min, cutoff)
+        return len(videos)
+
+    def downsample_tracking(self, cutoff: datetime) -> int:
+        """Replace per-frame tracking rows older than `cutoff` with one row per camera per second.
+
+        Works one hour at a time so the write lock is never held for long.
+        """
+        session = self.Session()
+        table = LemurTracking.__tablename__
+        cutoff_stamp = f"{cutoff.strftime('%Y-%m-%d')} {cutoff.strftime('%Y-%m-%dT%H:%M:%S')}"
+        downsampled = 0
+
+        while True:
+            self._check_idle()
+            # Per-frame rows carry fractional seconds; rows already downsampled do not
+            oldest = session.query(LemurTracking.time_stamp).filter(
+                LemurTracking.time_stamp < cutoff_stamp,
+                LemurTracking.time_stamp.op("GLOB")("*.*"),
+            ).order_by(LemurTracking.time_stamp).limit(1).scalar()
+            if oldest is None:
+                break
+
+            chunk_start = datetime.fromisoformat(oldest[11:SECOND_TIMESTAMP_LENGTH]).replace(minute=0, second=0)
+            chunk_end = min(chunk_start + TRACKING_CHUNK, cutoff)
+            bounds = (
+                oldest[:11] + chunk_start.strftime('%Y-%m-%dT%H:%M:%S'),
+                oldest[:11] + chunk_end.strftime('%Y-%m-%dT%H:%M:%S'),
+            )
+            if bounds[1] <= oldest:
+                break
+
+            connection = session.connection()
+            connection.exec_driver_sql(
+                f"INSERT INTO {table} (time_stamp, is_active, coordinate_x, coordinate_y, camera_name) "
+                f"SELECT substr(time_stamp, 1, {SECOND_TIMESTAMP_LENGTH}), MAX(is_active), "
+                "AVG(coordinate_x), AVG(coordinate_y), camera_name "
+                f"FROM {table} WHERE time_stamp >= ? AND time_stamp < ? AND time_stamp GLOB '*.*' "
+                f"GROUP BY camera_name, substr(time_stamp, 1, {SECOND_TIMESTAMP_LENGTH})",
+                bounds,
+            )
+            result = connection.exec_driver_sql(
+                f"DELETE FROM {table} WHERE time_stamp >= ? AND time_stamp < ? AND time_stamp GLOB '*.*'",
+                bounds,
+            )
+            session.commit()
+            downsampled += result.rowcount
+            record_ingest_event(session, "compaction", None, chunk_start, chunk_end)
+
+        return downsampled
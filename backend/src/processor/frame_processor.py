@@ -98,12 +98,14 @@ def process_frame(frame, back_sub, lk_params):
     # Update coordinates based on both methods
     coordinateX = None
     coordinateY = None
+    blob_area = 0.0
 
     if box_activity:
         # Use first bounding box centroid
         centroid = grouped_boxes[0]["centroid"]
         coordinateX = centroid[0]
         coordinateY = centroid[1]
+        blob_area = float(grouped_boxes[0]["area"])
     elif flow_activity:
         # Use average of tracked points
         avg_x = sum(p[0] for p in tracked_points) / len(tracked_points)
@@ -135,4 +137,4 @@ def process_frame(frame, back_sub, lk_params):
         cv2.circle(frame, draw_centroid, 5, (0, 0, 255), -1)
 
 
-    return frame, coordinateX, coordinateY, activity
+    return frame, coordinateX, coordinateY, activity, blob_area
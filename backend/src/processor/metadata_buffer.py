@@ -0,0 +1,60 @@
+from datetime import datetime
+import numpy as np
+
+# One record per processed frame. Coordinates are NaN when nothing was detected.
+TRACKING_DTYPE = np.dtype([
+    ("frame_index", np.int32),
+    ("activity", np.bool_),
+    ("x", np.float32),
+    ("y", np.float32),
+    ("area", np.float32),
+])
+
+INITIAL_CAPACITY = 4096
+
+# Stored tracking rows read "<date> <date>T<HH:MM:SS.ffffff>"; the ISO part starts at character 12
+TRACKING_TIME_STAMP_GLOB = "????-??-?? ????-??-??T??:??:??*"
+
+
+class MetadataBuffer:
+    """Growable structured array holding per-frame tracking metadata for one segment.
+
+    Frame indices are relative to the segment start, so timestamps can be derived
+    from the segment start time and the frame rate instead of being stored per frame.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._data = np.empty(capacity, dtype=TRACKING_DTYPE)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, activity, coordinate_x, coordinate_y, blob_area=0.0):
+        if self._size == len(self._data):
+            grown = np.empty(len(self._data) * 2, dtype=TRACKING_DTYPE)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+
+        record = self._data[self._size]
+        record["frame_index"] = self._size
+        record["activity"] = bool(activity)
+        record["x"] = np.nan if coordinate_x is None else coordinate_x
+        record["y"] = np.nan if coordinate_y is None else coordinate_y
+        record["area"] = blob_area
+        self._size += 1
+
+    def take(self) -> np.ndarray:
+        """Return the buffered records as a trimmed array and reset the buffer."""
+        records = self._data[:self._size].copy()
+        self._size = 0
+        return records
+
+    def clear(self):
+        self._size = 0
+
+
+def frame_timestamps(records: np.ndarray, segment_start: datetime, fps: float) -> np.ndarray:
+    """Derive per-frame datetime64[us] timestamps from the segment start and frame rate."""
+    offsets = np.round(records["frame_index"].astype(np.float64) * (1_000_000 / fps)).astype("timedelta64[us]")
+    return np.datetime64(segment_start, "us") + offsets
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+
+# Workers report a file's progress at most this often
+PROGRESS_INTERVAL_SECONDS = 0.5
+# Server-sent event streams send at most one update per interval, and a comment when idle
+SSE_MIN_INTERVAL_SECONDS = 0.5
+SSE_KEEPALIVE_SECONDS = 15.0
+SSE_RETRY_MILLISECONDS = 2000
+SSE_MIMETYPE = "text/event-stream"
+
+# Set in each pool worker by init_worker
+_worker_queue = None
+
+
+def init_worker(queue):
+    """Pool initializer: workers report progress to the parent through `queue`."""
+    global _worker_queue
+    _worker_queue = queue
+
+
+class FileProgress:
+    """Worker-side reporter for one video file, throttled to PROGRESS_INTERVAL_SECONDS."""
+
+    def __init__(self, video_path, camera_name, queue=None):
+        self.video_path = video_path
+        self.camera_name = camera_name
+        self.queue = queue if queue is not None else _worker_queue
+        self._last_report = 0.0
+
+    def update(self, frames_done, total_frames):
+        now = time.monotonic()
+        if self.queue is None or total_frames <= 0 or now - self._last_report < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_report = now
+        # The file is only done once its last segment is saved, see finish()
+        self.queue.put((self.video_path, self.camera_name, min(frames_done / total_frames, 0.99)))
+
+    def finish(self):
+        if self.queue is not None:
+            self.queue.put((self.video_path, self.camera_name, 1.0))
+
+
+class ProgressBroker:
+    """Latest per-file progress of the running job, with a revision clients can wait on.
+
+    Updates are coalesced: a waiter wakes once for any number of updates since
+    its revision and reads the current snapshot, so slow clients never fall behind.
+    """
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._revision = 0
+        self._job = None
+        self._files = {}
+
+    def start_job(self, job_path, file_count):
+        with self._changed:
+            self._job = {"file_path": job_path, "files_total": file_count}
+            self._files = {}
+            self._bump()
+
+    def update_file(self, video_path, camera_name, fraction):
+        with self._changed:
+            self._files[video_path] = {"file_path": video_path, "camera_name": camera_name, "fraction": fraction}
+            self._bump()
+
+    def finish_job(self):
+        with self._changed:
+            self._job = None
+            self._files = {}
+            self._bump()
+
+    def touch(self):
+        """Wake waiters after a change outside the broker, such as a job being queued."""
+        with self._changed:
+            self._bump()
+
+    def _bump(self):
+        self._revision += 1
+        self._changed.notify_all()
+
+    def job_fraction(self):
+        with self._changed:
+            return self._job_fraction()
+
+    def _job_fraction(self):
+        if not self._job or not self._job["files_total"]:
+            return 0.0
+        return sum(file["fraction"] for file in self._files.values()) / self._job["files_total"]
+
+    def snapshot(self):
+        with self._changed:
+            return self._snapshot()
+
+    def _snapshot(self):
+        files = sorted(self._files.values(), key=lambda file: (file["camera_name"], file["file_path"]))
+        return {
+            "revision": self._revision,
+            "job": None if self._job is None else {
+                **self._job,
+                "files_done": sum(1 for file in files if file["fraction"] >= 1.0),
+                "percent": round(self._job_fraction() * 100, 1),
+            },
+            "files": [
+                {"file_path": file["file_path"], "camera_name": file["camera_name"],
+                 "percent": round(file["fraction"] * 100, 1)}
+                for file in files if file["fraction"] < 1.0
+            ],
+        }
+
+    def wait(self, revision=None, timeout=SSE_KEEPALIVE_SECONDS):
+        """(snapshot, changed): returns as soon as the revision is newer than `revision`, or after `timeout`."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while revision is not None and self._revision <= revision:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self._snapshot(), False
+                self._changed.wait(remaining)
+            return self._snapshot(), True
+
+
+def sse_event(event, data, event_id=None):
+    """One server-sent event frame."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.extend(f"data: {line}" for line in json.dumps(data).splitlines())
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_stream(broker, payload):
+    """Yield server-sent events whenever the broker changes; `payload(snapshot)` builds each event's data."""
+    yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n"
+    revision = None
+    while True:
+        snapshot, changed = broker.wait(revision, SSE_KEEPALIVE_SECONDS)
+        if changed:
+            revision = snapshot["revision"]
+            yield sse_event("status", payload(snapshot), revision)
+            # Coalesces bursts of updates into one event per interval
+            time.sleep(SSE_MIN_INTERVAL_SECONDS)
+        else:
+            # Comments keep the connection from idling out and let the server notice closed clients
+            yield ": keep-alive\n\n"
@@ -1,10 +1,14 @@
 # queue_processor.py
 import math
+import multiprocessing
 import os
+import queue
+import threading
 import cv2
 from datetime import datetime, timedelta
 from multiprocessing import Pool
 from functools import partial
+from .progress import FileProgress, init_worker
 from .video_processor import VideoProcessor
 from src.database.database_handler import DatabaseHandler
 
@@ -25,12 +29,14 @@ class QueueProcessor:
 
     def run_video_processor(self, db_url, camera_dirs, item):
         video_path, start_time, camera_name = item
+        progress = FileProgress(video_path, camera_name)
         vp = VideoProcessor(
             db_url=db_url,
             cam_dir=camera_dirs[camera_name],
             source=video_path,
             camera_name=camera_name,
-            real_start_time=start_time
+            real_start_time=start_time,
+            on_progress=progress.update,
         )
         try:
             vp.start()  # Start the background thread
@@ -38,8 +44,22 @@ class QueueProcessor:
             return f"Success: {video_path}" # Return status
         except Exception as e:
             return f"Failed: {video_path}, {e}"
+        finally:
+            progress.finish()
+
+    def _forward_progress(self, progress_queue, progress_broker, set_process_percentage, stop):
+        """Move worker reports into the broker until `stop` is set and the queue is drained."""
+        while True:
+            try:
+                video_path, camera_name, fraction = progress_queue.get(timeout=0.2)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            progress_broker.update_file(video_path, camera_name, fraction)
+            set_process_percentage(math.floor(progress_broker.job_fraction() * 100))
 
-    def process_items(self, queue_item, set_process_percentage) -> str:
+    def process_items(self, queue_item, set_process_percentage, progress_broker=None) -> str:
         db = DatabaseHandler()
         db_url = db.get_database_url()
         root_path, initial_time = queue_item
@@ -79,18 +99,38 @@ class QueueProcessor:
         # Parallel processing
         print(f"[QueueProcessor] Starting parallel processing of {len(result_tuples)} videos...")
 
-        with Pool(processes=self.max_workers) as pool:
-            worker_fn = partial(self.run_video_processor, db_url, db.camera_dirs)
-            results = pool.imap_unordered(worker_fn, result_tuples)
+        # Workers report per-file progress through this queue; a thread here forwards it to the broker
+        progress_queue = None
+        stop_forwarding = threading.Event()
+        forwarder = None
+        if progress_broker is not None:
+            progress_queue = multiprocessing.Queue()
+            progress_broker.start_job(root_path, len(result_tuples))
+            forwarder = threading.Thread(
+                target=self._forward_progress,
+                args=(progress_queue, progress_broker, set_process_percentage, stop_forwarding),
+                daemon=True, name="ProgressForwarder",
+            )
+            forwarder.start()
 
-            total = len(result_tuples)
-            for index, result_value in enumerate(results, start=1):
-                # Use the 'index' for the calculation
-                set_process_percentage(math.floor((index / total) * 100))
-                # You can optionally use 'result_value' here if needed, e.g., for logging
-                # print(f"Processed item {index}/{total}: {result_value}")
+        try:
+            with Pool(processes=self.max_workers, initializer=init_worker, initargs=(progress_queue,)) as pool:
+                worker_fn = partial(self.run_video_processor, db_url, db.camera_dirs)
+                results = pool.imap_unordered(worker_fn, result_tuples)
+
+                total = len(result_tuples)
+                for index, result_value in enumerate(results, start=1):
+                    if progress_broker is None:
+                        # Without a broker, progress only moves as whole files finish
+                        set_process_percentage(math.floor((index / total) * 100))
+                    # You can optionally use 'result_value' here if needed, e.g., for logging
+                    # print(f"Processed item {index}/{total}: {result_value}")
+        finally:
+            stop_forwarding.set()
+            if forwarder is not None:
+                forwarder.join()
+                progress_broker.finish_job()
 
-        
 
         result_message = f"[{datetime.now()}] QueueProcessor: All video processing finished using {self.max_workers} workers."
         print(result_message)
@@ -5,6 +5,7 @@ import numpy as np
 from collections import deque
 from .frame_processor import process_frame
 from .save_queue import SaveQueueHandler
+from .metadata_buffer import MetadataBuffer
 import logging
 import json
 
@@ -14,8 +15,10 @@ MINUTE_BUFFER_SIZE = 1000000
 FPS = 15
 
 class VideoProcessor:
-    def __init__(self, db_url: str, cam_dir: str, source: str, camera_name: str, real_start_time: datetime): # Removed webrtc_client
+    def __init__(self, db_url: str, cam_dir: str, source: str, camera_name: str, real_start_time: datetime, on_progress=None): # Removed webrtc_client
         self.db_url = db_url
+        # Called with (frames read, total frames) for every frame; the callback throttles itself
+        self.on_progress = on_progress
         self.cam_dir = cam_dir
         self.source = source 
         self.camera_name = camera_name
@@ -31,7 +34,7 @@ class VideoProcessor:
 
         self.thread = None
         self.frame_buffer = deque(maxlen=MINUTE_BUFFER_SIZE)
-        self.metadata_buffer = deque(maxlen=MINUTE_BUFFER_SIZE)
+        self.metadata_buffer = MetadataBuffer()
         self.buffer_lock = threading.Lock() # Lock for buffer/metadata/segment time
 
         self.real_start_time = real_start_time
@@ -63,6 +66,7 @@ class VideoProcessor:
                          criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
 
         frame_read_success_count = 0
+        total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
         while self.running and self.cap.isOpened():
             try:
@@ -80,26 +84,20 @@ class VideoProcessor:
                 frame_read_fail_count = 0
 
                 frame_resized = cv2.resize(frame, (640, 480))
-                processed_frame, coordinateX, coordinateY, activity = process_frame(frame_resized, back_sub, lk_params)
-
-                current_time = self._get_current_video_time()
-                metadata = {
-                    "coordinateX": coordinateX,
-                    "coordinateY": coordinateY,
-                    "activity": activity,
-                    "timestamp": current_time.isoformat() # Use ISO format string
-                }
-
+                processed_frame, coordinateX, coordinateY, activity, blob_area = process_frame(frame_resized, back_sub, lk_params)
 
                 with self.buffer_lock:
                     self.frame_buffer.append(processed_frame)
-                    self.metadata_buffer.append(metadata)
+                    self.metadata_buffer.append(activity, coordinateX, coordinateY, blob_area)
                     self.frame_count += 1
                     #should_save = len(self.frame_buffer) >= MINUTE_BUFFER_SIZE
 
                 # if should_save:
                 #     self._save_segment()
 
+                if self.on_progress:
+                    self.on_progress(frame_read_success_count, total_frames)
+
                 key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
                      log.info(f"[{self.camera_name}] 'q' pressed, stopping processor.")
@@ -138,12 +136,11 @@ class VideoProcessor:
                  return # Nothing to save
 
              frames_to_save = list(self.frame_buffer)
-             metadata_to_save = list(self.metadata_buffer)
+             metadata_to_save = self.metadata_buffer.take()
              segment_time_to_save = self.segment_start_time
 
              # Clear buffers *after* copying
              self.frame_buffer.clear()
-             self.metadata_buffer.clear()
              # Update segment start time for the *next* segment
              self.segment_start_time = self._get_current_video_time()
              log.debug(f"[{self.camera_name}] Prepared segment from {segment_time_to_save} with {len(frames_to_save)} frames for saving.")
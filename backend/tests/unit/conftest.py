@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+from src.database.models import Base
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    Session = scoped_session(sessionmaker(bind=engine))
+    yield Session
+    Session.remove()
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def Session(session):
+    """The same scoped session, for tests that also open plain sessions from it."""
+    return session
+
+
+@pytest.fixture
+def file_session(tmp_path):
+    # Workers share one database file; an in-memory database is private to its connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'tracking.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = scoped_session(sessionmaker(bind=engine))
+    yield Session
+    Session.remove()
+    engine.dispose()
@@ -0,0 +1,70 @@
+import importlib
+
+import numpy as np
+import pytest
+
+from src.database import activity_encoding
+from src.database.activity_encoding import activity_keep_mask, encode_activity_aware
+from src.database.hls import index_fragments
+
+FPS = 15
+
+
+class TestEncodingMode:
+    @pytest.fixture(autouse=True)
+    def reload_after(self):
+        yield
+        importlib.reload(activity_encoding)
+
+    def test_constant_rate_by_default(self, monkeypatch):
+        """Test that idle frames are only dropped when activity encoding is asked for"""
+        monkeypatch.delenv("VIDEO_ENCODING_MODE", raising=False)
+        importlib.reload(activity_encoding)
+        assert activity_encoding.VIDEO_ENCODING_MODE == "constant"
+        assert not activity_encoding.activity_encoding_available()
+
+    def test_activity_mode_from_environment(self, monkeypatch):
+        monkeypatch.setenv("VIDEO_ENCODING_MODE", "activity")
+        importlib.reload(activity_encoding)
+        assert activity_encoding.VIDEO_ENCODING_MODE == "activity"
+
+
+class TestActivityKeepMask:
+    def test_idle_frames_are_thinned(self):
+        keep = activity_keep_mask(np.zeros(45, dtype=bool), 45, FPS)
+        assert np.flatnonzero(keep).tolist() == [0, 15, 30, 44]
+
+    def test_activity_keeps_full_rate_with_margin(self):
+        activity = np.zeros(90, dtype=bool)
+        activity[40:45] = True
+
+        keep = activity_keep_mask(activity, 90, FPS)
+
+        assert keep[25:60].all()
+        assert not keep[24] and not keep[61]
+        assert keep[75] and keep[89]
+
+    def test_missing_flags_count_as_idle(self):
+        keep = activity_keep_mask([True], 20, FPS)
+        assert np.flatnonzero(keep).tolist() == list(range(16)) + [19]
+
+
+class TestEncodeActivityAware:
+    def test_timestamps_follow_the_capture_timeline(self, tmp_path):
+        av = pytest.importorskip("av")
+        frames = [np.full((48, 64, 3), index, dtype=np.uint8) for index in range(150)]
+        activity = np.zeros(150, dtype=bool)
+        activity[60:75] = True
+        keep = activity_keep_mask(activity, 150, FPS)
+        path = str(tmp_path / "segment.mp4")
+
+        encoded = encode_activity_aware(frames, keep, FPS, path)
+
+        with av.open(path) as container:
+            stream = container.streams.video[0]
+            decoded = [(frame.pts * stream.time_base, frame.key_frame) for frame in container.decode(stream)]
+        assert encoded == keep.sum() == len(decoded)
+        assert [round(float(t) * FPS) for t, _ in decoded] == np.flatnonzero(keep).tolist()
+        assert [float(t) for t, key in decoded if key] == [0.0, 2.0, 4.0, 6.0, 8.0]
+        # Still fragmented one GOP per fragment, as HLS playback expects
+        assert len(index_fragments(path)["fragments"]) == 5
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from flask import Flask, request
+
+from src.database.conditional import not_modified, range_validators, range_version
+from src.database.save_processed_data import record_ingest_event
+
+
+def at(clock):
+    return datetime.fromisoformat(f"2025-04-02T{clock}")
+
+
+class TestConditional:
+    def test_version_tracks_overlapping_writes_only(self, Session):
+        session = Session()
+        assert range_version(session, at("12:00:00"), at("13:00:00")) == (0, None)
+
+        first = record_ingest_event(session, "segment", "Camera1", at("12:10:00"), at("12:11:00"))
+        record_ingest_event(session, "segment", "Camera1", at("14:00:00"), at("14:01:00"))
+        record_ingest_event(session, "segment", "Camera2", at("12:20:00"), at("12:21:00"))
+
+        assert range_version(session, at("12:00:00"), at("13:00:00"), ["Camera1"])[0] == first
+        assert range_version(session, at("12:00:00"), at("13:00:00"))[0] == first + 2
+
+    def test_not_modified_until_range_changes(self, Session):
+        session = Session()
+        app = Flask(__name__)
+        record_ingest_event(session, "segment", "Camera1", at("12:10:00"), at("12:11:00"))
+        url = "/activity-data?start_time=2025-04-02T12:00:00&end_time=2025-04-02T13:00:00"
+
+        with app.test_request_context(url):
+            etag, last_modified = range_validators(session, request, "application/json", at("12:00:00"), at("13:00:00"))
+
+        with app.test_request_context(url, headers={"If-None-Match": f'W/"{etag}"'}):
+            response = not_modified(request, etag, last_modified)
+            assert response.status_code == 304
+
+            record_ingest_event(session, "segment", "Camera1", at("12:30:00"), at("12:31:00"))
+            new_etag, new_last_modified = range_validators(session, request, "application/json", at("12:00:00"), at("13:00:00"))
+            assert new_etag != etag
+            assert not_modified(request, new_etag, new_last_modified) is None
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from src.database.downsampling import downsample
+
+
+class TestDownsample:
+    @pytest.fixture
+    def points(self):
+        x = np.arange(100, dtype=np.float64)
+        return np.column_stack([x, np.zeros(100)])
+
+    def test_short_input_unchanged(self, points):
+        assert len(downsample(points[:5], 10, "stride")) == 5
+
+    def test_stride_keeps_ends(self, points):
+        reduced = downsample(points, 5, "stride")
+        assert len(reduced) == 5
+        assert (reduced[0, 0], reduced[-1, 0]) == (0, 99)
+
+    def test_mean_ignores_missing(self, points):
+        points[:50] = np.nan
+        reduced = downsample(points, 4, "mean")
+        assert np.isnan(reduced[0]).all()
+        assert reduced[3, 0] == pytest.approx(87.0)
+
+    def test_lttb_keeps_spike(self, points):
+        """Test that LTTB keeps an excursion that stride sampling skips"""
+        points[37, 1] = 500.0
+        assert 500.0 not in downsample(points, 10, "stride")[:, 1]
+        assert 500.0 in downsample(points, 10, "lttb")[:, 1]
+
+    def test_unknown_strategy(self, points):
+        with pytest.raises(ValueError):
+            downsample(points, 10, "median")
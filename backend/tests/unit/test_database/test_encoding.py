@@ -0,0 +1,64 @@
+import gzip
+import struct
+
+import numpy as np
+from flask import Flask, Response, request
+
+from src.database.encoding import (
+    PACKED_MIMETYPE, JSON_MIMETYPE, negotiate_format, pack_activity, pack_coordinates, compress_response,
+)
+
+
+class TestPackedEncoding:
+    def test_pack_activity(self):
+        """Test the packed activity header and bitset"""
+        body = pack_activity([True, False, False, True, False, False, False, False, True], 1)
+
+        assert body[:4] == b"LMTR"
+        assert struct.unpack("<BBHII", body[4:16]) == (1, 1, 0, 9, 1)
+        assert np.unpackbits(np.frombuffer(body[16:], dtype=np.uint8))[:9].tolist() == [1, 0, 0, 1, 0, 0, 0, 0, 1]
+
+    def test_pack_coordinates(self):
+        """Test that coordinates are packed as float32 columns with NaN for missing points"""
+        body = pack_coordinates({"Camera1": np.array([[1.0, 2.0], [np.nan, np.nan]])})
+
+        assert struct.unpack("<H", body[8:10]) == (1,)
+        assert body[11:18] == b"Camera1"
+        assert struct.unpack("<I", body[18:22]) == (2,)
+        x = np.frombuffer(body[22:30], dtype="<f4")
+        y = np.frombuffer(body[30:38], dtype="<f4")
+        assert x[0] == 1.0 and y[0] == 2.0
+        assert np.isnan(x[1]) and np.isnan(y[1])
+
+
+class TestNegotiation:
+    def test_defaults_to_json(self):
+        app = Flask(__name__)
+        with app.test_request_context(headers={"Accept": "*/*"}):
+            assert negotiate_format(request) == JSON_MIMETYPE
+
+    def test_accept_header_and_query(self):
+        app = Flask(__name__)
+        with app.test_request_context(headers={"Accept": PACKED_MIMETYPE}):
+            assert negotiate_format(request) == PACKED_MIMETYPE
+        with app.test_request_context("/?format=packed"):
+            assert negotiate_format(request) == PACKED_MIMETYPE
+
+
+class TestCompressResponse:
+    def test_gzip_large_json(self):
+        app = Flask(__name__)
+        body = b"[" + b"true," * 1000 + b"true]"
+        with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+            response = compress_response(request, Response(body, mimetype=JSON_MIMETYPE))
+
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.get_data()) == body
+
+    def test_skips_small_and_unaccepted(self):
+        app = Flask(__name__)
+        with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+            assert "Content-Encoding" not in compress_response(request, Response(b"{}", mimetype=JSON_MIMETYPE)).headers
+        with app.test_request_context():
+            big = Response(b"x" * 5000, mimetype=JSON_MIMETYPE)
+            assert "Content-Encoding" not in compress_response(request, big).headers
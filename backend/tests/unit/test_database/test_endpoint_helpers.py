@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.models import LemurTracking, ProcessedVideo
+from src.database.endpoint_helpers import (
+    find_relevant_videos, get_activity_batch_helper, get_activity_helper, get_coordinate_helper,
+)
+
+
+def add_frame(session, camera_name, clock, is_active, x=None, y=None):
+    session.add(LemurTracking(
+        time_stamp=f"2025-04-02 2025-04-02T{clock}", is_active=is_active,
+        coordinate_x=x, coordinate_y=y, camera_name=camera_name,
+    ))
+
+
+class TestGetActivityHelper:
+    def test_cameras_merged_by_timestamp(self, session):
+        """Test that cameras with different row counts are merged by time, not position"""
+        add_frame(session, "Camera1", "12:00:00.000000", False)
+        add_frame(session, "Camera1", "12:00:00.066667", False)
+        add_frame(session, "Camera1", "12:00:01.000000", False)
+        # Camera2 has no rows in the first second and is active in the third
+        add_frame(session, "Camera2", "12:00:02.933333", True)
+        add_frame(session, "Camera3", "12:00:01.000000", True)
+        session.commit()
+
+        activity = get_activity_helper(session, "2025-04-02T12:00:00", "2025-04-02T12:00:04")
+
+        assert activity == [False, True, True, False]
+
+    def test_bucket_width(self, session):
+        """Test that wider buckets OR their frames together"""
+        add_frame(session, "Camera1", "12:00:09.933333", True)
+        add_frame(session, "Camera1", "12:00:10.000000", False)
+        session.commit()
+
+        assert get_activity_helper(session, "2025-04-02T12:00:00", "2025-04-02T12:01:00", 10) == [True] + [False] * 5
+
+    def test_no_rows(self, session):
+        assert get_activity_helper(session, "2025-04-02T12:00:00", "2025-04-02T12:01:00") == []
+
+
+class TestGetActivityBatchHelper:
+    def test_ranges_aligned_and_padded(self, session):
+        add_frame(session, "Camera1", "12:00:01.000000", True)
+        add_frame(session, "Camera2", "12:00:01.500000", True)
+        add_frame(session, "Camera1", "13:00:00.000000", False)
+        add_frame(session, "Camera1", "13:00:02.000000", True)
+        session.commit()
+
+        batch = get_activity_batch_helper(session, [
+            ("2025-04-02T12:00:00", "2025-04-02T12:00:03"),
+            ("2025-04-02T13:00:00", "2025-04-02T13:00:02"),
+        ], metrics=["activity", "active_frames", "total_frames"])
+
+        first, second = batch["ranges"]
+        assert batch["bucket_count"] == 3
+        assert first["activity"] == [False, True, False]
+        assert first["active_frames"] == [0, 2, 0]
+        assert second["total_frames"] == [1, 0, None]
+        assert second["activity"] == [False, False, None]
+
+    def test_camera_filter(self, session):
+        add_frame(session, "Camera1", "12:00:00.000000", True)
+        add_frame(session, "Camera2", "12:00:01.000000", True)
+        session.commit()
+
+        batch = get_activity_batch_helper(session, [("2025-04-02T12:00:00", "2025-04-02T12:00:02")], cameras=["Camera2"])
+        assert batch["ranges"][0]["activity"] == [False, True]
+
+    def test_rejects_unknown_metric(self, session):
+        with pytest.raises(ValueError):
+            get_activity_batch_helper(session, [("2025-04-02T12:00:00", "2025-04-02T12:00:02")], metrics=["speed"])
+
+
+class TestGetCoordinateHelper:
+    def test_camera_selection_and_missing_coordinates(self, session):
+        """Test that only requested cameras are returned and missing points stay None"""
+        add_frame(session, "Camera1", "12:00:00.000000", True, 1.0, 2.0)
+        add_frame(session, "Camera1", "12:00:00.066667", False)
+        add_frame(session, "Camera2", "12:00:00.000000", True, 5.0, 6.0)
+        session.commit()
+
+        coordinates = get_coordinate_helper(session, "2025-04-02T12:00:00", "2025-04-02T12:01:00", ["Camera1"])
+
+        assert coordinates == [{"Camera1": [{"x": 1.0, "y": 2.0}, {"x": None, "y": None}]}]
+
+    def test_max_points(self, session):
+        for i in range(30):
+            add_frame(session, "Camera1", f"12:00:{i:02d}.000000", True, float(i), 0.0)
+        session.commit()
+
+        coordinates = get_coordinate_helper(session, "2025-04-02T12:00:00", "2025-04-02T12:01:00", max_points=3, strategy="mean")
+
+        assert coordinates[0]["Camera1"] == [{"x": 4.5, "y": 0.0}, {"x": 14.5, "y": 0.0}, {"x": 24.5, "y": 0.0}]
+        assert coordinates[1] == {"Camera2": []}
+
+    def test_no_rows(self, session):
+        """Test that every camera is listed, with no points, when the range has no rows"""
+        assert get_coordinate_helper(session, "2025-04-02T12:00:00", "2025-04-02T12:01:00") == [
+            {"Camera1": []}, {"Camera2": []}, {"Camera3": []},
+        ]
+
+
+def add_video(session, camera_name, start, duration):
+    session.add(ProcessedVideo(
+        processed_filename=f"{camera_name}_{start}.mp4", camera_name=camera_name, duration=duration,
+        time_stamp=str(start), start_time=start, end_time=start + timedelta(seconds=duration),
+    ))
+
+
+class TestFindRelevantVideos:
+    def test_overlapping_videos_with_exact_offsets(self, session):
+        for minute in range(0, 50, 10):
+            add_video(session, "Camera1", datetime(2025, 4, 2, 12, minute), 600)
+        add_video(session, "Camera2", datetime(2025, 4, 2, 12, 10), 600)
+        session.commit()
+
+        found = find_relevant_videos(session, "2025-04-02T12:15:30", "2025-04-02T12:25:00", "Camera1")
+
+        assert [video.start_time.minute for video in found["selected"]] == [10, 20]
+        assert found["first"].start_time.minute == 10
+        assert found["clips"] == [(330.0, 600.0), (0.0, 300.0)]
+
+    def test_no_overlap(self, session):
+        add_video(session, "Camera1", datetime(2025, 4, 2, 12, 0), 600)
+        session.commit()
+
+        found = find_relevant_videos(session, "2025-04-02T13:00:00", "2025-04-02T13:05:00", "Camera1")
+        assert found["selected"] == [] and found["first"] is None
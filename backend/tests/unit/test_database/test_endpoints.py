@@ -0,0 +1,63 @@
+from queue import Queue
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.database.endpoints import create_app
+
+
+@pytest.fixture
+def prefetcher():
+    return MagicMock()
+
+
+@pytest.fixture
+def app(session, prefetcher, tmp_path):
+    db = MagicMock(Session=session, camera_dirs={"Camera1": str(tmp_path / "camera1")})
+    with patch('src.database.endpoints.DatabaseHandler', return_value=db), \
+            patch('src.database.endpoints.STITCHED_VIDEOS_DIR', str(tmp_path / "stitched")), \
+            patch('src.database.endpoints.Prefetcher', return_value=prefetcher):
+        yield create_app(Queue(), MagicMock(), MagicMock(return_value=True), MagicMock(), MagicMock(return_value=0))
+
+
+class TestStitchedVideo:
+    def test_serves_stitched_range(self, app, prefetcher, tmp_path):
+        video = tmp_path / "Camera1_stitched.mp4"
+        video.write_bytes(b"video")
+        client = app.test_client()
+
+        with patch('src.database.endpoints.get_stitched_video', return_value=str(video)) as stitch:
+            response = client.get('/stitched-video', query_string={
+                "camera_name": "Camera1", "start_time": "2025-04-02T12:00:00", "end_time": "2025-04-02T12:10:00",
+            })
+
+        assert response.status_code == 200
+        assert response.data == b"video"
+        assert response.headers["ETag"]
+        assert stitch.call_args.args[2:] == ("Camera1", "2025-04-02T12:00:00", "2025-04-02T12:10:00")
+        prefetcher.observe.assert_called_once()
+
+    def test_nothing_to_stitch(self, app):
+        with patch('src.database.endpoints.get_stitched_video', return_value=None):
+            response = app.test_client().get('/stitched-video', query_string={
+                "camera_name": "Camera1", "start_time": "2025-04-02T12:00:00", "end_time": "2025-04-02T12:10:00",
+            })
+        assert response.status_code == 404
+
+    def test_missing_parameters(self, app):
+        assert app.test_client().get('/stitched-video', query_string={"camera_name": "Camera1"}).status_code == 400
+
+
+class TestCoordinateData:
+    def test_empty_range_lists_every_camera(self, app):
+        response = app.test_client().get('/coordinate-data', query_string={
+            "start_time": "2025-04-02T12:00:00", "end_time": "2025-04-02T12:10:00",
+        })
+        assert response.status_code == 200
+        assert response.get_json() == {"coordinates": [{"Camera1": []}, {"Camera2": []}, {"Camera3": []}]}
+
+    def test_unknown_camera(self, app):
+        response = app.test_client().get('/coordinate-data', query_string={
+            "start_time": "2025-04-02T12:00:00", "end_time": "2025-04-02T12:10:00", "cameras": "Camera1,Camera9",
+        })
+        assert response.status_code == 400
@@ -0,0 +1,120 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from src.database.models import ActivityEpisode
+from src.database.episodes import backfill_activity_episodes, find_episodes, update_activity_episodes
+from src.database.save_processed_data import add_tracking_batch
+from src.processor.metadata_buffer import MetadataBuffer
+
+
+def make_records(activity, area=10.0):
+    buffer = MetadataBuffer()
+    for is_active in activity:
+        if is_active:
+            buffer.append(True, 100.0, 50.0, area)
+        else:
+            buffer.append(False, None, None)
+    return buffer.take()
+
+
+class TestFindEpisodes:
+    def test_gap_merging(self):
+        """Test that runs separated by a short gap become one episode"""
+        # 1 fps, gap of 1 frame merges, gap of 3 frames does not
+        records = make_records([1, 1, 0, 1, 0, 0, 0, 1])
+        episodes = find_episodes(records, fps=1, merge_gap_seconds=1)
+
+        assert [(e["start_frame"], e["end_frame"]) for e in episodes] == [(0, 4), (7, 8)]
+        assert episodes[0]["active_frames"] == 3
+        assert episodes[0]["centroid_frames"] == 3
+
+    def test_no_activity(self):
+        """Test that an idle segment has no episodes"""
+        assert find_episodes(make_records([0, 0, 0]), fps=15) == []
+
+
+class TestUpdateActivityEpisodes:
+    def test_episode_summary(self, session):
+        """Test that stored episodes carry times, peak area and centroid"""
+        update_activity_episodes(session, make_records([0, 1, 1, 0], area=42.0), datetime(2025, 4, 2, 12, 0, 0), 1, "Camera1")
+
+        episode = session.query(ActivityEpisode).one()
+        assert episode.start_time == datetime(2025, 4, 2, 12, 0, 1)
+        assert episode.end_time == datetime(2025, 4, 2, 12, 0, 3)
+        assert episode.duration == pytest.approx(2.0)
+        assert episode.peak_area == pytest.approx(42.0)
+        assert (episode.centroid_x, episode.centroid_y) == (pytest.approx(100.0), pytest.approx(50.0))
+
+    def test_merges_across_segments_saved_out_of_order(self, session):
+        """Test that an episode spanning a segment boundary is stored once"""
+        update_activity_episodes(session, make_records([1, 1, 0]), datetime(2025, 4, 2, 12, 0, 3), 1, "Camera1")
+        update_activity_episodes(session, make_records([0, 1, 1]), datetime(2025, 4, 2, 12, 0, 0), 1, "Camera1")
+        update_activity_episodes(session, make_records([1]), datetime(2025, 4, 2, 12, 0, 3), 1, "Camera2")
+
+        episodes = session.query(ActivityEpisode).filter_by(camera_name="Camera1").all()
+        assert len(episodes) == 1
+        assert episodes[0].start_time == datetime(2025, 4, 2, 12, 0, 1)
+        assert episodes[0].end_time == datetime(2025, 4, 2, 12, 0, 5)
+        assert episodes[0].active_frames == 4
+        assert session.query(ActivityEpisode).count() == 2
+
+    def test_merges_segments_saved_in_parallel(self, file_session):
+        """Test that adjacent segments saved at the same time still merge into one episode"""
+
+        @event.listens_for(file_session.get_bind(), "after_cursor_execute")
+        def slow_neighbour_lookup(conn, cursor, statement, parameters, context, executemany):
+            # Widens the gap between looking for neighbours and storing the episode
+            if statement.startswith("SELECT") and "activity_episodes" in statement:
+                time.sleep(0.05)
+
+        def save(activity, segment_start):
+            try:
+                update_activity_episodes(file_session, make_records(activity), segment_start, 1, "Camera1")
+            finally:
+                file_session.remove()
+
+        workers = [
+            threading.Thread(target=save, args=([0, 1, 1], datetime(2025, 4, 2, 12, 0, 0))),
+            threading.Thread(target=save, args=([1, 1, 0], datetime(2025, 4, 2, 12, 0, 3))),
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        episodes = file_session.query(ActivityEpisode).all()
+        assert len(episodes) == 1
+        assert episodes[0].start_time == datetime(2025, 4, 2, 12, 0, 1)
+        assert episodes[0].end_time == datetime(2025, 4, 2, 12, 0, 5)
+        assert episodes[0].active_frames == 4
+
+    def test_backfill_matches_live_episodes(self, session):
+        """Test that episodes indexed from stored tracking rows match the ones saving the segments produced"""
+        segments = [
+            ([0, 1, 1, 0, 0, 0, 0, 0, 1, 1], datetime(2025, 4, 2, 12, 0, 0), "Camera1"),
+            ([1, 0, 1, 0], datetime(2025, 4, 2, 12, 0, 5), "Camera1"),
+            ([0, 1], datetime(2025, 4, 2, 12, 0, 0), "Camera2"),
+        ]
+        for activity, segment_start, camera_name in segments:
+            records = make_records(activity)
+            add_tracking_batch(session, records, segment_start, 2, camera_name)
+            update_activity_episodes(session, records, segment_start, 2, camera_name, merge_gap_seconds=1.0)
+
+        def episode_rows():
+            return sorted(
+                (e.camera_name, e.start_time, e.end_time, e.active_frames, e.centroid_x, e.centroid_frames)
+                for e in session.query(ActivityEpisode)
+            )
+
+        live = episode_rows()
+        assert len(live) == 3
+        session.query(ActivityEpisode).delete()
+        assert backfill_activity_episodes(session.connection(), merge_gap_seconds=1.0) == 3
+        session.commit()
+
+        assert episode_rows() == live
+        assert backfill_activity_episodes(session.connection()) == 0
@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+
+from src.database.models import CoordinateHistogram
+from src.database.heatmaps import (
+    backfill_coordinate_histograms, update_coordinate_histograms, cover_window, decode_grid, query_heatmap,
+    HEATMAP_BINS_X,
+)
+from src.database.save_processed_data import add_tracking_batch
+from src.processor.metadata_buffer import MetadataBuffer
+
+
+def make_records(points):
+    buffer = MetadataBuffer()
+    for point in points:
+        buffer.append(point is not None, *(point or (None, None)))
+    return buffer.take()
+
+
+class TestCoordinateHistograms:
+    def test_accumulates_per_level(self, session):
+        """Test that segments add into minute, hour and day grids"""
+        # 1 fps: two points in 12:00, one in 12:01, one missing
+        records = make_records([(5, 5), (5, 5), None] + [None] * 57 + [(635, 475)])
+        update_coordinate_histograms(session, records, datetime(2025, 4, 2, 12, 0, 0), 1, "Camera1")
+        update_coordinate_histograms(session, make_records([(5, 5)]), datetime(2025, 4, 2, 12, 0, 30), 1, "Camera1")
+
+        levels = {(row.level, row.bucket_start): row.samples for row in session.query(CoordinateHistogram)}
+        assert levels[("minute", datetime(2025, 4, 2, 12, 0))] == 3
+        assert levels[("minute", datetime(2025, 4, 2, 12, 1))] == 1
+        assert levels[("hour", datetime(2025, 4, 2, 12))] == 4
+        assert levels[("day", datetime(2025, 4, 2))] == 4
+
+    def test_concurrent_segments_keep_all_counts(self, file_session):
+        """Test that workers adding to the same buckets at the same time lose no samples"""
+        segment_start = datetime(2025, 4, 2, 12, 0, 0)
+        records = make_records([(5, 5)] * 30)
+        update_coordinate_histograms(file_session, records, segment_start, 1, "Camera1")
+
+        def slow_decode(blob):
+            # Widens the gap between reading a bucket and writing it back
+            time.sleep(0.05)
+            return decode_grid(blob)
+
+        def save():
+            try:
+                update_coordinate_histograms(file_session, records, segment_start, 1, "Camera1")
+            finally:
+                file_session.remove()
+
+        with patch('src.database.heatmaps.decode_grid', side_effect=slow_decode):
+            workers = [threading.Thread(target=save) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        levels = {(row.level, row.bucket_start): row.samples for row in file_session.query(CoordinateHistogram)}
+        assert levels[("minute", datetime(2025, 4, 2, 12, 0))] == 90
+        assert levels[("day", datetime(2025, 4, 2))] == 90
+
+    def test_backfill_matches_live_histograms(self, session):
+        """Test that accumulators built from stored tracking rows match the ones saving the segments produced"""
+        segments = [
+            ([(5, 5), None, (639.9, 479.9), (-3, 700), (320, 240)] * 30, datetime(2025, 4, 2, 12, 59, 30), "Camera1"),
+            ([(100, 100), (101, 99)], datetime(2025, 4, 3, 0, 0, 0), "Camera2"),
+        ]
+        for points, segment_start, camera_name in segments:
+            records = make_records(points)
+            add_tracking_batch(session, records, segment_start, 2, camera_name)
+            update_coordinate_histograms(session, records, segment_start, 2, camera_name)
+
+        def histogram_rows():
+            return sorted(
+                (row.camera_name, row.level, row.bucket_start, row.samples, decode_grid(row.counts).tobytes())
+                for row in session.query(CoordinateHistogram)
+            )
+
+        live = histogram_rows()
+        session.query(CoordinateHistogram).delete()
+        assert backfill_coordinate_histograms(session.connection()) == len(live)
+        session.commit()
+
+        assert histogram_rows() == live
+        assert backfill_coordinate_histograms(session.connection()) == 0
+
+    def test_cover_window_uses_coarse_buckets(self):
+        """Test that a long window is covered by a handful of buckets"""
+        pieces = cover_window(datetime(2025, 4, 1, 23, 58), datetime(2025, 4, 3, 1, 2))
+        assert pieces == [
+            ("minute", datetime(2025, 4, 1, 23, 58)),
+            ("minute", datetime(2025, 4, 1, 23, 59)),
+            ("day", datetime(2025, 4, 2)),
+            ("hour", datetime(2025, 4, 3, 0)),
+            ("minute", datetime(2025, 4, 3, 1, 0)),
+            ("minute", datetime(2025, 4, 3, 1, 1)),
+        ]
+
+    def test_query_sums_window(self, session):
+        """Test that a window returns the summed grid per camera"""
+        records = make_records([(5, 5)] * 120)
+        update_coordinate_histograms(session, records, datetime(2025, 4, 2, 12, 0, 0), 1, "Camera1")
+
+        heatmap = query_heatmap(session, datetime(2025, 4, 2, 12, 0, 30), datetime(2025, 4, 2, 12, 0, 45), ["Camera1", "Camera2"])
+
+        assert heatmap["start_time"] == "2025-04-02T12:00:00"
+        assert heatmap["end_time"] == "2025-04-02T12:01:00"
+        grid = np.array(heatmap["cameras"]["Camera1"]["grid"])
+        assert grid.shape[1] == HEATMAP_BINS_X
+        assert grid[0, 0] == 60
+        assert heatmap["cameras"]["Camera2"]["samples"] == 0
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from src.database.highlights import get_highlight_video, highlight_plan, merge_intervals
+from src.database.models import ActivityEpisode, ProcessedVideo
+from src.database.stitch_cache import StitchCache
+
+DAY_START = datetime(2025, 4, 2)
+DAY_END = DAY_START + timedelta(days=1)
+
+
+def at(clock):
+    return datetime.fromisoformat(f"2025-04-02T{clock}")
+
+
+def add_episode(session, start, end):
+    session.add(ActivityEpisode(camera_name="Camera1", start_time=start, end_time=end,
+                                duration=(end - start).total_seconds(), active_frames=1))
+
+
+def add_video(session, start, duration):
+    session.add(ProcessedVideo(
+        processed_filename=f"Camera1_{start}.mp4", camera_name="Camera1", duration=duration, keyframes="[]",
+        filepath=f"/videos/Camera1_{start}.mp4", time_stamp=str(start), start_time=start,
+        end_time=start + timedelta(seconds=duration),
+    ))
+
+
+class TestMergeIntervals:
+    def test_pads_clips_and_merges_close_intervals(self):
+        intervals = [
+            (at("12:00:20"), at("12:00:30")),
+            (at("00:00:01"), at("00:00:05")),
+            (at("12:00:40"), at("12:00:45")),
+            (at("13:00:00"), at("13:00:01")),
+        ]
+        assert merge_intervals(intervals, DAY_START, DAY_END, padding=2, merge_gap=10) == [
+            (DAY_START, at("00:00:07")),
+            (at("12:00:18"), at("12:00:47")),
+            (at("12:59:58"), at("13:00:03")),
+        ]
+
+
+class TestHighlightPlan:
+    def test_sections_span_videos_and_skip_missing_footage(self, session):
+        add_video(session, at("12:00:00"), 600)
+        add_video(session, at("12:10:00"), 600)
+        add_episode(session, at("12:09:50"), at("12:10:20"))
+        add_episode(session, at("12:15:00"), at("12:15:05"))
+        # No footage for this one
+        add_episode(session, at("18:00:00"), at("18:01:00"))
+        session.commit()
+
+        sections = highlight_plan(session, "Camera1", DAY_START, DAY_END, padding=0, merge_gap=0)
+
+        assert [(section["start"], section["end"], section["reel_offset"]) for section in sections] == [
+            (at("12:09:50"), at("12:10:20"), 0.0),
+            (at("12:15:00"), at("12:15:05"), 30.0),
+        ]
+        assert [(clip[1], clip[2]) for clip in sections[0]["clips"]] == [(590.0, 600.0), (0.0, 20.0)]
+        assert [(clip[1], clip[2]) for clip in sections[1]["clips"]] == [(300.0, 305.0)]
+
+    def test_reels_are_cached_per_parameter_set(self, session, tmp_path):
+        add_video(session, at("12:00:00"), 600)
+        add_episode(session, at("12:01:00"), at("12:02:00"))
+        session.commit()
+        cache = StitchCache(str(tmp_path))
+
+        def stitch(clips, output_path, on_progress=None):
+            with open(output_path, "wb") as f:
+                f.write(b"reel")
+            return output_path
+
+        with patch('src.database.highlights.stitch_clips', side_effect=stitch) as stitch_clips:
+            first = get_highlight_video(session, cache, "Camera1", DAY_START, DAY_END, padding=2)
+            again = get_highlight_video(session, cache, "Camera1", DAY_START, DAY_END, padding=2)
+            wider = get_highlight_video(session, cache, "Camera1", DAY_START, DAY_END, padding=5)
+
+        assert first == again != wider
+        assert stitch_clips.call_count == 2
+        assert [(clip[1], clip[2]) for clip in stitch_clips.call_args_list[1].args[0]] == [(55.0, 125.0)]
@@ -0,0 +1,65 @@
+import json
+import struct
+from types import SimpleNamespace
+
+from src.database.hls import build_playlist, index_fragments
+
+
+def box(box_type, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type, payload, version=0, flags=0):
+    return box(box_type, struct.pack(">I", (version << 24) | flags) + payload)
+
+
+def fragmented_mp4(fragment_samples, timescale=1000):
+    """ftyp + moov + one moof/mdat pair per list of sample durations."""
+    mdhd = full_box(b"mdhd", struct.pack(">IIII", 0, 0, timescale, 0) + b"\0" * 4)
+    trex = full_box(b"trex", struct.pack(">IIIII", 1, 1, 0, 0, 0))
+    data = box(b"ftyp", b"isom") + box(b"moov", box(b"trak", box(b"mdia", mdhd)) + box(b"mvex", trex))
+    decode_time = 0
+    for durations in fragment_samples:
+        tfhd = full_box(b"tfhd", struct.pack(">I", 1))
+        tfdt = full_box(b"tfdt", struct.pack(">Q", decode_time), version=1)
+        trun = full_box(b"trun", struct.pack(">I", len(durations)) + b"".join(struct.pack(">I", d) for d in durations),
+                        flags=0x100)
+        data += box(b"moof", box(b"traf", tfhd + tfdt + trun)) + box(b"mdat", b"\0" * 10)
+        decode_time += sum(durations)
+    return data
+
+
+class TestHls:
+    def test_index_fragments(self, tmp_path):
+        path = tmp_path / "segment.mp4"
+        path.write_bytes(fragmented_mp4([[1000, 1000], [1000, 500]]))
+
+        index = index_fragments(str(path))
+
+        init_offset, init_length = index["init"]
+        first, second = index["fragments"]
+        assert init_offset == 0 and first[0] == init_length
+        assert first[0] + first[1] == second[0]
+        assert second[0] + second[1] == path.stat().st_size
+        assert (first[2], first[3]) == (0.0, 2.0)
+        assert (second[2], second[3]) == (2.0, 1.5)
+
+    def test_plain_mp4_has_no_index(self, tmp_path):
+        path = tmp_path / "plain.mp4"
+        path.write_bytes(box(b"ftyp", b"isom") + box(b"moov") + box(b"mdat", b"\0" * 10))
+        assert index_fragments(str(path)) is None
+
+    def test_playlist_lists_covering_fragments(self):
+        index = {"init": [0, 100], "fragments": [[100, 50, 0.0, 2.0], [150, 50, 2.0, 2.0], [200, 50, 4.0, 2.0]]}
+        first = SimpleNamespace(id=1, fragments=json.dumps(index))
+        second = SimpleNamespace(id=2, fragments=json.dumps(index))
+
+        playlist = build_playlist([(first, 2.5, 6.0), (second, 0.0, 1.0)], lambda video: f"video/{video.id}")
+
+        lines = playlist.splitlines()
+        assert "#EXT-X-START:TIME-OFFSET=0.500000,PRECISE=YES" in lines
+        assert lines.count("#EXT-X-DISCONTINUITY") == 1
+        assert [line for line in lines if line.startswith("#EXT-X-BYTERANGE")] == [
+            "#EXT-X-BYTERANGE:50@150", "#EXT-X-BYTERANGE:50@200", "#EXT-X-BYTERANGE:50@100",
+        ]
+        assert lines[-1] == "#EXT-X-ENDLIST"
@@ -0,0 +1,41 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from src.database import endpoint_helpers
+from src.database.keyframes import gop_size, parse_keyframe_packets, plan_clip
+
+
+class TestKeyframes:
+    def test_parse_keyframe_packets(self):
+        output = "0.000000,K__\n0.066667,___\n2.000000,K_\nN/A,K__\n"
+        assert parse_keyframe_packets(output) == [0.0, 2.0]
+
+    def test_gop_size(self):
+        assert gop_size(15) == 30
+        assert gop_size(0.1) == 1
+
+    def test_plan_reencodes_only_partial_gop(self):
+        keyframes = [0.0, 2.0, 4.0, 6.0]
+        assert plan_clip(keyframes, 2.5, 7.0) == [("encode", 2.5, 4.0), ("copy", 4.0, 7.0)]
+        assert plan_clip(keyframes, 4.0, 7.0) == [("copy", 4.0, 7.0)]
+        assert plan_clip(keyframes, 4.5, 5.5) == [("encode", 4.5, 5.5)]
+        assert plan_clip(keyframes, 6.5, 8.0) == [("encode", 6.5, 8.0)]
+        assert plan_clip(keyframes, 3.0, 3.0) == []
+
+
+class TestStitchVideos:
+    def test_cuts_parts_by_keyframes(self, tmp_path):
+        first = MagicMock(filepath="a.mp4", duration=10.0, keyframes="[0.0, 2.0, 4.0, 6.0, 8.0]",
+                          start_time=datetime(2025, 4, 2, 12, 0, 0))
+        second = MagicMock(filepath="b.mp4", duration=10.0, keyframes="[0.0, 2.0, 4.0, 6.0, 8.0]",
+                           start_time=datetime(2025, 4, 2, 12, 0, 10))
+
+        with patch('src.database.endpoint_helpers.subprocess.run') as mock_run:
+            endpoint_helpers.stitch_videos([first, second], "2025-04-02T12:00:05", "2025-04-02T12:00:13",
+                                           str(tmp_path / "out.mp4"))
+
+        commands = [call.args[0] for call in mock_run.call_args_list]
+        cuts = [(command[command.index("-i") + 1], command[command.index("-ss") + 1], "libx264" in command)
+                for command in commands if "-ss" in command]
+        assert cuts == [("a.mp4", "5.000000", True), ("a.mp4", "6.000000", False), ("b.mp4", "0.000000", False)]
+        assert "concat" in commands[-1]
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from src.database.prefetch import Prefetcher, adjacent_windows
+from src.database.stitch_cache import StitchCache
+from src.database.stitch_jobs import get_stitched_video
+
+
+def at(clock):
+    return datetime.fromisoformat(f"2025-04-02T{clock}")
+
+
+class TestAdjacentWindows:
+    def test_forward_by_default(self):
+        assert adjacent_windows(at("12:00:00"), at("12:10:00")) == [
+            (at("12:10:00"), at("12:20:00")), (at("11:50:00"), at("12:00:00")),
+        ]
+
+    def test_backwards_review_prefers_previous(self):
+        history = [(at("12:10:00"), at("12:20:00"))]
+        assert adjacent_windows(at("12:00:00"), at("12:10:00"), history)[0] == (at("11:50:00"), at("12:00:00"))
+
+
+class TestPrefetcher:
+    def test_moving_on_cancels_stale_work(self):
+        started, release = threading.Event(), threading.Event()
+        built = []
+
+        def stitch(session, cache, camera_name, start_time, end_time, on_progress):
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+                on_progress(1, 2)
+            built.append(start_time)
+            return "/tmp/video.mp4"
+
+        prefetcher = Prefetcher(MagicMock(), MagicMock())
+        with patch('src.database.prefetch.get_stitched_video', side_effect=stitch):
+            prefetcher.observe("client", "Camera1", "2025-04-02T12:00:00", "2025-04-02T12:10:00")
+            started.wait(5)
+            # Jump elsewhere while 12:10-12:20 is building and 11:50-12:00 is queued
+            prefetcher.observe("client", "Camera1", "2025-04-02T15:00:00", "2025-04-02T15:10:00")
+            release.set()
+            prefetcher._executor.shutdown(wait=True)
+
+        assert built == ["2025-04-02T15:10:00", "2025-04-02T14:50:00"]
+        assert prefetcher.stats()["cancelled"] == 2
+        assert prefetcher.stats()["pending"] == 0
+
+    def test_skips_long_windows(self):
+        prefetcher = Prefetcher(MagicMock(), MagicMock())
+        assert prefetcher.observe("client", "Camera1", "2025-04-02T00:00:00", "2025-04-03T00:00:00") == []
+        prefetcher.shutdown()
+
+    def test_stepping_into_the_window_being_prefetched(self, tmp_path):
+        cache = StitchCache(str(tmp_path))
+        started, release = threading.Event(), threading.Event()
+        builds = []
+
+        def stitch(videos, start_time, end_time, output_path, on_progress=None):
+            builds.append(start_time)
+            if start_time == "2025-04-02T12:10:00" and len(builds) == 1:
+                started.set()
+                release.wait(5)
+            on_progress and on_progress(1, 2)
+            with open(output_path, "wb") as f:
+                f.write(b"video")
+            return output_path
+
+        prefetcher = Prefetcher(MagicMock(), cache)
+        result = {}
+        with patch('src.database.stitch_jobs.range_version', return_value=(1, None)), \
+                patch('src.database.stitch_jobs.find_relevant_videos', return_value={"selected": []}), \
+                patch('src.database.stitch_jobs.ensure_keyframes'), \
+                patch('src.database.stitch_jobs.stitch_videos', side_effect=stitch):
+            prefetcher.observe("client", "Camera1", "2025-04-02T12:00:00", "2025-04-02T12:10:00")
+            started.wait(5)
+
+            # The reviewer steps forward into 12:10-12:20 while it is being prefetched
+            prefetcher.observe("client", "Camera1", "2025-04-02T12:10:00", "2025-04-02T12:20:00")
+            assert prefetcher.stats()["cancelled"] == 1
+
+            def foreground():
+                try:
+                    result["path"] = get_stitched_video(MagicMock(), cache, "Camera1",
+                                                        "2025-04-02T12:10:00", "2025-04-02T12:20:00")
+                except Exception as e:
+                    result["error"] = e
+
+            request = threading.Thread(target=foreground)
+            request.start()
+            while cache.stats()["shared"] == 0:
+                time.sleep(0.01)
+
+            # Moving on cancels the running build; the waiting request builds the window itself
+            prefetcher.observe("client", "Camera1", "2025-04-02T15:00:00", "2025-04-02T15:10:00")
+            release.set()
+            request.join(5)
+            prefetcher._executor.shutdown(wait=True)
+
+        assert "error" not in result
+        assert os.path.exists(result["path"])
+        assert builds.count("2025-04-02T12:10:00") == 2
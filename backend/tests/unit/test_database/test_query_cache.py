@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from flask import Response
+
+from src.database.query_cache import QueryCache
+from src.database.save_processed_data import record_ingest_event
+
+
+def at(clock):
+    return datetime.fromisoformat(f"2025-04-02T{clock}")
+
+
+def cached_body(cache, key):
+    response = cache.get(key)
+    return None if response is None else response.get_data()
+
+
+class TestQueryCache:
+    def test_overlapping_ingest_invalidates_only_affected_entries(self, Session):
+        session = Session()
+        cache = QueryCache()
+        seen = cache.sync(session)
+        cache.put("morning", Response(b"a"), seen, at("09:00:00"), at("10:00:00"))
+        cache.put("noon", Response(b"b"), seen, at("12:00:00"), at("13:00:00"), ["Camera1"])
+        cache.put("noon-cam2", Response(b"c"), seen, at("12:00:00"), at("13:00:00"), ["Camera2"])
+
+        record_ingest_event(session, "segment", "Camera1", at("12:30:00"), at("12:31:00"))
+        cache.sync(session)
+
+        assert cached_body(cache, "morning") == b"a"
+        assert cached_body(cache, "noon") is None
+        assert cached_body(cache, "noon-cam2") == b"c"
+
+    def test_result_computed_before_an_overlapping_ingest_is_not_stored(self, Session):
+        """Test that a result read before a concurrent save committed is never served"""
+        session = Session()
+        cache = QueryCache()
+        seen = cache.sync(session)
+
+        record_ingest_event(session, "segment", None, at("12:00:00"), at("12:01:00"))
+        cache.sync(session)
+
+        assert not cache.put("stale", Response(b"old"), seen, at("11:00:00"), at("13:00:00"))
+        assert cache.put("other", Response(b"ok"), seen, at("14:00:00"), at("15:00:00"))
+        assert cached_body(cache, "stale") is None
+
+    def test_evicts_least_recently_used_within_byte_budget(self, Session):
+        cache = QueryCache(max_bytes=10, max_entry_bytes=10)
+        seen = cache.sync(Session())
+        cache.put("a", Response(b"1234"), seen, at("09:00:00"), at("10:00:00"))
+        cache.put("b", Response(b"1234"), seen, at("09:00:00"), at("10:00:00"))
+        cache.get("a")
+        cache.put("c", Response(b"1234"), seen, at("09:00:00"), at("10:00:00"))
+
+        assert cached_body(cache, "a") == b"1234"
+        assert cached_body(cache, "b") is None
+        assert cache.stats()["bytes"] == 8
+        assert not cache.put("big", Response(b"x" * 11), seen, at("09:00:00"), at("10:00:00"))
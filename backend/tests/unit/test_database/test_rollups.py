@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from src.database.models import ActivityRollup, LemurTracking
+from src.database.rollups import (
+    backfill_activity_rollups, update_activity_rollups, select_rollup_level, query_activity_rollup,
+)
+from src.database.save_processed_data import add_tracking_batch
+from src.processor.metadata_buffer import MetadataBuffer
+
+
+class TestActivityRollups:
+    @staticmethod
+    def make_records(activity):
+        buffer = MetadataBuffer()
+        for is_active in activity:
+            buffer.append(is_active, None, None)
+        return buffer.take()
+
+    def test_counts_every_level(self, session):
+        """Test that one segment updates second, minute, hour and day buckets"""
+        # 2 seconds at 2 fps, active only in the second one
+        records = self.make_records([False, False, True, True])
+        update_activity_rollups(session, records, datetime(2025, 4, 2, 12, 0, 59), 2, "Camera1")
+
+        seconds = session.query(ActivityRollup).filter_by(level="second").order_by(ActivityRollup.bucket_start).all()
+        assert [(r.active_frames, r.total_frames) for r in seconds] == [(0, 2), (2, 2)]
+        minutes = session.query(ActivityRollup).filter_by(level="minute").all()
+        assert len(minutes) == 2
+        day = session.query(ActivityRollup).filter_by(level="day").one()
+        assert (day.active_frames, day.total_frames) == (2, 4)
+
+    def test_repeated_segments_accumulate(self, session):
+        """Test that overlapping buckets from a later segment are added, not replaced"""
+        start = datetime(2025, 4, 2, 12, 0, 0)
+        update_activity_rollups(session, self.make_records([True]), start, 15, "Camera1")
+        update_activity_rollups(session, self.make_records([False]), start, 15, "Camera1")
+
+        hour = session.query(ActivityRollup).filter_by(level="hour").one()
+        assert (hour.active_frames, hour.total_frames) == (1, 2)
+
+    @pytest.mark.parametrize("days, points, expected", [
+        (30, 20, "day"),
+        (30, 300, "hour"),
+        (1, 300, "minute"),
+        (0.001, 300, "second"),
+    ])
+    def test_select_rollup_level(self, days, points, expected):
+        """Test that the coarsest level with enough buckets is chosen"""
+        start = datetime(2025, 4, 1)
+        end = datetime.fromtimestamp(start.timestamp() + days * 86400)
+        assert select_rollup_level(start, end, points)[0] == expected
+
+    def test_query_merges_cameras_per_bucket(self, session):
+        """Test that the query sums cameras into aligned buckets"""
+        start = datetime(2025, 4, 2, 12, 0, 0)
+        update_activity_rollups(session, self.make_records([True, False]), start, 1, "Camera1")
+        update_activity_rollups(session, self.make_records([False, True]), start, 1, "Camera2")
+
+        rollup = query_activity_rollup(session, start, datetime(2025, 4, 2, 12, 0, 2), 3)
+        assert rollup["level"] == "second"
+        assert rollup["active_frames"] == [1, 1, 0]
+        assert rollup["total_frames"] == [2, 2, 0]
+
+        only_camera2 = query_activity_rollup(session, start, datetime(2025, 4, 2, 12, 0, 2), 3, ["Camera2"])
+        assert only_camera2["active_frames"] == [0, 1, 0]
+
+    def test_query_without_cameras_uses_index(self, session):
+        """Test that an all-camera query seeks on level and bucket instead of scanning the table"""
+        plan = session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT bucket_start, active_frames, total_frames FROM activity_rollups "
+            "WHERE level = 'minute' AND bucket_start >= '2025-04-02 00:00:00' AND bucket_start <= '2025-04-03 00:00:00'"
+        )).all()
+        details = " ".join(row[-1] for row in plan)
+        assert "ix_activity_rollups_level_bucket" in details
+        assert "SCAN activity_rollups" not in details
+
+    def test_backfill_matches_live_rollups(self, session):
+        """Test that rolling up stored tracking rows gives the same buckets as saving the segments did"""
+        segments = [
+            (self.make_records([True, False, True, True, False] * 3), datetime(2025, 4, 2, 12, 59, 58), "Camera1"),
+            (self.make_records([False, True]), datetime(2025, 4, 3, 0, 0, 0), "Camera2"),
+        ]
+        for records, segment_start, camera_name in segments:
+            add_tracking_batch(session, records, segment_start, 4, camera_name)
+            update_activity_rollups(session, records, segment_start, 4, camera_name)
+        # Rows in the old "<date> <time>" layout are not rolled up
+        session.add(LemurTracking(time_stamp="2025-04-02 12:00:00.000000", is_active=True, camera_name="Camera1"))
+        session.commit()
+
+        def rollup_rows():
+            return sorted(
+                (row.camera_name, row.level, row.bucket_start, row.active_frames, row.total_frames)
+                for row in session.query(ActivityRollup)
+            )
+
+        live = rollup_rows()
+        assert backfill_activity_rollups(session.connection()) == 0
+
+        session.query(ActivityRollup).delete()
+        assert backfill_activity_rollups(session.connection()) == len(live)
+        session.commit()
+        assert rollup_rows() == live
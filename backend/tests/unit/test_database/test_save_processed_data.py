@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+
+from src.database.models import LemurTracking
+from src.database.save_processed_data import add_tracking_batch
+from src.processor.metadata_buffer import MetadataBuffer
+
+
+class TestAddTrackingBatch:
+    def test_bulk_insert_from_buffer(self, session):
+        """Test that a metadata buffer is inserted with derived timestamps"""
+        buffer = MetadataBuffer()
+        buffer.append(True, 10.5, 20.5)
+        buffer.append(False, None, None)
+
+        inserted = add_tracking_batch(session, buffer.take(), datetime(2025, 4, 2, 12, 0, 0), 15, "Camera1")
+
+        rows = session.query(LemurTracking).order_by(LemurTracking.id).all()
+        assert inserted == 2
+        assert rows[0].time_stamp == "2025-04-02 2025-04-02T12:00:00.000000"
+        assert rows[0].is_active is True
+        assert rows[0].coordinate_x == pytest.approx(10.5)
+        assert rows[1].time_stamp == "2025-04-02 2025-04-02T12:00:00.066667"
+        assert rows[1].coordinate_x is None
+        assert rows[1].camera_name == "Camera1"
+
+    def test_empty_buffer_inserts_nothing(self, session):
+        """Test that an empty segment does not touch the database"""
+        assert add_tracking_batch(session, MetadataBuffer().take(), datetime(2025, 4, 2), 15, "Camera1") == 0
+        assert session.query(LemurTracking).count() == 0
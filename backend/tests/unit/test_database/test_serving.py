@@ -0,0 +1,140 @@
+import threading
+
+from flask import Flask, Response, send_file
+from werkzeug.test import Client, EnvironBuilder
+
+from src.database.serving import ConcurrencyLimiter, classify
+
+
+class ServerFileWrapper:
+    """Stands in for waitress's wsgi.file_wrapper, which the server sends natively."""
+
+    def __init__(self, file, block_size=8192):
+        self.file = file
+        self.block_size = block_size
+        self.seekable = file.seekable
+        self.seek = file.seek
+        self.tell = file.tell
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        data = self.file.read(self.block_size)
+        if not data:
+            raise StopIteration
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def make_app(release, video_path=None):
+    app = Flask(__name__)
+
+    @app.route('/hls/video/1')
+    def hls_video():
+        return send_file(video_path, mimetype='video/mp4', conditional=True)
+
+    @app.route('/stitched-video')
+    def stitched_video():
+        def body():
+            yield b"vid"
+            release.wait(5)
+            yield b"eo"
+        return Response(body(), mimetype='video/mp4')
+
+    @app.route('/get-queue-status')
+    def queue_status():
+        return {"status": "not processing"}
+
+    @app.route('/activity-data')
+    def activity_data():
+        def body():
+            yield b"["
+            release.wait(5)
+            yield b"]"
+        return Response(body(), mimetype='application/json')
+
+    return app
+
+
+class TestConcurrencyLimiter:
+    def test_classify(self):
+        assert classify({"PATH_INFO": "/stitched-video"}) == "heavy"
+        assert classify({"PATH_INFO": "/stitch-jobs/abc/video/Camera1"}) == "heavy"
+        assert classify({"PATH_INFO": "/stitch-jobs/abc"}) == "light"
+        assert classify({"PATH_INFO": "/hls/playlist.m3u8"}) == "light"
+        assert classify({"PATH_INFO": "/hls/video/3"}) == "light"
+        assert classify({"PATH_INFO": "/highlight-video"}) == "heavy"
+        assert classify({"PATH_INFO": "/activity-data"}) == "light"
+        assert classify({"PATH_INFO": "/progress/events"}) == "stream"
+
+    def test_heavy_limit_leaves_light_requests_alone(self):
+        release = threading.Event()
+        limiter = ConcurrencyLimiter(make_app(release), heavy_limit=1, light_limit=2)
+        client = Client(limiter)
+        get = lambda path: client.get(path, buffered=True)
+
+        # The slot is held while the body streams, not only while the view runs
+        streaming = client.get('/stitched-video', buffered=False)
+        rejected = get('/stitched-video')
+        status = get('/get-queue-status')
+        assert limiter.stats()["heavy"]["active"] == 1
+
+        assert rejected.status_code == 503
+        assert rejected.headers["Retry-After"] == "2"
+        assert status.status_code == 200
+
+        release.set()
+        assert streaming.get_data() == b"video"
+        streaming.close()
+        assert limiter.stats() == {
+            "heavy": {"active": 0, "limit": 1}, "light": {"active": 0, "limit": 2}, "stream": {"active": 0, "limit": 4},
+            "rejected": 1,
+        }
+        assert get('/stitched-video').status_code == 200
+
+    def test_light_requests_over_the_limit_are_turned_away(self):
+        """Test that light requests do not queue on server threads once their slots are taken"""
+        release = threading.Event()
+        limiter = ConcurrencyLimiter(make_app(release), heavy_limit=1, light_limit=1)
+        client = Client(limiter)
+
+        slow = client.get('/activity-data', buffered=False)
+        rejected = client.get('/get-queue-status', buffered=True)
+        assert rejected.status_code == 503
+        assert limiter.stats()["rejected"] == 1
+
+        release.set()
+        assert slow.get_data() == b"[]"
+        slow.close()
+        assert client.get('/get-queue-status', buffered=True).status_code == 200
+
+    def test_file_responses_reach_the_server_file_wrapper(self, tmp_path):
+        """Test that send_file responses pass through unwrapped and hold their slot until the file closes"""
+        video = tmp_path / "segment.mp4"
+        video.write_bytes(b"0123456789")
+        limiter = ConcurrencyLimiter(make_app(threading.Event(), str(video)), light_limit=1)
+
+        def call(headers=None):
+            environ = EnvironBuilder(path='/hls/video/1', headers=headers).get_environ()
+            environ["wsgi.file_wrapper"] = ServerFileWrapper
+            status = []
+            body = limiter(environ, lambda code, response_headers, exc_info=None: status.append(code))
+            return status[0], body
+
+        status, body = call()
+        assert status.startswith("200")
+        assert isinstance(body, ServerFileWrapper)
+        assert limiter.stats()["light"]["active"] == 1
+        body.close()
+        assert limiter.stats()["light"]["active"] == 0
+
+        # Byte ranges are sent from the seeked file; the server stops at Content-Length
+        status, body = call({"Range": "bytes=4-6"})
+        assert status.startswith("206")
+        assert isinstance(body, ServerFileWrapper)
+        assert body.tell() == 4
+        body.close()
+        assert limiter.stats()["light"]["active"] == 0
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.database.stitch_cache import StitchCache, stitch_filename
+
+
+def writer(content, calls=None, started=None, release=None):
+    def build(path):
+        if calls is not None:
+            calls.append(path)
+        if started is not None:
+            started.set()
+            release.wait(5)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+    return build
+
+
+class TestStitchCache:
+    def test_hit_after_miss(self, tmp_path):
+        cache = StitchCache(str(tmp_path))
+        calls = []
+
+        first = cache.get_or_build("a.mp4", writer(b"video", calls))
+        second = cache.get_or_build("a.mp4", writer(b"other", calls))
+
+        assert first == second
+        assert len(calls) == 1
+        assert open(first, "rb").read() == b"video"
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    def test_file_evicted_during_hit_is_rebuilt(self, tmp_path):
+        cache = StitchCache(str(tmp_path))
+        calls = []
+        path = cache.get_or_build("a.mp4", writer(b"video", calls))
+        utime = os.utime
+
+        def evicted_first(target, *args, **kwargs):
+            # Another request evicts the file between the index lookup and the touch
+            if os.path.exists(target):
+                os.remove(target)
+            return utime(target, *args, **kwargs)
+
+        with patch('src.database.stitch_cache.os.utime', side_effect=evicted_first):
+            cache.get_or_build("a.mp4", writer(b"rebuilt", calls))
+
+        assert len(calls) == 2
+        assert open(path, "rb").read() == b"rebuilt"
+        assert cache.stats()["misses"] == 2
+
+    def test_concurrent_requests_share_one_build(self, tmp_path):
+        cache = StitchCache(str(tmp_path))
+        calls, started, release = [], threading.Event(), threading.Event()
+        results = []
+
+        leader = threading.Thread(target=lambda: results.append(
+            cache.get_or_build("a.mp4", writer(b"video", calls, started, release))))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(cache.get_or_build("a.mp4", writer(b"x", calls))))
+        follower.start()
+        while cache.stats()["shared"] == 0:
+            time.sleep(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        assert len(calls) == 1
+        assert results[0] == results[1]
+
+    def test_evicts_least_recently_used_over_budget(self, tmp_path):
+        cache = StitchCache(str(tmp_path), max_bytes=10)
+        cache.get_or_build("a.mp4", writer(b"12345"))
+        cache.get_or_build("b.mp4", writer(b"12345"))
+        cache.get_or_build("a.mp4", writer(b""))
+        cache.get_or_build("c.mp4", writer(b"12345"))
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["a.mp4", "c.mp4"]
+        assert cache.stats()["evictions"] == 1
+
+    def test_failed_build_leaves_nothing(self, tmp_path):
+        cache = StitchCache(str(tmp_path))
+
+        def fail(path):
+            open(path, "wb").write(b"partial")
+            raise RuntimeError("ffmpeg failed")
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_build("a.mp4", fail)
+        assert list(tmp_path.iterdir()) == []
+        assert cache.get_or_build("b.mp4", lambda path: None) is None
+
+    def test_filename_is_safe(self):
+        assert stitch_filename("Camera1", "2025-04-02T12:00:00", "2025-04-02T13:00:00", "abc") == \
+            "Camera1_stitched_2025-04-02T12-00-00-2025-04-02T13-00-00_abc.mp4"
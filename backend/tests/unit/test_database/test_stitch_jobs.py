@@ -0,0 +1,78 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from src.database.stitch_jobs import StitchJobManager
+
+
+class TestStitchJobManager:
+    def test_cameras_stitched_in_parallel(self):
+        """Test that all cameras of a job run at once (the barrier only opens for three concurrent tasks)"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def stitch(session, cache, camera_name, start_time, end_time, on_progress=None):
+            barrier.wait()
+            on_progress(1, 2)
+            return None if camera_name == "Camera3" else f"/tmp/{camera_name}.mp4"
+
+        manager = StitchJobManager(MagicMock(), MagicMock(), max_workers=3)
+        with patch('src.database.stitch_jobs.get_stitched_video', side_effect=stitch):
+            job = manager.submit("2025-04-02T12:00:00", "2025-04-02T13:00:00", ["Camera1", "Camera2", "Camera3"])
+            status = manager.status(job["id"])
+            while status["state"] != "finished":
+                status = manager.status(job["id"], wait=5, revision=status["revision"])
+        manager.shutdown()
+
+        assert {camera: state["state"] for camera, state in status["cameras"].items()} == {
+            "Camera1": "done", "Camera2": "done", "Camera3": "empty",
+        }
+        assert status["progress"] == 1.0
+        assert manager.result_path(job["id"], "Camera2") == "/tmp/Camera2.mp4"
+
+    def test_failure_and_cancel(self):
+        started, release = threading.Event(), threading.Event()
+
+        def stitch(session, cache, camera_name, start_time, end_time, on_progress=None):
+            started.set()
+            release.wait(5)
+            raise RuntimeError("ffmpeg failed")
+
+        manager = StitchJobManager(MagicMock(), MagicMock(), max_workers=1)
+        with patch('src.database.stitch_jobs.get_stitched_video', side_effect=stitch):
+            job = manager.submit("2025-04-02T12:00:00", "2025-04-02T13:00:00", ["Camera1", "Camera2"])
+            started.wait(5)
+            manager.cancel(job["id"])
+            release.set()
+            status = manager.status(job["id"])
+            while status["state"] != "finished":
+                status = manager.status(job["id"], wait=5, revision=status["revision"])
+        manager.shutdown()
+
+        assert status["cameras"]["Camera1"]["state"] == "failed"
+        assert status["cameras"]["Camera1"]["error"] == "ffmpeg failed"
+        assert status["cameras"]["Camera2"]["state"] == "cancelled"
+
+    def test_cancel_as_soon_as_job_is_visible(self):
+        """Test that a cancel arriving the moment a job is published still cancels its queued cameras"""
+        release = threading.Event()
+
+        def stitch(session, cache, camera_name, start_time, end_time, on_progress=None):
+            release.wait(5)
+            return None
+
+        manager = StitchJobManager(MagicMock(), MagicMock(), max_workers=1)
+
+        class CancelOnPublish(dict):
+            def __setitem__(self, job_id, job):
+                super().__setitem__(job_id, job)
+                manager.cancel(job_id)
+
+        manager._jobs = CancelOnPublish()
+        with patch('src.database.stitch_jobs.get_stitched_video', side_effect=stitch):
+            job = manager.submit("2025-04-02T12:00:00", "2025-04-02T13:00:00", ["Camera1", "Camera2"])
+            release.set()
+            status = manager.status(job["id"])
+            while status["state"] != "finished":
+                status = manager.status(job["id"], wait=5, revision=status["revision"])
+        manager.shutdown()
+
+        assert status["cameras"]["Camera2"]["state"] == "cancelled"
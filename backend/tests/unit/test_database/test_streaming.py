@@ -0,0 +1,44 @@
+import json
+from unittest.mock import patch
+
+from src.database.models import LemurTracking
+from src.database.streaming import NDJSON_MIMETYPE, stream_activity, stream_coordinates
+
+
+def add_frame(session, camera_name, clock, is_active, x=None, y=None):
+    session.add(LemurTracking(
+        time_stamp=f"2025-04-02 2025-04-02T{clock}", is_active=is_active,
+        coordinate_x=x, coordinate_y=y, camera_name=camera_name,
+    ))
+
+
+class TestStreaming:
+    def test_activity_chunks_cover_range(self, Session):
+        """Test that streamed chunks concatenate to one entry per bucket, gaps inactive"""
+        session = Session()
+        add_frame(session, "Camera1", "12:00:01.000000", True)
+        add_frame(session, "Camera2", "12:00:04.500000", True)
+        session.commit()
+
+        with patch('src.database.streaming.STREAM_BATCH_SIZE', 2):
+            lines = list(stream_activity(Session, "2025-04-02T12:00:00", "2025-04-02T12:00:06", 1, NDJSON_MIMETYPE))
+
+        chunks = [json.loads(line) for line in lines]
+        assert [chunk["offset"] for chunk in chunks] == [0, 2, 4]
+        assert sum((chunk["activity"] for chunk in chunks), []) == [False, True, False, False, True, False]
+
+    def test_coordinates_batched_per_camera(self, Session):
+        session = Session()
+        for second in range(3):
+            add_frame(session, "Camera1", f"12:00:0{second}.000000", True, float(second), 1.0)
+        add_frame(session, "Camera3", "12:00:00.000000", False)
+        session.commit()
+
+        with patch('src.database.streaming.STREAM_BATCH_SIZE', 2):
+            lines = list(stream_coordinates(Session, "2025-04-02T12:00:00", "2025-04-02T12:01:00", None, NDJSON_MIMETYPE))
+
+        assert [json.loads(line) for line in lines] == [
+            {"camera": "Camera1", "points": [[0.0, 1.0], [1.0, 1.0]]},
+            {"camera": "Camera1", "points": [[2.0, 1.0]]},
+            {"camera": "Camera3", "points": [[None, None]]},
+        ]
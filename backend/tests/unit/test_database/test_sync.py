@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from src.database.save_processed_data import add_tracking_batch, record_ingest_event
+from src.database.sync import changes_since, current_cursor
+from src.processor.metadata_buffer import MetadataBuffer
+
+
+def save_segment(Session, camera_name, segment_start, frames=2, fps=1):
+    buffer = MetadataBuffer()
+    for frame in range(frames):
+        buffer.append(frame % 2 == 0, float(frame), 1.0)
+    add_tracking_batch(Session, buffer.take(), segment_start, fps, camera_name)
+    Session.commit()
+    return record_ingest_event(Session, "segment", camera_name, segment_start,
+                               segment_start + timedelta(seconds=frames / fps), stamp_rows=True)
+
+
+class TestSync:
+    def test_returns_only_segments_after_cursor(self, Session):
+        session = Session()
+        save_segment(Session, "Camera1", datetime(2025, 4, 2, 12, 0, 0))
+        cursor = current_cursor(session)
+        second = save_segment(Session, "Camera2", datetime(2025, 4, 2, 12, 0, 0), frames=3)
+
+        changes = changes_since(session, cursor)
+
+        assert changes["cursor"] == second
+        assert not changes["has_more"]
+        [segment] = changes["segments"]
+        assert segment["camera_name"] == "Camera2"
+        assert segment["tracking"]["time_stamps"][0] == "2025-04-02T12:00:00.000000"
+        assert segment["tracking"]["activity"] == [True, False, True]
+        assert changes_since(session, second)["segments"] == []
+
+    def test_pages_and_filtered_events_advance_cursor(self, Session):
+        session = Session()
+        first = save_segment(Session, "Camera1", datetime(2025, 4, 2, 12, 0, 0))
+        save_segment(Session, "Camera1", datetime(2025, 4, 2, 12, 0, 2))
+        last = save_segment(Session, "Camera2", datetime(2025, 4, 2, 12, 0, 0))
+        compaction = record_ingest_event(session, "compaction", None, datetime(2025, 4, 1), datetime(2025, 4, 2))
+
+        page = changes_since(session, 0, camera_name="Camera1", limit=1)
+        assert page["has_more"] and page["cursor"] == first
+
+        rest = changes_since(session, page["cursor"], camera_name="Camera1")
+        assert [segment["seq"] for segment in rest["segments"]] == [first + 1]
+        assert [event["seq"] for event in rest["invalidated"]] == [compaction]
+        assert rest["cursor"] == compaction > last
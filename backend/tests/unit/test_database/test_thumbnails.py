@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from src.database.models import ThumbnailSprite
+from src.database.thumbnails import (
+    SPRITE_COLUMNS, THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, build_sprite_sheets, build_thumbnail_vtt, find_sprites,
+    save_thumbnail_sprites,
+)
+
+SEGMENT_START = datetime(2025, 4, 2, 12, 0, 0)
+
+
+def make_frames(count):
+    # Each frame is a flat grey whose level encodes its index
+    return [np.full((480, 640, 3), index % 256, dtype=np.uint8) for index in range(count)]
+
+
+class TestSpriteSheets:
+    def test_samples_every_interval_into_a_grid(self):
+        # 60 s at 2 fps -> a tile every 10 frames -> 12 tiles, two rows
+        (first, count, image), = build_sprite_sheets(make_frames(120), fps=2)
+
+        sheet = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+        assert (first, count) == (0, 12)
+        assert sheet.shape == (2 * THUMBNAIL_HEIGHT, SPRITE_COLUMNS * THUMBNAIL_WIDTH, 3)
+        # Tile 11 (row 1, column 1) shows frame 110
+        assert abs(int(sheet[THUMBNAIL_HEIGHT + 60, THUMBNAIL_WIDTH + 80, 0]) - 110) <= 2
+
+    def test_save_splits_long_segments(self, session):
+        # 101 tiles at 1 fps with a 5 s interval
+        save_thumbnail_sprites(session, make_frames(505), SEGMENT_START, 1, "Camera1")
+
+        sprites = session.query(ThumbnailSprite).order_by(ThumbnailSprite.start_time).all()
+        assert [sprite.tile_count for sprite in sprites] == [100, 1]
+        assert sprites[1].start_time == SEGMENT_START + timedelta(seconds=500)
+        assert sprites[1].end_time == SEGMENT_START + timedelta(seconds=505)
+
+
+class TestThumbnailVtt:
+    def test_cues_are_relative_to_the_range(self, session):
+        save_thumbnail_sprites(session, make_frames(30), SEGMENT_START, 1, "Camera1")
+        dt_start = SEGMENT_START + timedelta(seconds=7)
+        dt_end = SEGMENT_START + timedelta(seconds=17)
+
+        sprites = find_sprites(session, "Camera1", dt_start, dt_end)
+        vtt = build_thumbnail_vtt(sprites, dt_start, dt_end, lambda sprite: f"sprites/{sprite.id}.jpg")
+
+        assert vtt.splitlines() == [
+            "WEBVTT", "",
+            "00:00:00.000 --> 00:00:03.000", f"sprites/{sprites[0].id}.jpg#xywh=160,0,160,120", "",
+            "00:00:03.000 --> 00:00:08.000", f"sprites/{sprites[0].id}.jpg#xywh=320,0,160,120", "",
+            "00:00:08.000 --> 00:00:10.000", f"sprites/{sprites[0].id}.jpg#xywh=480,0,160,120",
+        ]
+
+    def test_no_thumbnails(self, session):
+        assert find_sprites(session, "Camera1", SEGMENT_START, SEGMENT_START + timedelta(minutes=1)) == []
+        assert build_thumbnail_vtt([], SEGMENT_START, SEGMENT_START + timedelta(minutes=1), str) is None
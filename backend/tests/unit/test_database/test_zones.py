@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.database.models import LemurTracking, ZoneOccupancy
+from src.database.zones import points_in_polygon, parse_polygon, save_zone, get_zone_occupancy, invalidate_zone_occupancy
+
+SQUARE = [[0, 0], [100, 0], [100, 100], [0, 100]]
+
+
+class TestPointsInPolygon:
+    def test_square(self):
+        """Test inside, outside and missing points against a square"""
+        x = np.array([50.0, 150.0, np.nan, 99.0])
+        y = np.array([50.0, 50.0, 50.0, 1.0])
+        assert points_in_polygon(x, y, parse_polygon(SQUARE)).tolist() == [True, False, False, True]
+
+    def test_concave(self):
+        """Test a point in the notch of an L-shaped zone"""
+        l_shape = parse_polygon([[0, 0], [100, 0], [100, 50], [50, 50], [50, 100], [0, 100]])
+        inside = points_in_polygon(np.array([25.0, 75.0]), np.array([75.0, 75.0]), l_shape)
+        assert inside.tolist() == [True, False]
+
+    def test_invalid_polygon(self):
+        with pytest.raises(ValueError):
+            parse_polygon([[0, 0], [1, 1]])
+
+
+class TestZoneOccupancy:
+    @staticmethod
+    def add_track(session, start_second, positions):
+        for offset, position in enumerate(positions):
+            stamp = f"2025-04-02T12:00:{start_second + offset:02d}.000000"
+            x, y = position if position else (None, None)
+            session.add(LemurTracking(time_stamp=f"2025-04-02 {stamp}", is_active=position is not None,
+                                      coordinate_x=x, coordinate_y=y, camera_name="Camera1"))
+        session.commit()
+
+    def test_dwell_and_visits_are_stored_per_hour(self, session):
+        """Test dwell seconds, visit counts and per-hour storage"""
+        zone = save_zone(session, "Camera1", "Nest box", SQUARE)
+        # one sample per second: in, in, out, in, missing
+        self.add_track(session, 0, [(10, 10), (20, 20), (500, 500), (30, 30), None])
+
+        report = get_zone_occupancy(session, "Camera1", datetime(2025, 4, 2, 12, 0), datetime(2025, 4, 2, 13, 0))
+
+        assert report["zones"][0]["dwell_seconds"] == pytest.approx(3.0)
+        assert report["zones"][0]["visits"] == 2
+        assert session.query(ZoneOccupancy).filter_by(zone_id=zone.id).count() == 1
+
+    def test_ingest_invalidates_stored_hours(self, session):
+        """Test that new tracking data replaces stale stored results"""
+        save_zone(session, "Camera1", "Feeder", SQUARE)
+        self.add_track(session, 0, [(10, 10)])
+        hour = (datetime(2025, 4, 2, 12, 0), datetime(2025, 4, 2, 13, 0))
+        assert get_zone_occupancy(session, "Camera1", *hour)["zones"][0]["visits"] == 1
+
+        self.add_track(session, 10, [(10, 10)])
+        invalidate_zone_occupancy(session, "Camera1", datetime(2025, 4, 2, 12, 0, 10), datetime(2025, 4, 2, 12, 0, 11))
+
+        assert get_zone_occupancy(session, "Camera1", *hour)["zones"][0]["visits"] == 2
@@ -0,0 +1,76 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.database.models import LemurTracking, ProcessedVideo
+from src.processor.compaction import StorageCompactor
+
+
+class TestStorageCompactor:
+    @staticmethod
+    def add_frame(session, stamp, is_active, x=None):
+        session.add(LemurTracking(
+            time_stamp=f"{stamp[:10]} {stamp}", is_active=is_active,
+            coordinate_x=x, coordinate_y=x, camera_name="Camera1",
+        ))
+
+    def test_downsample_tracking_to_seconds(self, Session):
+        """Test that old per-frame rows collapse to one row per camera per second"""
+        session = Session()
+        self.add_frame(session, "2025-04-02T12:00:00.000000", False)
+        self.add_frame(session, "2025-04-02T12:00:00.066667", True, 10.0)
+        self.add_frame(session, "2025-04-02T12:00:00.133333", False, 20.0)
+        self.add_frame(session, "2025-04-02T12:00:01.000000", False)
+        self.add_frame(session, "2025-05-01T12:00:00.000000", True)
+        session.commit()
+
+        compactor = StorageCompactor(Session, is_idle=lambda: True)
+        removed = compactor.downsample_tracking(datetime(2025, 4, 10))
+
+        rows = session.query(LemurTracking).order_by(LemurTracking.time_stamp).all()
+        assert removed == 4
+        assert [r.time_stamp for r in rows] == [
+            "2025-04-02 2025-04-02T12:00:00",
+            "2025-04-02 2025-04-02T12:00:01",
+            "2025-05-01 2025-05-01T12:00:00.000000",
+        ]
+        assert rows[0].is_active is True
+        assert rows[0].coordinate_x == pytest.approx(15.0)
+
+    def test_downsample_stops_when_queue_busy(self, Session):
+        """Test that compaction yields to queued processing work"""
+        session = Session()
+        self.add_frame(session, "2025-04-02T12:00:00.066667", True)
+        session.commit()
+
+        summary = StorageCompactor(Session, is_idle=lambda: False).run_once(now=datetime(2025, 6, 1))
+
+        assert summary["tracking_rows_downsampled"] == 0
+        assert Session().query(LemurTracking).count() == 1
+
+    def test_compact_videos_batch_updates_rows(self, Session, tmp_path):
+        """Test that re-encoded videos are marked compacted in one batch"""
+        video_file = tmp_path / "Camera1_old.mp4"
+        video_file.write_bytes(b"video")
+        session = Session()
+        session.add_all([
+            ProcessedVideo(processed_filename="old.mp4", camera_name="Camera1", filepath=str(video_file),
+                           duration=60.0, frame_count=900, time_stamp="2025-04-02 12:00:00"),
+            ProcessedVideo(processed_filename="new.mp4", camera_name="Camera1", filepath=str(video_file),
+                           duration=60.0, frame_count=900, time_stamp="2025-05-30 12:00:00"),
+        ])
+        session.commit()
+
+        compactor = StorageCompactor(Session, is_idle=lambda: True)
+        with patch.object(StorageCompactor, '_reencode') as mock_reencode, \
+                patch('src.processor.compaction.probe_keyframes', return_value=[0.0, 10.0]):
+            compacted = compactor.compact_videos(datetime(2025, 5, 1))
+
+        mock_reencode.assert_called_once_with(str(video_file))
+        assert compacted == 1
+        old, new = Session().query(ProcessedVideo).order_by(ProcessedVideo.id).all()
+        assert old.compacted is True
+        assert old.frame_count == 300
+        assert old.keyframes == "[0.0, 10.0]"
+        assert new.compacted is False
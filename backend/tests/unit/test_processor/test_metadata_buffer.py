@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.processor.metadata_buffer import MetadataBuffer, frame_timestamps
+
+
+class TestMetadataBuffer:
+    def test_append_grows_past_capacity(self):
+        """Test that the buffer grows and keeps segment-relative frame indices"""
+        buffer = MetadataBuffer(capacity=2)
+        for i in range(5):
+            buffer.append(i % 2 == 0, float(i), float(i * 2))
+
+        records = buffer.take()
+        assert len(records) == 5
+        assert records["frame_index"].tolist() == [0, 1, 2, 3, 4]
+        assert records["activity"].tolist() == [True, False, True, False, True]
+        assert records["y"][4] == pytest.approx(8.0)
+
+    def test_missing_coordinates_are_nan(self):
+        """Test that frames without a detection store NaN coordinates"""
+        buffer = MetadataBuffer()
+        buffer.append(False, None, None)
+
+        records = buffer.take()
+        assert np.isnan(records["x"][0])
+        assert np.isnan(records["y"][0])
+
+    def test_take_resets_buffer(self):
+        """Test that taking the records starts a new segment at frame 0"""
+        buffer = MetadataBuffer()
+        buffer.append(True, 1.0, 1.0)
+        buffer.take()
+        buffer.append(True, 2.0, 2.0)
+
+        assert len(buffer) == 1
+        assert buffer.take()["frame_index"][0] == 0
+
+    def test_frame_timestamps_derived_from_fps(self):
+        """Test that timestamps come from the segment start plus frame index / fps"""
+        buffer = MetadataBuffer()
+        for _ in range(16):
+            buffer.append(False, None, None)
+
+        timestamps = frame_timestamps(buffer.take(), datetime(2025, 4, 2, 12, 0, 0), 15)
+        assert timestamps[0] == np.datetime64("2025-04-02T12:00:00")
+        assert timestamps[15] == np.datetime64("2025-04-02T12:00:01")
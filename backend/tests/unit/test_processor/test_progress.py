@@ -0,0 +1,59 @@
+import queue
+import threading
+from unittest.mock import patch
+
+from src.processor.progress import FileProgress, ProgressBroker, sse_event, sse_stream
+
+
+class TestFileProgress:
+    def test_reports_are_throttled_and_finish_is_always_sent(self):
+        reports = queue.Queue()
+        progress = FileProgress("/videos/Camera1/a.mp4", "Camera1", reports)
+
+        with patch('src.processor.progress.time.monotonic', side_effect=[10.0, 10.1, 10.6]):
+            progress.update(10, 100)
+            progress.update(20, 100)
+            progress.update(100, 100)
+        progress.finish()
+
+        assert [reports.get_nowait()[2] for _ in range(reports.qsize())] == [0.1, 0.99, 1.0]
+
+
+class TestProgressBroker:
+    def test_snapshot_tracks_job_and_running_files(self):
+        broker = ProgressBroker()
+        broker.start_job("/footage/day1", 4)
+        broker.update_file("/footage/day1/Camera1/a.mp4", "Camera1", 1.0)
+        broker.update_file("/footage/day1/Camera2/a.mp4", "Camera2", 0.5)
+
+        snapshot = broker.snapshot()
+
+        assert snapshot["job"] == {"file_path": "/footage/day1", "files_total": 4, "files_done": 1, "percent": 37.5}
+        assert snapshot["files"] == [{"file_path": "/footage/day1/Camera2/a.mp4", "camera_name": "Camera2", "percent": 50.0}]
+
+    def test_wait_wakes_on_update_and_times_out_when_idle(self):
+        broker = ProgressBroker()
+        revision = broker.snapshot()["revision"]
+
+        _, changed = broker.wait(revision, timeout=0.05)
+        assert not changed
+
+        threading.Timer(0.05, broker.touch).start()
+        snapshot, changed = broker.wait(revision, timeout=5)
+        assert changed and snapshot["revision"] == revision + 1
+
+
+class TestServerSentEvents:
+    def test_event_frame(self):
+        assert sse_event("status", {"status": "not processing"}, 3) == \
+            'event: status\nid: 3\ndata: {"status": "not processing"}\n\n'
+
+    def test_stream_sends_current_state_then_changes(self):
+        broker = ProgressBroker()
+        stream = sse_stream(broker, lambda snapshot: {"revision": snapshot["revision"]})
+
+        with patch('src.processor.progress.time.sleep'):
+            assert next(stream).startswith("retry:")
+            assert next(stream) == sse_event("status", {"revision": 0}, 0)
+            broker.touch()
+            assert next(stream) == sse_event("status", {"revision": 1}, 1)
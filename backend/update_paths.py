@@ -1,4 +1,5 @@
 # update_paths.py
+from sqlalchemy import func, update
 from src.database.database_handler import DatabaseHandler
 from src.database.models import ProcessedVideo
 
@@ -7,27 +8,20 @@ def update_file_paths():
     session = db.Session()
     
     try:
-        # Get all videos
-        videos = session.query(ProcessedVideo).all()
-        print(f"Found {len(videos)} videos to update")
-        
         old_base = "/Users/sammcconnellscomputer/Desktop/senior-design-stuff/2025Spring-Team16-Zoo/backend"
         new_base = "/Users/seanturner/Downloads/2025Spring-Team16-Zoo/backend"
         
-        updated_count = 0
-        for video in videos:
-            if video.filepath.startswith(old_base):
-                # Replace the base path
-                new_path = video.filepath.replace(old_base, new_base)
-                print(f"Updating: {video.filepath}")
-                print(f"     To: {new_path}")
-                
-                video.filepath = new_path
-                updated_count += 1
+        # Rewrite every matching path in a single UPDATE instead of row by row
+        result = session.execute(
+            update(ProcessedVideo)
+            .where(ProcessedVideo.filepath.startswith(old_base, autoescape=True))
+            .values(filepath=func.replace(ProcessedVideo.filepath, old_base, new_base))
+            .execution_options(synchronize_session=False)
+        )
         
         # Commit changes
         session.commit()
-        print(f"Successfully updated {updated_count} file paths")
+        print(f"Successfully updated {result.rowcount} file paths")
         
     except Exception as e:
         session.rollback()
@@ -36,4 +30,4 @@ def update_file_paths():
         session.close()
 
 if __name__ == "__main__":
-    update_file_paths()
\ No newline at end of file
+    update_file_paths()
@@ -14,6 +14,8 @@ const QueueStatusDisplay: React.FC = () => {
     });
 
     const API_ENDPOINT = 'http://localhost:5055/get-queue-status';
+    // Pushes the same payload as API_ENDPOINT whenever progress changes
+    const EVENTS_ENDPOINT = 'http://localhost:5055/progress/events';
     const POLLING_INTERVAL = 10000;
     const { change } = useUpdateQueueStatusProvider();
 
@@ -54,9 +56,41 @@ const QueueStatusDisplay: React.FC = () => {
 
     useEffect(() => {
         fetchQueueStatus();
-        const intervalId = setInterval(fetchQueueStatus, POLLING_INTERVAL);
+        let intervalId: ReturnType<typeof setInterval> | null = null;
+        const startPolling = () => {
+            if (intervalId === null) {
+                intervalId = setInterval(fetchQueueStatus, POLLING_INTERVAL);
+            }
+        };
+        const stopPolling = () => {
+            if (intervalId !== null) {
+                clearInterval(intervalId);
+                intervalId = null;
+            }
+        };
+
+        if (typeof EventSource === 'undefined') {
+            startPolling();
+            return stopPolling;
+        }
+
+        // Updates are pushed while the stream is open; polling only covers the time it is down
+        const events = new EventSource(EVENTS_ENDPOINT);
+        events.onopen = stopPolling;
+        events.addEventListener('status', (event) => {
+            const data: QueueStatusResponse = JSON.parse((event as MessageEvent).data);
+            setQueueState({
+                isLoading: false,
+                error: null,
+                data: data,
+            });
+        });
+        // EventSource reconnects by itself; poll until it does
+        events.onerror = startPolling;
+
         return () => {
-            clearInterval(intervalId);
+            events.close();
+            stopPolling();
         };
     }, []);
 
@@ -95,6 +129,16 @@ const QueueStatusDisplay: React.FC = () => {
                     </div>
                 </div>
 
+                {current_process.files && current_process.files.length > 0 && (
+                    <ul style={styles.list}>
+                        {current_process.files.map((file) => (
+                            <li key={file.file_path} style={styles.listItem}>
+                                {file.camera_name}: {file.percent}%
+                            </li>
+                        ))}
+                    </ul>
+                )}
+
                 {processes_on_deck.length > 0 && (
                     <div style={styles.onDeckContainer}>
                         <h3>On Deck</h3>
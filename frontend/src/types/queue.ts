@@ -4,6 +4,14 @@
 export interface CurrentProcess {
     file_path: string;
     percent: number;
+    files?: FileProgress[]; // Per-camera files still being processed
+  }
+
+  // Progress of one camera's video file within the current job
+  export interface FileProgress {
+    file_path: string;
+    camera_name: string;
+    percent: number;
   }
   
   // Represents the response when the queue is processing items